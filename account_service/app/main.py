@@ -1,7 +1,11 @@
+import asyncio
+
 from fastapi import FastAPI
-from starlette.staticfiles import StaticFiles
 
 from account_service.app.routes import user, company
+from shared.db.redis import close_redis_pools, redis_pool_stats
+from shared.services.media import LegacyStaticFiles, shutdown_variant_pool
+from shared.services.partners import partner_names_listener
 
 app = FastAPI(
     title="Account Service",
@@ -12,4 +16,24 @@ app = FastAPI(
 app.include_router(user.router, prefix="/user", tags=["user"])
 app.include_router(company.router, prefix="/company", tags=["company"])
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Статика (фото, логотипы) раздаётся отдельным media_service (через шлюз: /static/...).
+# Прежний /static сервиса оставлен, пока клиенты не перейдут на новые URL
+app.mount("/static", LegacyStaticFiles(directory="static"), name="static")
+
+# Метрики пулов соединений Redis
+@app.get("/metrics/redis", include_in_schema=False)
+async def redis_metrics():
+    return {"pools": redis_pool_stats()}
+
+# Сброс локального кэша названий партнёров по сообщениям из других процессов
+@app.on_event("startup")
+async def startup_event():
+    app.state.partner_names = asyncio.create_task(partner_names_listener())
+
+# Закрываем пулы Redis при остановке
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.partner_names.cancel()
+    shutdown_variant_pool()
+    await close_redis_pools()
+
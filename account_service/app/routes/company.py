@@ -1,10 +1,8 @@
 # account_service/app/routes/companies.py
-import os
 import secrets
-from pathlib import Path
 from typing import List, Optional
 
-import aiofiles
+from redis.asyncio import Redis
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, BackgroundTasks, status, Body
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update, delete
@@ -16,15 +14,22 @@ from account_service.app.services.change_data import send_verification_email
 from account_service.app.services.change_data import change_password
 from account_service.app.services.purchase_history import get_purchase_history
 from rating_service.app.schemas.ratings import BuyingTopPublic
-from shared.services.transliterate import transliterate
-from shared.db.models import Company_Model as CompanyModel, Account_Model, Deal_Model, deal_consumers, BuyTop
+from shared.services.media import store_upload, replace_media, release_media, variant_urls
+from shared.db.archive import deals_with_archive, purchases_with_archive
+from shared.db.models import Company_Model as CompanyModel, Account_Model, BuyTop
 from shared.db.schemas import Company as CompanySchema
 from shared.services.auth import get_current_company
 from shared.db.schemas.company import CompanyUpdate, ChangePasswordRequest
+from shared.db.redis import get_redis
 from shared.db.session import get_db
+from shared.cache.namespace import invalidate_rankings, invalidate_company
+from shared.services.partners import get_partners, invalidate_partner_name
 
 router = APIRouter()
 
+# Поля компании/аккаунта, которые участвуют в расчёте рейтинга
+RANKING_FIELDS = {"region_id", "year_founded"}
+
 
 @router.get(
     "/me",
@@ -34,22 +39,11 @@ router = APIRouter()
 )
 async def read_companies_me(
     current_company: CompanyModel = Depends(get_current_company),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis)
 ):
-    # Получаем массив partner_companies
-    partner_ids = current_company.partner_companies or []
-    partner_companies_names = []
-
-    if partner_ids:
-        # Находим компании по id из accounts
-        companies = await db.execute(
-            select(Account_Model.id, CompanyModel.name)
-            .join(CompanyModel, CompanyModel.account_id == Account_Model.id)
-            .where(Account_Model.id.in_(partner_ids))
-            .where(Account_Model.role == "company")
-            .order_by(CompanyModel.name)
-        )
-        partner_companies_names = [{"id": row[0], "name": row[1]} for row in companies.all()]
+    # Названия партнёров берём из общего кэша (LRU + Redis), в БД — только за недостающими
+    partner_companies_names = await get_partners(db, current_company.partner_companies, redis)
 
     # Формируем ответ
     company_data = CompanySchema.from_orm(current_company)
@@ -72,7 +66,8 @@ async def update_company(
     update_data: CompanyUpdate,
     background_tasks: BackgroundTasks,
     current_company: CompanyModel = Depends(get_current_company),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis)
 ):
     try:
         update_dict = update_data.dict(exclude_unset=True)
@@ -125,6 +120,17 @@ async def update_company(
 
         await db.commit()
 
+        # При переименовании сбрасываем закэшированное название партнёра
+        if "name" in company_data:
+            await invalidate_partner_name(current_company.account_id, redis)
+
+        # Регион и год основания входят в рейтинг — пересчитываем все страницы,
+        # остальные поля затрагивают только страницы с этой компанией
+        if RANKING_FIELDS.intersection(update_dict):
+            await invalidate_rankings(redis)
+        elif company_data:
+            await invalidate_company(redis, current_company.id, current_company.account_id)
+
         # Возвращаем обновлённые данные
         result = await db.execute(
             select(CompanyModel)
@@ -148,7 +154,8 @@ async def update_company(
 )
 async def delete_company(
         current_company: CompanyModel = Depends(get_current_company),
-        db: AsyncSession = Depends(get_db)
+        db: AsyncSession = Depends(get_db),
+        redis: Redis = Depends(get_redis)
 ):
     try:
         account_id = current_company.account_id
@@ -156,6 +163,9 @@ async def delete_company(
         # Удаление компании
         await db.delete(current_company)
 
+        # Файл освобождается, его удалит сборщик мусора медиахранилища
+        await release_media(db, [current_company.logo_url])
+
         # Удаление аккаунта
         await db.execute(
             delete(Account_Model)
@@ -163,6 +173,8 @@ async def delete_company(
         )
 
         await db.commit()
+        await invalidate_partner_name(account_id, redis)
+        await invalidate_rankings(redis)
     except IntegrityError:
         await db.rollback()
         raise HTTPException(
@@ -222,43 +234,24 @@ async def change_company_password(
 async def upload_logo(
         file: UploadFile = File(...),
         current_company: CompanyModel = Depends(get_current_company),
-        db: AsyncSession = Depends(get_db)
+        db: AsyncSession = Depends(get_db),
+        redis: Redis = Depends(get_redis)
 ):
-    # Формирование безопасного имени файла
-    safe_name = transliterate(current_company.name)
-    file_extension = Path(file.filename).suffix
-    file_path = f"static/companies/{current_company.id}_{safe_name}{file_extension}"
-
-    # Если ранее был установлен логотип, удаляем старый файл
-    if current_company.logo_url:
-        old_file_path = current_company.logo_url.lstrip("/")
-        if os.path.exists(old_file_path):
-            try:
-                os.remove(old_file_path)
-            except Exception as e:
-                # Можно залогировать ошибку удаления, но не прерывать процесс обновления
-                print(f"Ошибка удаления старого файла {old_file_path}: {e}")
-
-    # Создаем папку, если её нет
-    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-
-    # Асинхронное сохранение файла
-    try:
-        async with aiofiles.open(file_path, "wb") as out_file:
-            content = await file.read()
-            await out_file.write(content)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ошибка сохранения файла: {str(e)}")
+    # Файл сохраняется в медиахранилище под хэшем содержимого: новый логотип — новый URL,
+    # поэтому старый можно кэшировать навсегда. Старый файл удалит сборщик мусора
+    file_url = await store_upload(file)
+    await replace_media(db, [current_company.logo_url], [file_url])
 
     # Обновляем путь логотипа в БД
     await db.execute(
         update(CompanyModel)
         .where(CompanyModel.id == current_company.id)
-        .values(logo_url=f"/{file_path}")
+        .values(logo_url=file_url, logo_variants=variant_urls(file_url))
     )
     await db.commit()
+    await invalidate_company(redis, current_company.id)
 
-    return {"logo_url": f"/{file_path}"}
+    return {"logo_url": file_url, "logo_variants": variant_urls(file_url)}
 
 @router.get(
     "/interacted-companies",
@@ -270,10 +263,11 @@ async def get_interacted_companies(
     current_company: CompanyModel = Depends(get_current_company),
     db: AsyncSession = Depends(get_db)
 ):
-    # Находим все сделки, где текущая компания — продавец
+    # Находим все сделки, где текущая компания — продавец (включая архивные)
     seller_account_id = current_company.account_id
+    deals = deals_with_archive("id", "seller_id")
     deal_ids = await db.execute(
-        select(Deal_Model.id).where(Deal_Model.seller_id == seller_account_id)
+        select(deals.c.id).where(deals.c.seller_id == seller_account_id)
     )
     deal_ids = [row[0] for row in deal_ids.all()]
 
@@ -281,10 +275,11 @@ async def get_interacted_companies(
         return []
 
     # Находим уникальных покупателей с ролью 'company'
+    purchases = purchases_with_archive("deal_id", "consumer_id")
     consumers = await db.execute(
-        select(deal_consumers.c.consumer_id)
-        .where(deal_consumers.c.deal_id.in_(deal_ids))
-        .join(Account_Model, Account_Model.id == deal_consumers.c.consumer_id)
+        select(purchases.c.consumer_id)
+        .where(purchases.c.deal_id.in_(deal_ids))
+        .join(Account_Model, Account_Model.id == purchases.c.consumer_id)
         .where(Account_Model.role == "company")
         .distinct()  # Убираем дубликаты
     )
@@ -313,7 +308,8 @@ async def get_interacted_companies(
 async def set_partner_companies(
         partner_ids: List[int] = Body(..., description="Список ID компаний (от 0 до 3)"),
         current_company: CompanyModel = Depends(get_current_company),
-        db: AsyncSession = Depends(get_db)
+        db: AsyncSession = Depends(get_db),
+        redis: Redis = Depends(get_redis)
 ):
 
     # Проверяем количество выбранных компаний
@@ -337,6 +333,7 @@ async def set_partner_companies(
         .values(partner_companies=partner_ids)
     )
     await db.commit()
+    await invalidate_company(redis, current_company.id)
 
     # Возвращаем обновлённую компанию
     result = await db.execute(
@@ -354,24 +351,11 @@ async def set_partner_companies(
 )
 async def get_partner_companies(
     current_company: CompanyModel = Depends(get_current_company),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis)
 ):
-    # Получаем массив partner_companies
-    partner_ids = current_company.partner_companies or []
-    if not partner_ids:
-        return []
-
-    # Находим компании по id из accounts
-    companies = await db.execute(
-        select(Account_Model.id, CompanyModel.name)
-        .join(CompanyModel, CompanyModel.account_id == Account_Model.id)
-        .where(Account_Model.id.in_(partner_ids))
-        .where(Account_Model.role == "company")
-        .order_by(CompanyModel.name)
-    )
-
-    # Возвращаем список словарей с id и name
-    return [{"id": row[0], "name": row[1]} for row in companies.all()]
+    # Возвращаем список словарей с id и name, отсортированный по названию
+    return await get_partners(db, current_company.partner_companies, redis)
 
 @router.get(
     "/me/top-purchase",
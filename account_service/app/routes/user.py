@@ -1,9 +1,6 @@
 # account_service/app/routes/users.py
-import os
 import secrets
-from pathlib import Path
 
-import aiofiles
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, BackgroundTasks, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update, delete
@@ -18,7 +15,7 @@ from shared.db.schemas import User as UserSchema
 from shared.services.auth import get_current_user
 from shared.db.schemas.user import UserUpdate, ChangePasswordRequest
 from shared.db.session import get_db
-from shared.services.transliterate import transliterate
+from shared.services.media import store_upload, replace_media, release_media, variant_urls
 
 router = APIRouter()
 
@@ -131,6 +128,9 @@ async def delete_company(
         # Удаление пользователя
         await db.delete(current_user)
 
+        # Файл освобождается, его удалит сборщик мусора медиахранилища
+        await release_media(db, [current_user.photo_url])
+
         # Удаление аккаунта
         await db.execute(
             delete(Account_Model)
@@ -201,41 +201,20 @@ async def upload_photo(
         current_user: UserModel = Depends(get_current_user),
         db: AsyncSession = Depends(get_db)
 ):
-    # Формируем безопасное имя файла на основе полного имени пользователя
-    safe_name = transliterate(current_user.fullname)
-    file_extension = Path(file.filename).suffix  # Получаем расширение файла
-    file_path = f"static/users/{current_user.id}_{safe_name}{file_extension}"
-
-    # Если у пользователя уже установлен путь до фото, удаляем старый файл
-    if current_user.photo_url:
-        old_file_path = current_user.photo_url.lstrip("/")
-        if os.path.exists(old_file_path):
-            try:
-                os.remove(old_file_path)
-            except Exception as e:
-                # Можно залогировать ошибку, но не прерывать обновление
-                print(f"Ошибка удаления старого файла {old_file_path}: {e}")
-
-    # Создаём директорию, если её нет
-    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-
-    # Асинхронное сохранение файла
-    try:
-        async with aiofiles.open(file_path, "wb") as out_file:
-            content = await file.read()
-            await out_file.write(content)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ошибка сохранения файла: {str(e)}")
+    # Аватар хранится под хэшем содержимого: сменённое фото получает другой URL,
+    # поэтому браузеры могут кэшировать его бессрочно. Прежний файл удалит сборщик мусора
+    file_url = await store_upload(file)
+    await replace_media(db, [current_user.photo_url], [file_url])
 
     # Обновляем путь до фото в базе данных (предполагается, что поле называется photo_url)
     await db.execute(
         update(UserModel)
         .where(UserModel.id == current_user.id)
-        .values(photo_url=f"/{file_path}")
+        .values(photo_url=file_url, photo_variants=variant_urls(file_url))
     )
     await db.commit()
 
-    return {"photo_url": f"/{file_path}"}
+    return {"photo_url": file_url, "photo_variants": variant_urls(file_url)}
 
 @router.get(
     "/purchase-history",
@@ -1,19 +1,22 @@
 from typing import List, Dict
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from shared.db.models import Deal_Model, deal_consumers
+from shared.db.archive import deals_with_archive, purchases_with_archive
 
 async def get_purchase_history(account_id: int, db: AsyncSession) -> List[Dict]:
+    # Покупки закрытых сделок, перенесённых в архив, тоже входят в историю
+    deals = deals_with_archive("id", "name_deal", "total_cost")
+    purchases = purchases_with_archive("deal_id", "consumer_id", "created_at")
     # Выполняем запрос к базе данных
     result = await db.execute(
         select(
-            Deal_Model.name_deal,        # Название сделки
-            Deal_Model.total_cost,       # Стоимость покупки
-            deal_consumers.c.created_at  # Время покупки
+            deals.c.name_deal,          # Название сделки
+            deals.c.total_cost,         # Стоимость покупки
+            purchases.c.created_at      # Время покупки
         )
-        .join(deal_consumers, Deal_Model.id == deal_consumers.c.deal_id)
-        .where(deal_consumers.c.consumer_id == account_id)
-        .order_by(deal_consumers.c.created_at.desc())  # Сортировка по убыванию времени
+        .join(purchases, deals.c.id == purchases.c.deal_id)
+        .where(purchases.c.consumer_id == account_id)
+        .order_by(purchases.c.created_at.desc())  # Сортировка по убыванию времени
     )
     purchases = result.all()
 
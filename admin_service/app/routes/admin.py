@@ -4,17 +4,22 @@ import asyncio
 from fastapi import APIRouter, HTTPException, status
 from sqladmin import ModelView, action
 from sqladmin.authentication import AuthenticationBackend
-from sqlalchemy import select, update, cast, Integer
+from sqlalchemy import select, update, cast, func, Integer
 from jose import JWTError, jwt
 from fastapi import Request
 import logging
 
 from starlette.responses import RedirectResponse
 
+from shared.cache.deal_view import invalidate_deal
+from shared.cache.namespace import invalidate_rankings, mark_ranking_dirty, invalidate_deal_facets
+from shared.cache.reference_data import publish_reference_invalidation
+from shared.db.redis import get_redis_client
 from shared.db.session import AsyncSessionLocal
 from shared.db.models import Account_Model, Deal_Model, Feedback_Model, DealDetail, DealTypes, DealBranch, Region
 from shared.core.config import settings
 from shared.services.email import send_email
+from shared.services.media import release_media
 from shared.services.auth import verify_password
 
 # Настройка логирования
@@ -156,6 +161,10 @@ class AccountAdmin(ModelView, model=Account_Model):
                 )
                 await db.commit()
 
+                # Заблокированные компании выпадают из рейтинга, разблокированные — возвращаются
+                if any(user.role == "company" for user in users):
+                    await invalidate_rankings(get_redis_client())
+
                 # Логируем
                 token = request.session.get("token")
                 payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
@@ -216,6 +225,15 @@ class AccountAdmin(ModelView, model=Account_Model):
         logger.info(f"Администратор {admin_id} {action} пользователя {model.email} с IP {client_ip}")
         await super().on_model_change(data, model, is_created, request)
 
+    # Правка (в т.ч. is_active) и удаление аккаунта компании меняют рейтинг
+    async def after_model_change(self, data: dict, model, is_created: bool, request: Request) -> None:
+        if model.role == "company":
+            await invalidate_rankings(get_redis_client())
+
+    async def after_model_delete(self, model, request: Request) -> None:
+        if model.role == "company":
+            await invalidate_rankings(get_redis_client())
+
 # Функция для установки flash-сообщения в сессии
 def flash(request: Request, message: str, category: str = "info"):
     request.session["flash_message"] = {"message": message, "category": category}
@@ -230,6 +248,8 @@ class DealAdmin(ModelView, model=Deal_Model):
     column_list = ["id", "name_deal", "seller_id", "total_cost", "status", "created_at"]
     column_searchable_list = ["name_deal"]
     column_filters = ["status", "seller_id"]
+    # search_vector заполняется триггером, счётчики и миниатюры ведёт deal_service
+    form_excluded_columns = ["search_vector", "order_count", "feedback_count", "photos_variants", "updated_at"]
     page_size = 20
     name = "Сделка"
     name_plural = "Сделки"
@@ -246,6 +266,26 @@ class DealAdmin(ModelView, model=Deal_Model):
             body = f"Уведомляем вас, что ваша сделка '{model.name_deal}' была удалена из-за нарушений правил сообщества."
             asyncio.create_task(send_email(to_email=model.seller.email, subject=subject, body=body))
 
+    # Сбрасываем закэшированную карточку сделки и счётчики фасетов после правки или удаления;
+    # сделки продавца входят в его рейтинг — помечаем его для пересчёта
+    async def after_model_change(self, data: dict, model, is_created: bool, request: Request) -> None:
+        redis = get_redis_client()
+        await invalidate_deal(redis, model.id)
+        await invalidate_deal_facets(redis)
+        if model.seller_id is not None:
+            await mark_ranking_dirty(redis, model.seller_id)
+
+    async def after_model_delete(self, model, request: Request) -> None:
+        # Фото удалённой сделки освобождаются — файлы удалит сборщик мусора медиахранилища
+        async with AsyncSessionLocal() as db:
+            await release_media(db, model.photos_url or [])
+            await db.commit()
+        redis = get_redis_client()
+        await invalidate_deal(redis, model.id)
+        await invalidate_deal_facets(redis)
+        if model.seller_id is not None:
+            await mark_ranking_dirty(redis, model.seller_id)
+
 # Класс для администрирования отзывов
 class FeedbackAdmin(ModelView, model=Feedback_Model):
     column_list = ["id", "deal_id", "author_id", "stars", "details", "is_purchaser", "created_at"]
@@ -268,8 +308,40 @@ class FeedbackAdmin(ModelView, model=Feedback_Model):
             body = f"Ваш отзыв на сделку '{model.deal.name_deal}' был удалён из-за нарушений правил сообщества."
             asyncio.create_task(send_email(to_email=model.author.email, subject=subject, body=body))
 
+    # Удаление отзыва и уменьшение денормализованного счётчика сделки — в одной транзакции
+    async def delete_model(self, request: Request, pk) -> None:
+        async with AsyncSessionLocal() as db:
+            model = await db.get(Feedback_Model, int(pk))
+            if model is None:
+                return
+            await self.on_model_delete(model, request)
+            await db.delete(model)
+            await db.execute(
+                update(Deal_Model)
+                .where(Deal_Model.id == model.deal_id)
+                .values(feedback_count=func.greatest(Deal_Model.feedback_count - 1, 0))
+            )
+            await db.commit()
+        await self.after_model_delete(model, request)
+
+    # После удаления отзыва сбрасываем карточку сделки
+    async def after_model_delete(self, model, request: Request) -> None:
+        redis = get_redis_client()
+        await invalidate_deal(redis, model.deal_id)
+        # Число отзывов и средняя оценка входят в рейтинг продавца
+        if model.deal and model.deal.seller_id is not None:
+            await mark_ranking_dirty(redis, model.deal.seller_id)
+
+# Справочники кэшируются в памяти сервисов: после изменения рассылаем сброс
+class ReferenceDataAdminMixin:
+    async def after_model_change(self, data: dict, model, is_created: bool, request: Request) -> None:
+        await publish_reference_invalidation(get_redis_client())
+
+    async def after_model_delete(self, model, request: Request) -> None:
+        await publish_reference_invalidation(get_redis_client())
+
 # Класс для администрирования регионов
-class RegionAdmin(ModelView, model=Region):
+class RegionAdmin(ReferenceDataAdminMixin, ModelView, model=Region):
     column_list = ["id", "name"]
     column_searchable_list = ["name"]
     page_size = 20
@@ -281,7 +353,7 @@ class RegionAdmin(ModelView, model=Region):
         return role == "admin"
 
 # Класс для администрирования отраслей сделок
-class DealBranchAdmin(ModelView, model=DealBranch):
+class DealBranchAdmin(ReferenceDataAdminMixin, ModelView, model=DealBranch):
     column_list = ["id", "name"]
     column_searchable_list = ["name"]
     page_size = 20
@@ -293,7 +365,7 @@ class DealBranchAdmin(ModelView, model=DealBranch):
         return role == "admin"
 
 # Класс для администрирования типов сделок
-class DealTypesAdmin(ModelView, model=DealTypes):
+class DealTypesAdmin(ReferenceDataAdminMixin, ModelView, model=DealTypes):
     column_list = ["id", "name"]
     column_searchable_list = ["name"]
     page_size = 20
@@ -305,7 +377,7 @@ class DealTypesAdmin(ModelView, model=DealTypes):
         return role == "admin"
 
 # Класс для администрирования деталей сделок
-class DealDetailAdmin(ModelView, model=DealDetail):
+class DealDetailAdmin(ReferenceDataAdminMixin, ModelView, model=DealDetail):
     column_list = ["id", "detail"]
     column_searchable_list = ["detail"]
     page_size = 20
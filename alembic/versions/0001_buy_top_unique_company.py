@@ -0,0 +1,59 @@
+"""Уникальная запись buy_top на компанию
+
+Revision ID: 0001_buy_top_unique_company
+Revises:
+Create Date: 2026-10-19 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001_buy_top_unique_company'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Схлопываем дубликаты: оставляем запись с минимальным id, суммируем траты и покупки
+    op.execute("""
+        WITH merged AS (
+            SELECT id_company,
+                   MIN(id) AS keep_id,
+                   MAX(time_stop) AS time_stop,
+                   SUM(total_spent) AS total_spent,
+                   SUM(purchase_count) AS purchase_count
+            FROM buy_top
+            GROUP BY id_company
+            HAVING COUNT(*) > 1
+        )
+        UPDATE buy_top b
+        SET time_stop = m.time_stop,
+            total_spent = m.total_spent,
+            purchase_count = m.purchase_count
+        FROM merged m
+        WHERE b.id = m.keep_id
+    """)
+    op.execute("""
+        DELETE FROM buy_top b
+        USING buy_top keeper
+        WHERE b.id_company = keeper.id_company AND b.id > keeper.id
+    """)
+    # Таблицы создаются через create_all, поэтому ограничение может уже существовать
+    op.execute("""
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uq_buy_top_id_company') THEN
+                ALTER TABLE buy_top ADD CONSTRAINT uq_buy_top_id_company UNIQUE (id_company);
+            END IF;
+        END $$;
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("ALTER TABLE buy_top DROP CONSTRAINT IF EXISTS uq_buy_top_id_company")
@@ -0,0 +1,80 @@
+"""Полнотекстовый поиск по сделкам
+
+Revision ID: 0002_deals_full_text_search
+Revises: 0001_buy_top_unique_company
+Create Date: 2026-10-19 12:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002_deals_full_text_search'
+down_revision: Union[str, None] = '0001_buy_top_unique_company'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Копия DDL на момент миграции (не импортируется из моделей, чтобы правки моделей
+# не меняли уже выпущенную миграцию). По одной команде на строку
+DEALS_SEARCH_DDL = (
+    """
+    CREATE OR REPLACE FUNCTION deals_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('russian', coalesce(NEW.name_deal, '')), 'A') ||
+            setweight(to_tsvector('russian', coalesce(
+                (SELECT name FROM deal_branch WHERE id = NEW.deal_branch_id), ''
+            )), 'B') ||
+            setweight(to_tsvector('russian', coalesce(NEW.address_deal, '')), 'C');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS deals_search_vector_trigger ON deals",
+    """
+    CREATE TRIGGER deals_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF name_deal, address_deal, deal_branch_id ON deals
+        FOR EACH ROW EXECUTE FUNCTION deals_search_vector_update()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION deal_branch_search_vector_refresh() RETURNS trigger AS $$
+    BEGIN
+        -- Переименование отрасли пересчитывает вектор её сделок
+        UPDATE deals SET name_deal = name_deal WHERE deal_branch_id = NEW.id;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS deal_branch_search_vector_trigger ON deal_branch",
+    """
+    CREATE TRIGGER deal_branch_search_vector_trigger
+        AFTER UPDATE OF name ON deal_branch
+        FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+        EXECUTE FUNCTION deal_branch_search_vector_refresh()
+    """,
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("ALTER TABLE deals ADD COLUMN IF NOT EXISTS search_vector tsvector")
+    for statement in DEALS_SEARCH_DDL:
+        op.execute(statement)
+    # Заполняем вектор для существующих сделок (срабатывает триггер)
+    op.execute("UPDATE deals SET name_deal = name_deal")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_deals_search_vector ON deals USING gin (search_vector)")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_deals_name_deal_trgm ON deals USING gin (name_deal gin_trgm_ops)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS idx_deals_name_deal_trgm")
+    op.execute("DROP INDEX IF EXISTS idx_deals_search_vector")
+    op.execute("DROP TRIGGER IF EXISTS deal_branch_search_vector_trigger ON deal_branch")
+    op.execute("DROP FUNCTION IF EXISTS deal_branch_search_vector_refresh()")
+    op.execute("DROP TRIGGER IF EXISTS deals_search_vector_trigger ON deals")
+    op.execute("DROP FUNCTION IF EXISTS deals_search_vector_update()")
+    op.execute("ALTER TABLE deals DROP COLUMN IF EXISTS search_vector")
@@ -0,0 +1,29 @@
+"""Индексы для курсорной пагинации сделок
+
+Revision ID: 0003_deals_keyset_indexes
+Revises: 0002_deals_full_text_search
+Create Date: 2026-10-19 13:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003_deals_keyset_indexes'
+down_revision: Union[str, None] = '0002_deals_full_text_search'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE INDEX IF NOT EXISTS idx_deals_region_created_id ON deals (region_id, created_at, id)")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_deals_created_id ON deals (created_at, id)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS idx_deals_created_id")
+    op.execute("DROP INDEX IF EXISTS idx_deals_region_created_id")
@@ -0,0 +1,37 @@
+"""Денормализованные счётчики покупок и отзывов сделок
+
+Revision ID: 0004_deals_counters
+Revises: 0003_deals_keyset_indexes
+Create Date: 2026-10-19 13:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004_deals_counters'
+down_revision: Union[str, None] = '0003_deals_keyset_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("ALTER TABLE deals ADD COLUMN IF NOT EXISTS order_count integer NOT NULL DEFAULT 0")
+    op.execute("ALTER TABLE deals ADD COLUMN IF NOT EXISTS feedback_count integer NOT NULL DEFAULT 0")
+    # Начальное заполнение
+    op.execute("""
+        UPDATE deals d
+        SET order_count = (SELECT count(*) FROM deal_consumers dc WHERE dc.deal_id = d.id),
+            feedback_count = (SELECT count(*) FROM feedback f WHERE f.deal_id = d.id)
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS idx_deals_popularity ON deals (order_count, id)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS idx_deals_popularity")
+    op.execute("ALTER TABLE deals DROP COLUMN IF EXISTS feedback_count")
+    op.execute("ALTER TABLE deals DROP COLUMN IF EXISTS order_count")
@@ -0,0 +1,40 @@
+"""Контентно-адресуемое медиахранилище со счётчиками ссылок
+
+Revision ID: 0005_media_blobs
+Revises: 0004_deals_counters
+Create Date: 2026-10-19 15:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005_media_blobs'
+down_revision: Union[str, None] = '0004_deals_counters'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS media_blobs (
+            sha256 varchar(64) PRIMARY KEY,
+            extension varchar(8) NOT NULL,
+            size integer NOT NULL,
+            ref_count integer NOT NULL DEFAULT 0,
+            unreferenced_at timestamptz DEFAULT now(),
+            created_at timestamptz NOT NULL DEFAULT now()
+        )
+    """)
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_media_blobs_unreferenced "
+        "ON media_blobs (unreferenced_at) WHERE ref_count = 0"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TABLE IF EXISTS media_blobs")
@@ -0,0 +1,33 @@
+"""Миниатюры и WebP-версии изображений медиахранилища
+
+Revision ID: 0006_media_variants
+Revises: 0005_media_blobs
+Create Date: 2026-10-19 16:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006_media_variants'
+down_revision: Union[str, None] = '0005_media_blobs'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("ALTER TABLE media_blobs ADD COLUMN IF NOT EXISTS variants_ready boolean NOT NULL DEFAULT false")
+    op.execute("ALTER TABLE deals ADD COLUMN IF NOT EXISTS photos_variants jsonb")
+    op.execute("ALTER TABLE companies ADD COLUMN IF NOT EXISTS logo_variants jsonb")
+    op.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS photo_variants jsonb")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("ALTER TABLE users DROP COLUMN IF EXISTS photo_variants")
+    op.execute("ALTER TABLE companies DROP COLUMN IF EXISTS logo_variants")
+    op.execute("ALTER TABLE deals DROP COLUMN IF EXISTS photos_variants")
+    op.execute("ALTER TABLE media_blobs DROP COLUMN IF EXISTS variants_ready")
@@ -0,0 +1,33 @@
+"""Время изменения сделок для инкрементальной выгрузки
+
+Revision ID: 0007_deals_updated_at
+Revises: 0006_media_variants
+Create Date: 2026-10-19 17:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007_deals_updated_at'
+down_revision: Union[str, None] = '0006_media_variants'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("ALTER TABLE deals ADD COLUMN IF NOT EXISTS updated_at timestamptz")
+    # Существующим сделкам — время создания
+    op.execute("UPDATE deals SET updated_at = created_at WHERE updated_at IS NULL")
+    op.execute("ALTER TABLE deals ALTER COLUMN updated_at SET DEFAULT now()")
+    op.execute("ALTER TABLE deals ALTER COLUMN updated_at SET NOT NULL")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_deals_updated_id ON deals (updated_at, id)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS idx_deals_updated_id")
+    op.execute("ALTER TABLE deals DROP COLUMN IF EXISTS updated_at")
@@ -0,0 +1,191 @@
+"""Помесячное секционирование messages и deal_consumers, архив закрытых сделок
+
+Revision ID: 0008_partitions_and_archive
+Revises: 0007_deals_updated_at
+Create Date: 2026-10-19 19:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008_partitions_and_archive'
+down_revision: Union[str, None] = '0007_deals_updated_at'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Столбцы (без id и created_at) и индексы секционируемых таблиц
+PARTITIONED = {
+    "messages": {
+        "columns": """
+            deal_id integer NOT NULL REFERENCES deals (id) ON DELETE CASCADE,
+            consumer_id integer REFERENCES accounts (id) ON DELETE SET NULL,
+            sender_id integer REFERENCES accounts (id) ON DELETE SET NULL,
+            recipient_id integer REFERENCES accounts (id) ON DELETE SET NULL,
+            content text NOT NULL,
+        """,
+        "names": "id, deal_id, consumer_id, sender_id, recipient_id, content, created_at",
+        "indexes": ("id", "deal_id", "consumer_id", "sender_id", "recipient_id", "created_at"),
+    },
+    "deal_consumers": {
+        "columns": """
+            deal_id integer NOT NULL REFERENCES deals (id) ON DELETE CASCADE,
+            consumer_id integer REFERENCES accounts (id) ON DELETE SET NULL,
+        """,
+        "names": "id, deal_id, consumer_id, created_at",
+        "indexes": ("deal_id", "consumer_id"),
+    },
+}
+
+# Архив: те же столбцы без внешних ключей (и без search_vector у сделок)
+ARCHIVE_TABLES = (
+    """
+    CREATE TABLE IF NOT EXISTS deals_archive (
+        id integer PRIMARY KEY,
+        name_deal varchar(255) NOT NULL,
+        seller_id integer,
+        seller_price numeric(12, 2) NOT NULL,
+        "YAMS_percent" numeric(12, 2),
+        total_cost numeric(12, 2),
+        region_id integer,
+        address_deal varchar(255) NOT NULL,
+        date_close timestamptz,
+        photos_url varchar[],
+        photos_variants jsonb,
+        deal_details_id integer,
+        created_at timestamptz NOT NULL,
+        updated_at timestamptz NOT NULL,
+        deal_branch_id integer,
+        deal_type_id integer,
+        order_count integer NOT NULL DEFAULT 0,
+        feedback_count integer NOT NULL DEFAULT 0,
+        archived_at timestamptz NOT NULL DEFAULT now()
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS deal_consumers_archive (
+        id integer PRIMARY KEY,
+        deal_id integer NOT NULL,
+        consumer_id integer,
+        created_at timestamptz NOT NULL,
+        archived_at timestamptz NOT NULL DEFAULT now()
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS feedback_archive (
+        id integer PRIMARY KEY,
+        deal_id integer,
+        stars integer NOT NULL,
+        details text NOT NULL,
+        created_at timestamptz NOT NULL,
+        author_id integer,
+        is_purchaser boolean NOT NULL DEFAULT false,
+        archived_at timestamptz NOT NULL DEFAULT now()
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS messages_archive (
+        id integer PRIMARY KEY,
+        deal_id integer NOT NULL,
+        consumer_id integer,
+        sender_id integer,
+        recipient_id integer,
+        content text NOT NULL,
+        created_at timestamptz NOT NULL,
+        archived_at timestamptz NOT NULL DEFAULT now()
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_deals_archive_seller_id ON deals_archive (seller_id)",
+    "CREATE INDEX IF NOT EXISTS ix_deal_consumers_archive_deal_id ON deal_consumers_archive (deal_id)",
+    "CREATE INDEX IF NOT EXISTS ix_deal_consumers_archive_consumer_id ON deal_consumers_archive (consumer_id)",
+    "CREATE INDEX IF NOT EXISTS ix_feedback_archive_deal_id ON feedback_archive (deal_id)",
+    "CREATE INDEX IF NOT EXISTS ix_messages_archive_deal_id ON messages_archive (deal_id)",
+)
+
+
+def _is_partitioned(table: str) -> bool:
+    relkind = op.get_bind().execute(
+        sa.text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)"), {"table": table}
+    ).scalar()
+    return relkind == "p"
+
+
+def _partition(table: str, spec: dict) -> None:
+    # Старая таблица уступает имя, её первичный ключ — имя индекса; последовательность id сохраняется
+    op.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+    op.execute(f"ALTER TABLE {table}_old RENAME CONSTRAINT {table}_pkey TO {table}_old_pkey")
+    op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY NONE")
+    op.execute(f"""
+        CREATE TABLE {table} (
+            id integer NOT NULL DEFAULT nextval('{table}_id_seq'),
+            {spec["columns"]}
+            created_at timestamptz NOT NULL DEFAULT timezone('Europe/Moscow', now()),
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    # Секции с месяца самой старой строки до трёх месяцев вперёд; остальное — в секцию по умолчанию
+    op.execute(f"""
+        DO $$
+        DECLARE
+            part_month date := date_trunc('month', coalesce((SELECT min(created_at) FROM {table}_old), now()));
+        BEGIN
+            WHILE part_month <= date_trunc('month', now()) + interval '3 months' LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF {table} FOR VALUES FROM (%L) TO (%L)',
+                    '{table}_p' || to_char(part_month, 'YYYY_MM'), part_month, (part_month + interval '1 month')::date
+                );
+                part_month := part_month + interval '1 month';
+            END LOOP;
+        END
+        $$
+    """)
+    op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+    op.execute(f"INSERT INTO {table} ({spec['names']}) SELECT {spec['names']} FROM {table}_old")
+    op.execute(f"DROP TABLE {table}_old")
+    op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+    # Индексы на секционированной таблице создаются в каждой секции
+    for column in spec["indexes"]:
+        op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_{column} ON {table} ({column})")
+
+
+def _unpartition(table: str, spec: dict) -> None:
+    op.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+    op.execute(f"ALTER TABLE {table}_old RENAME CONSTRAINT {table}_pkey TO {table}_old_pkey")
+    op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY NONE")
+    for column in spec["indexes"]:
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_{column}")
+    op.execute(f"""
+        CREATE TABLE {table} (
+            id integer PRIMARY KEY DEFAULT nextval('{table}_id_seq'),
+            {spec["columns"]}
+            created_at timestamptz NOT NULL DEFAULT timezone('Europe/Moscow', now())
+        )
+    """)
+    op.execute(f"INSERT INTO {table} ({spec['names']}) SELECT {spec['names']} FROM {table}_old")
+    op.execute(f"DROP TABLE {table}_old")
+    op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+    for column in spec["indexes"]:
+        op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_{column} ON {table} ({column})")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, spec in PARTITIONED.items():
+        # База, созданная create_all, уже секционирована
+        if not _is_partitioned(table):
+            _partition(table, spec)
+    for statement in ARCHIVE_TABLES:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Архивные строки в горячие таблицы не возвращаются
+    for table in ("messages_archive", "feedback_archive", "deal_consumers_archive", "deals_archive"):
+        op.execute(f"DROP TABLE IF EXISTS {table}")
+    for table, spec in PARTITIONED.items():
+        if _is_partitioned(table):
+            _unpartition(table, spec)
@@ -0,0 +1,39 @@
+"""Сохранённые поиски с уведомлениями о новых сделках
+
+Revision ID: 0009_saved_searches
+Revises: 0008_partitions_and_archive
+Create Date: 2026-10-19 20:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009_saved_searches'
+down_revision: Union[str, None] = '0008_partitions_and_archive'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS saved_searches (
+            id serial PRIMARY KEY,
+            account_id integer NOT NULL REFERENCES accounts (id) ON DELETE CASCADE,
+            region_id integer REFERENCES regions (id) ON DELETE CASCADE,
+            deal_branch_id integer REFERENCES deal_branch (id) ON DELETE CASCADE,
+            deal_type_id integer REFERENCES deal_type (id) ON DELETE CASCADE,
+            search varchar(255),
+            terms varchar[] NOT NULL DEFAULT '{}',
+            created_at timestamptz NOT NULL DEFAULT timezone('Europe/Moscow', now())
+        )
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_saved_searches_account_id ON saved_searches (account_id)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TABLE IF EXISTS saved_searches")
@@ -0,0 +1,33 @@
+"""Счётчик неудачных попыток генерации вариантов изображений
+
+Revision ID: 0010_media_variant_attempts
+Revises: 0009_saved_searches
+Create Date: 2026-10-19 21:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010_media_variant_attempts'
+down_revision: Union[str, None] = '0009_saved_searches'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("ALTER TABLE media_blobs ADD COLUMN IF NOT EXISTS variant_attempts integer NOT NULL DEFAULT 0")
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_media_blobs_variants_pending
+        ON media_blobs (variant_attempts, created_at)
+        WHERE variants_ready = false
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS idx_media_blobs_variants_pending")
+    op.execute("ALTER TABLE media_blobs DROP COLUMN IF EXISTS variant_attempts")
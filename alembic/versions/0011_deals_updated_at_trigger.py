@@ -0,0 +1,87 @@
+"""Время изменения сделок ставится триггером
+
+Revision ID: 0011_deals_updated_at_trigger
+Revises: 0010_media_variant_attempts
+Create Date: 2026-10-19 22:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0011_deals_updated_at_trigger'
+down_revision: Union[str, None] = '0010_media_variant_attempts'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Копия DDL на момент миграции (не импортируется из моделей, чтобы правки моделей
+# не меняли уже выпущенную миграцию). По одной команде на строку
+DEALS_UPDATED_AT_DDL = (
+    """
+    CREATE OR REPLACE FUNCTION deals_updated_at_touch() RETURNS trigger AS $$
+    BEGIN
+        NEW.updated_at := now();
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS deals_updated_at_trigger ON deals",
+    """
+    CREATE TRIGGER deals_updated_at_trigger
+        BEFORE UPDATE ON deals
+        FOR EACH ROW EXECUTE FUNCTION deals_updated_at_touch()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION deals_reference_renamed() RETURNS trigger AS $$
+    BEGIN
+        IF TG_TABLE_NAME = 'regions' THEN
+            UPDATE deals SET updated_at = now() WHERE region_id = NEW.id;
+        ELSIF TG_TABLE_NAME = 'deal_type' THEN
+            UPDATE deals SET updated_at = now() WHERE deal_type_id = NEW.id;
+        ELSE
+            UPDATE deals SET updated_at = now() WHERE deal_details_id = NEW.id;
+        END IF;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS regions_deals_updated_at_trigger ON regions",
+    """
+    CREATE TRIGGER regions_deals_updated_at_trigger
+        AFTER UPDATE OF name ON regions
+        FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+        EXECUTE FUNCTION deals_reference_renamed()
+    """,
+    "DROP TRIGGER IF EXISTS deal_type_deals_updated_at_trigger ON deal_type",
+    """
+    CREATE TRIGGER deal_type_deals_updated_at_trigger
+        AFTER UPDATE OF name ON deal_type
+        FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+        EXECUTE FUNCTION deals_reference_renamed()
+    """,
+    "DROP TRIGGER IF EXISTS deal_details_deals_updated_at_trigger ON deal_details",
+    """
+    CREATE TRIGGER deal_details_deals_updated_at_trigger
+        AFTER UPDATE OF detail ON deal_details
+        FOR EACH ROW WHEN (OLD.detail IS DISTINCT FROM NEW.detail)
+        EXECUTE FUNCTION deals_reference_renamed()
+    """,
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for statement in DEALS_UPDATED_AT_DDL:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS deal_details_deals_updated_at_trigger ON deal_details")
+    op.execute("DROP TRIGGER IF EXISTS deal_type_deals_updated_at_trigger ON deal_type")
+    op.execute("DROP TRIGGER IF EXISTS regions_deals_updated_at_trigger ON regions")
+    op.execute("DROP FUNCTION IF EXISTS deals_reference_renamed()")
+    op.execute("DROP TRIGGER IF EXISTS deals_updated_at_trigger ON deals")
+    op.execute("DROP FUNCTION IF EXISTS deals_updated_at_touch()")
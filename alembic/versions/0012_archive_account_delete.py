@@ -0,0 +1,73 @@
+"""Удаление аккаунта обнуляет ссылки на него в архиве сделок
+
+Revision ID: 0012_archive_account_delete
+Revises: 0011_deals_updated_at_trigger
+Create Date: 2026-10-19 23:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0012_archive_account_delete'
+down_revision: Union[str, None] = '0011_deals_updated_at_trigger'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Копия DDL на момент миграции (не импортируется из моделей, чтобы правки моделей
+# не меняли уже выпущенную миграцию). По одной команде на строку
+ARCHIVE_ACCOUNT_DELETE_DDL = (
+    """
+    CREATE OR REPLACE FUNCTION archive_account_deleted() RETURNS trigger AS $$
+    BEGIN
+        UPDATE deals_archive SET seller_id = NULL WHERE seller_id = OLD.id;
+        UPDATE deal_consumers_archive SET consumer_id = NULL WHERE consumer_id = OLD.id;
+        UPDATE feedback_archive SET author_id = NULL WHERE author_id = OLD.id;
+        UPDATE messages_archive SET
+            consumer_id = NULLIF(consumer_id, OLD.id),
+            sender_id = NULLIF(sender_id, OLD.id),
+            recipient_id = NULLIF(recipient_id, OLD.id)
+        WHERE OLD.id IN (consumer_id, sender_id, recipient_id);
+        RETURN OLD;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS accounts_archive_delete_trigger ON accounts",
+    """
+    CREATE TRIGGER accounts_archive_delete_trigger
+        AFTER DELETE ON accounts
+        FOR EACH ROW EXECUTE FUNCTION archive_account_deleted()
+    """,
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for statement in ARCHIVE_ACCOUNT_DELETE_DDL:
+        op.execute(statement)
+    # Ссылки на аккаунты, удалённые до появления триггера
+    op.execute("""
+        UPDATE deals_archive SET seller_id = NULL
+        WHERE seller_id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM accounts WHERE id = seller_id)
+    """)
+    op.execute("""
+        UPDATE deal_consumers_archive SET consumer_id = NULL
+        WHERE consumer_id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM accounts WHERE id = consumer_id)
+    """)
+    op.execute("""
+        UPDATE feedback_archive SET author_id = NULL
+        WHERE author_id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM accounts WHERE id = author_id)
+    """)
+    for column in ("consumer_id", "sender_id", "recipient_id"):
+        op.execute(f"""
+            UPDATE messages_archive SET {column} = NULL
+            WHERE {column} IS NOT NULL AND NOT EXISTS (SELECT 1 FROM accounts WHERE id = {column})
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS accounts_archive_delete_trigger ON accounts")
+    op.execute("DROP FUNCTION IF EXISTS archive_account_deleted()")
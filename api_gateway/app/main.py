@@ -1,23 +1,24 @@
 import asyncio
 import json
-import os
 from typing import Optional
 import logging
 
 from fastapi_csrf_protect.exceptions import CsrfProtectError
-from redis.asyncio import Redis
 from fastapi import FastAPI, Depends, Request, Response, status, HTTPException, WebSocket, Query
 from fastapi.security import OAuth2PasswordBearer
 from fastapi_csrf_protect import CsrfProtect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi_limiter import FastAPILimiter
 from httpx import AsyncClient, Timeout
-from starlette.responses import JSONResponse, HTMLResponse
+from starlette.background import BackgroundTask
+from starlette.responses import JSONResponse, HTMLResponse, StreamingResponse
 from websockets import connect as websocket_connect
 from websockets.exceptions import ConnectionClosed
 
+from shared.cache.reference_data import publish_reference_invalidation
 from shared.core.config import settings
 from shared.db.base import Base
+from shared.db.redis import get_redis_client, close_redis_pools, redis_pool_stats
 from shared.db.seeds import run_all_seeds
 from shared.db.session import engine
 
@@ -48,9 +49,8 @@ csrf_protect.load_config(lambda: [
     ("cookie_key", "csrftoken"),
 ])
 
-# Подключение к Redis
-redis_url = os.getenv("REDIS_URL", "redis://redis:6379/0")
-redis_client = Redis.from_url(redis_url, decode_responses=True)
+# Подключение к Redis через общий пул процесса
+redis_client = get_redis_client()
 
 # URL микросервисов
 SERVICE_URLS = {
@@ -58,6 +58,7 @@ SERVICE_URLS = {
     "deal": "http://deal_service:8002",    # deal_service, порт 8002
     "rating": "http://rating_service:8003",# rating_service, порт 8003
     "lk": "http://account_service:8004",   # account_service, порт 8004
+    "media": "http://media_service:8006",  # media_service, порт 8006
 }
 
 # Создание таблиц при запуске
@@ -69,6 +70,18 @@ async def startup_event():
         await FastAPILimiter.init(redis_client)
     # Запуск сидинга
     await run_all_seeds()
+    # Сидинг мог добавить справочные значения — сервисы перечитают их
+    await publish_reference_invalidation(redis_client)
+
+# Закрываем пулы Redis при остановке
+@app.on_event("shutdown")
+async def shutdown_event():
+    await close_redis_pools()
+
+# Метрики пулов соединений Redis
+@app.get("/metrics/redis", include_in_schema=False)
+async def redis_metrics():
+    return {"pools": redis_pool_stats()}
 
 # Функция зависимости
 def get_csrf_protect():
@@ -235,7 +248,8 @@ async def companies_proxy(
         "- GET /api/rating/industries — получение списка отраслей\n"
         "- GET /api/rating/companies — получение списка компаний с фильтрацией (требуется аутентификация)\n"
         "- GET /api/rating/companies/{company_id} — получение подробной информации о компании\n"
-        "- GET /api/rating/ranking-vikor-companies — получение рейтинга компаний по VIKOR\n"
+        "- GET /api/rating/ranking-vikor-companies — получение рейтинга компаний (параметры method, profile, region_id, industry_id)\n"
+        "- GET /api/rating/ranking-profiles — доступные методы и профили весов рейтинга\n"
         "- POST /api/rating/buy-top — покупка топ-места в рейтинге посуточно\n"
     )
 )
@@ -264,6 +278,83 @@ async def rating_proxy(
                 detail=f"Rating service error: {response.text}"
             )
 
+async def stream_proxy(
+    request: Request,
+    url: str,
+    request_headers: tuple,
+    response_headers: tuple,
+    timeout: Timeout
+) -> StreamingResponse:
+    """
+    Потоковое проксирование: тело ответа не собирается в памяти шлюза.
+    Передаются только перечисленные заголовки запроса и ответа (без host,
+    content-length запроса и прочих заголовков соединения).
+    """
+    client = AsyncClient(timeout=timeout)
+    try:
+        upstream = await client.send(
+            client.build_request(
+                request.method,
+                url,
+                headers={key: value for key, value in request.headers.items() if key in request_headers},
+                params=dict(request.query_params)
+            ),
+            stream=True
+        )
+    except Exception:
+        # Ответа нет — закрываем клиент здесь, фоновая задача не запустится
+        await client.aclose()
+        raise
+
+    async def close_upstream():
+        await upstream.aclose()
+        await client.aclose()
+
+    return StreamingResponse(
+        upstream.aiter_raw(),
+        status_code=upstream.status_code,
+        headers={key: value for key, value in upstream.headers.items() if key in response_headers},
+        background=BackgroundTask(close_upstream)
+    )
+
+# Выгрузка сделок проксируется потоком: общий прокси ниже собирает ответ целиком как JSON
+EXPORT_PASSTHROUGH_HEADERS = ("content-type", "content-disposition", "x-export-watermark")
+EXPORT_REQUEST_HEADERS = ("authorization", "accept")
+
+@app.get(
+    "/api/deal/export",
+    summary="Потоковая выгрузка сделок",
+    description=(
+        "Переадресация на GET /deal/export: каталог сделок в ndjson/csv (gzip=true — сжатый), "
+        "инкрементально по updated_since (значение для следующей выгрузки — в X-Export-Watermark)"
+    )
+)
+async def deals_export_proxy(request: Request):
+    return await stream_proxy(
+        request,
+        f"{SERVICE_URLS['deal']}/deal/export",
+        EXPORT_REQUEST_HEADERS,
+        EXPORT_PASSTHROUGH_HEADERS,
+        Timeout(30.0, read=None)  # Выгрузка может идти долго
+    )
+
+# Статика (фото, логотипы, аватары) — из media_service, с условными запросами и Range
+STATIC_REQUEST_HEADERS = ("accept-encoding", "range", "if-range", "if-none-match")
+STATIC_PASSTHROUGH_HEADERS = (
+    "content-type", "content-length", "content-encoding", "content-range", "accept-ranges",
+    "cache-control", "etag", "last-modified", "vary", "retry-after",
+)
+
+@app.api_route("/static/{path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def static_proxy(request: Request, path: str):
+    return await stream_proxy(
+        request,
+        f"{SERVICE_URLS['media']}/static/{path}",
+        STATIC_REQUEST_HEADERS,
+        STATIC_PASSTHROUGH_HEADERS,
+        Timeout(30.0, read=None)
+    )
+
 # Проксирование запросов к Deal_Model Service
 @app.api_route(
     "/api/deal/{path:path}",
@@ -277,8 +368,17 @@ async def rating_proxy(
         "- GET /api/deal/deal-branches — получение списка отраслей (ИТ, сельское хозяйство и т.д.)\n"
         "- GET /api/deal/deal-types — получение списка типов сделок (продажа товара или услуга)\n"
         "- GET /api/deal/list — получение списка сделок (по умолчанию 50 сделок на страницу)\n"
+        "- GET /api/deal/list-cursor — лента сделок с курсорной пагинацией (параметры cursor, size)\n"
+        "- GET /api/deal/facets — количество сделок по регионам, отраслям, типам и статусам для фильтров\n"
+        "- GET /api/deal/export — потоковая выгрузка каталога сделок (ndjson/csv, gzip, updated_since)\n"
         "- GET /api/deal/view-deal/{deal_id} — получение информации о конкретной сделке, включая количество покупателей и отзывов\n"
+        "- GET /api/deal/{deal_id}/similar — похожие сделки («с этой сделкой также покупают», параметр limit)\n"
         "- POST /api/deal/create-deal — создание новой сделки (включая загрузку до 5 фотографий)\n"
+        "- POST /api/deal/import — массовый импорт сделок из CSV/NDJSON (в фоне, возвращает job_id)\n"
+        "- GET /api/deal/import/{job_id} — прогресс импорта и ошибки по строкам\n"
+        "- POST /api/deal/saved-searches — сохранение поиска (регион, отрасль, тип, запрос) с уведомлением о новых сделках на email\n"
+        "- GET /api/deal/saved-searches — сохранённые поиски текущего аккаунта\n"
+        "- DELETE /api/deal/saved-searches/{saved_search_id} — удаление сохранённого поиска\n"
         "- PUT /api/deal/update-deal/{deal_id} — обновление данных сделки (включая замену фотографий, максимум 5)\n"
         "- POST /api/deal/buy-deal/{deal_id} — покупка сделки (доступно только для сделок со статусом 'Активно')\n"
     )
@@ -1,8 +1,17 @@
 # deal_service/app/main.py
+import asyncio
+
 from fastapi import FastAPI
-from starlette.staticfiles import StaticFiles
 
-from deal_service.app.routes import deals, feedback, chat
+from deal_service.app.routes import deals, feedback, chat, imports, saved_searches
+from deal_service.app.services.archive import archive_loop
+from deal_service.app.services.counters import reconcile_loop
+from deal_service.app.services.saved_searches import saved_searches_loop
+from deal_service.app.services.similar import similar_deals_loop
+from shared.cache.deal_view import deal_view_listener
+from shared.cache.reference_data import reference_data_listener
+from shared.db.redis import close_redis_pools, redis_pool_stats
+from shared.services.media import LegacyStaticFiles, shutdown_variant_pool, media_gc_loop
 
 
 app = FastAPI(
@@ -12,8 +21,43 @@ app = FastAPI(
 
 # Подключение роутов
 app.include_router(deals.router, prefix="/deal", tags=["deals"])
+app.include_router(imports.router, prefix="/deal", tags=["deals"])
+app.include_router(saved_searches.router, prefix="/deal", tags=["saved searches"])
 app.include_router(feedback.router, prefix="/feedback", tags=["feedback"])
 app.include_router(chat.router, prefix="/chat", tags=["chat"])
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Статика (фото, логотипы) раздаётся отдельным media_service (через шлюз: /static/...).
+# Прежний /static сервиса оставлен, пока клиенты не перейдут на новые URL
+app.mount("/static", LegacyStaticFiles(directory="static"), name="static")
+
+# Метрики пулов соединений Redis
+@app.get("/metrics/redis", include_in_schema=False)
+async def redis_metrics():
+    return {"pools": redis_pool_stats()}
+
+# Фоновые задачи: сверка счётчиков покупок и отзывов сделок, сборка мусора медиахранилища,
+# обновление справочников и сброс карточек сделок в памяти процесса, пересчёт похожих сделок
+@app.on_event("startup")
+async def startup_event():
+    app.state.counters_reconcile = asyncio.create_task(reconcile_loop())
+    app.state.media_gc = asyncio.create_task(media_gc_loop())
+    app.state.reference_data = asyncio.create_task(reference_data_listener())
+    app.state.deal_view = asyncio.create_task(deal_view_listener())
+    app.state.similar_deals = asyncio.create_task(similar_deals_loop())
+    app.state.deal_archive = asyncio.create_task(archive_loop())
+    app.state.saved_searches = asyncio.create_task(saved_searches_loop())
+
+# Закрываем пулы Redis при остановке
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.counters_reconcile.cancel()
+    app.state.media_gc.cancel()
+    app.state.reference_data.cancel()
+    app.state.deal_view.cancel()
+    app.state.similar_deals.cancel()
+    app.state.deal_archive.cancel()
+    app.state.saved_searches.cancel()
+    shutdown_variant_pool()
+    await close_redis_pools()
+
 
@@ -1,7 +1,6 @@
 import asyncio
 import json
 import logging
-import os
 
 from fastapi import WebSocket, WebSocketDisconnect,WebSocketException, APIRouter, Depends, HTTPException, status
 from collections import defaultdict
@@ -15,6 +14,7 @@ from deal_service.app.services.chat import get_token_from_header, verify_token
 from shared.db.models import Account_Model, Deal_Model, Message_Model
 from shared.db.models.deal_consumers import DealConsumers as deal_consumers
 from deal_service.app.schemas.chat import ChatSchema
+from shared.db.redis import get_pubsub_redis
 from shared.db.session import get_db
 from shared.services.auth import get_current_account
 
@@ -143,18 +143,13 @@ async def get_user_chats(
         )
 
 
-async def get_redis() -> Redis:
-    redis_url = os.getenv("REDIS_URL", "redis://redis:6379/0")
-    logger.info(f"Using REDIS_URL: {redis_url}")
-    return Redis.from_url(redis_url, decode_responses=True)
-
 @router.websocket("/ws/deals/{deal_id}/{consumer_id}")
 async def websocket_chat(
     websocket: WebSocket,
     deal_id: int,
     consumer_id: int,
     db: AsyncSession = Depends(get_db),
-    redis: Redis = Depends(get_redis)
+    redis: Redis = Depends(get_pubsub_redis)
 ):
     """
     WebSocket для двухстороннего чата по сделке между продавцом и любым пользователем.
@@ -348,6 +343,8 @@ async def websocket_chat(
         if pubsub:
             try:
                 await pubsub.unsubscribe(f"deal:{deal_id}:consumer:{consumer_id}")
+                # Возвращаем соединение подписки в пул
+                await pubsub.aclose()
             except Exception:
                 pass
         if current_account:
@@ -1,33 +1,54 @@
 # deal_service/app/routes/deal.py
-import os
-import shutil
-import uuid
-from pathlib import Path
+import base64
+import hashlib
+import json
+import logging
+from datetime import datetime
 
 
-from fastapi import APIRouter, Depends, HTTPException, status, Form, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, Form, UploadFile, File, Query
 from fastapi_pagination import Page, add_pagination
 from fastapi_pagination.ext.sqlalchemy import paginate
-from sqlalchemy import select, func, case
+from sqlalchemy import select, insert, literal, func, case, or_, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
-from sqlalchemy.orm import joinedload
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy.orm import joinedload, lazyload
 from starlette.background import BackgroundTasks
-
-from deal_service.app.services.deals import send_purchase_email
-from shared.db.models import Account_Model, Region, DealBranch, DealDetail, DealTypes, Feedback_Model
+from starlette.responses import StreamingResponse
+
+from deal_service.app.services.counters import increment_order_count
+from deal_service.app.services.deals import send_purchase_email, apply_deal_filters, count_facets
+from deal_service.app.services.saved_searches import enqueue_new_deal
+from deal_service.app.services.similar import SIMILAR_TOP_K, get_similar, mark_similar_dirty
+from deal_service.app.services.export import (
+    stream_deals_export, export_watermark, export_file_name, export_media_type
+)
+from shared.cache.deal_view import get_cached_deal, deal_generation, cache_deal, invalidate_deal
+from shared.cache.reference_data import ReferenceData, get_reference_data
+from shared.cache.namespace import (
+    DEAL_FACETS_CACHE, invalidate_rankings, mark_ranking_dirty, invalidate_deal_facets
+)
+from shared.db.models import Account_Model
 from shared.db.models.deal_consumers import DealConsumers
+from shared.db.redis import get_redis
 from shared.db.session import get_db
 from shared.services.auth import get_current_account
+from shared.services.media import (
+    store_uploads, acquire_media, release_media, replace_media, variant_urls, thumbnail_url
+)
+from shared.services.uploads import check_uploads
 from shared.db.models.deals import Deal_Model
-from deal_service.app.schemas.deal import Deal
-import aiofiles
-import aiofiles.os as aio_os
-import aiofiles.ospath as aio_ospath
+from deal_service.app.schemas.deal import Deal, DealCursorPage, DealFacets, SimilarDeal
 
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
+
+FACETS_CACHE_TTL = 60  # Фасеты живут недолго: счётчики должны быстро догонять каталог
+
 @router.get(
     "/regions",
     response_model=list[dict],
@@ -36,11 +57,9 @@ router = APIRouter()
         "Для фильтров выборка по регионам"
     )
 )
-async def get_regions(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Region.id, Region.name))
-    regions = result.all()
-    # Преобразуем к формату [{"id": 1, "name": "Название"}, ...]
-    return [{"id": r[0], "name": r[1]} for r in regions]
+async def get_regions(reference: ReferenceData = Depends(get_reference_data)):
+    # Справочники отдаются из памяти процесса, см. shared/cache/reference_data.py
+    return ReferenceData.as_list(reference.regions)
 
 @router.get(
     "/deal-details",
@@ -50,10 +69,8 @@ async def get_regions(db: AsyncSession = Depends(get_db)):
         "Активно/Продано и т.д., см в seed_deal_details"
     )
 )
-async def get_deal_details(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(DealDetail.id, DealDetail.detail))
-    details = result.all()
-    return [{"id": r[0], "name": r[1]} for r in details]
+async def get_deal_details(reference: ReferenceData = Depends(get_reference_data)):
+    return ReferenceData.as_list(reference.statuses)
 
 @router.get(
     "/deal-branches",
@@ -63,10 +80,8 @@ async def get_deal_details(db: AsyncSession = Depends(get_db)):
         "ИТ/сельское хозяйство и т.д., см в seed_deal_branches"
     )
 )
-async def get_deal_branches(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(DealBranch.id, DealBranch.name))
-    branches = result.all()
-    return [{"id": r[0], "name": r[1]} for r in branches]
+async def get_deal_branches(reference: ReferenceData = Depends(get_reference_data)):
+    return ReferenceData.as_list(reference.branches)
 
 @router.get(
     "/deal-types",
@@ -76,10 +91,35 @@ async def get_deal_branches(db: AsyncSession = Depends(get_db)):
         "Тут только 2 состояние: Продажа товара или услуга"
     )
 )
-async def get_deal_types(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(DealTypes.id, DealTypes.name))
-    types = result.all()
-    return [{"id": r[0], "name": r[1]} for r in types]
+async def get_deal_types(reference: ReferenceData = Depends(get_reference_data)):
+    return ReferenceData.as_list(reference.types)
+
+
+def _to_deal_schemas(deals: List[Deal_Model]) -> List[Deal]:
+    """Сделки в схемы ответа (счётчики покупок и отзывов хранятся в строке сделки)."""
+    return [
+        Deal(
+            id=deal.id,
+            name_deal=deal.name_deal,
+            seller_id=deal.seller_id,
+            seller_price=deal.seller_price,
+            YAMS_percent=deal.YAMS_percent,
+            total_cost=deal.total_cost,
+            region_id=deal.region_id,
+            address_deal=deal.address_deal,
+            date_close=deal.date_close,
+            photos_url=deal.photos_url,
+            deal_type_id=deal.deal_type_id,
+            deal_details_id=deal.deal_details_id,
+            deal_branch_id=deal.deal_branch_id,
+            created_at=deal.created_at,
+            order_count=deal.order_count,
+            feedback_count=deal.feedback_count,
+            photos_variants=deal.photos_variants,
+            thumbnails_url=[thumbnail_url(url) for url in deal.photos_url or []]
+        )
+        for deal in deals
+    ]
 
 
 @router.get(
@@ -88,7 +128,9 @@ async def get_deal_types(db: AsyncSession = Depends(get_db)):
     summary="GET на получение сделок",
     description=(
         "Возвращает сделки по 50 на страницу. Есть фильтрация по региону, типу сделки, отрасли сделки и поиск. "
-        "Сделки сортируются с приоритетом по региону текущего пользователя, если регион указан."
+        "Сделки сортируются с приоритетом по региону текущего пользователя, если регион указан. "
+        "Поиск полнотекстовый (название, отрасль, адрес; морфология русского языка, допускает опечатки в названии), "
+        "результаты поиска сортируются по релевантности. sort_by_popularity=true — сначала самые покупаемые."
     )
 )
 async def list_deals(
@@ -97,6 +139,7 @@ async def list_deals(
     deal_type_id: Optional[int] = None,
     search: Optional[str] = None,
     sort_by_region: bool = True,
+    sort_by_popularity: bool = False,
     db: AsyncSession = Depends(get_db),
     current_account: Account_Model = Depends(get_current_account)
 ):
@@ -107,17 +150,21 @@ async def list_deals(
     )
 
     # Применяем фильтры
-    if region_id is not None:
-        stmt = stmt.where(Deal_Model.region_id == region_id)
-    if deal_branch_id is not None:
-        stmt = stmt.where(Deal_Model.deal_branch_id == deal_branch_id)
-    if search:
-        stmt = stmt.where(Deal_Model.name_deal.ilike(f"%{search}%"))
-    if deal_type_id is not None:
-        stmt = stmt.where(Deal_Model.deal_type_id == deal_type_id)
-
+    stmt = apply_deal_filters(stmt, region_id, deal_branch_id, deal_type_id, search)
+
+    if sort_by_popularity:
+        # По индексу (order_count, id)
+        stmt = stmt.order_by(Deal_Model.order_count.desc(), Deal_Model.id.desc())
+    elif search:
+        # Сначала наиболее релевантные, затем более свежие
+        ts_query = func.websearch_to_tsquery("russian", search)
+        stmt = stmt.order_by(
+            func.ts_rank(Deal_Model.search_vector, ts_query).desc(),
+            func.similarity(Deal_Model.name_deal, search).desc(),
+            Deal_Model.created_at.desc()
+        )
     # Сортировка по региону текущего пользователя
-    if sort_by_region and current_account.region_id is not None:
+    elif sort_by_region and current_account.region_id is not None:
         is_same_region = case(
             (Deal_Model.region_id == current_account.region_id, 1),
             else_=0
@@ -129,45 +176,171 @@ async def list_deals(
     # Пагинация
     deals_page = await paginate(db, stmt)
 
-    # Подсчитываем количество покупок
-    deal_ids = [deal.id for deal in deals_page.items]
-    order_counts = {}
-    if deal_ids:
-        count_stmt = (
-            select(DealConsumers.c.deal_id, func.count().label("order_count"))
-            .where(DealConsumers.c.deal_id.in_(deal_ids))
-            .group_by(DealConsumers.c.deal_id)
-        )
-        count_result = await db.execute(count_stmt)
-        order_counts = dict(count_result.all())
-
     # Формируем ответ
-    deals_page.items = [
-        Deal(
-            id=deal.id,
-            name_deal=deal.name_deal,
-            seller_id=deal.seller_id,
-            seller_price=deal.seller_price,
-            YAMS_percent=deal.YAMS_percent,
-            total_cost=deal.total_cost,
-            region_id=deal.region_id,
-            address_deal=deal.address_deal,
-            date_close=deal.date_close,
-            photos_url=deal.photos_url,
-            deal_type_id=deal.deal_type_id,
-            deal_details_id=deal.deal_details_id,
-            deal_branch_id=deal.deal_branch_id,
-            created_at=deal.created_at,
-            order_count=order_counts.get(deal.id, 0)
-        )
-        for deal in deals_page.items
-    ]
+    deals_page.items = _to_deal_schemas(deals_page.items)
 
     return deals_page
 
+
+def _encode_cursor(phase: int, created_at: datetime, deal_id: int) -> str:
+    payload = json.dumps([phase, created_at.isoformat(), deal_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[int, datetime, int]:
+    try:
+        phase, created_at, deal_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return int(phase), datetime.fromisoformat(created_at), int(deal_id)
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail="Некорректный курсор") from e
+
+
+@router.get(
+    "/list-cursor",
+    response_model=DealCursorPage,
+    summary="GET на получение сделок с курсорной пагинацией",
+    description=(
+        "Бесконечная лента сделок: каждая следующая страница запрашивается по next_cursor из предыдущего ответа "
+        "и выбирается за постоянное время (без OFFSET и COUNT). Фильтры те же, что в /list. "
+        "Сначала сделки региона текущего пользователя, затем остальные, внутри — от новых к старым "
+        "(при поиске тоже по дате, а не по релевантности)."
+    )
+)
+async def list_deals_cursor(
+    region_id: Optional[int] = None,
+    deal_branch_id: Optional[int] = None,
+    deal_type_id: Optional[int] = None,
+    search: Optional[str] = None,
+    sort_by_region: bool = True,
+    cursor: Optional[str] = Query(None, description="next_cursor из предыдущей страницы"),
+    size: int = Query(50, ge=1, le=100, description="Размер страницы"),
+    db: AsyncSession = Depends(get_db),
+    current_account: Account_Model = Depends(get_current_account)
+):
+    after = _decode_cursor(cursor) if cursor else None
+
+    stmt = select(Deal_Model).options(
+        joinedload(Deal_Model.region),
+        joinedload(Deal_Model.deal_branch),
+        joinedload(Deal_Model.deal_type)
+    )
+    stmt = apply_deal_filters(stmt, region_id, deal_branch_id, deal_type_id, search)
+
+    # Фазы сортировки: 1 — регион пользователя, 0 — остальные.
+    # Внутри фазы ключ (created_at, id) по убыванию — его покрывает индекс (region_id, created_at, id)
+    user_region_id = current_account.region_id if sort_by_region and region_id is None else None
+    if user_region_id is not None:
+        phases = [
+            (1, Deal_Model.region_id == user_region_id),
+            (0, or_(Deal_Model.region_id != user_region_id, Deal_Model.region_id.is_(None))),
+        ]
+    else:
+        phases = [(0, None)]
+
+    rows: List[Tuple[int, Deal_Model]] = []
+    for phase, condition in phases:
+        if after and phase > after[0]:
+            continue  # Эта фаза уже пройдена на предыдущих страницах
+        phase_stmt = stmt if condition is None else stmt.where(condition)
+        if after and phase == after[0]:
+            phase_stmt = phase_stmt.where(
+                tuple_(Deal_Model.created_at, Deal_Model.id) < tuple_(after[1], after[2])
+            )
+        # Берём на одну запись больше, чтобы узнать, есть ли следующая страница
+        phase_stmt = phase_stmt.order_by(Deal_Model.created_at.desc(), Deal_Model.id.desc()).limit(size + 1 - len(rows))
+        result = await db.execute(phase_stmt)
+        rows.extend((phase, deal) for deal in result.unique().scalars().all())
+        if len(rows) > size:
+            break
+
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        last_phase, last_deal = rows[-1]
+        next_cursor = _encode_cursor(last_phase, last_deal.created_at, last_deal.id)
+
+    return DealCursorPage(
+        items=_to_deal_schemas([deal for _, deal in rows]),
+        next_cursor=next_cursor
+    )
+
 # Добавляем пагинацию к роутеру
 add_pagination(router)
 
+@router.get(
+    "/facets",
+    response_model=DealFacets,
+    summary="GET на количество сделок по фильтрам",
+    description=(
+        "Количество сделок по регионам, отраслям, типам и статусам для текущих фильтров и поиска. "
+        "Считается одним запросом (GROUPING SETS) и кэшируется на короткое время."
+    )
+)
+async def get_deal_facets(
+    region_id: Optional[int] = None,
+    deal_branch_id: Optional[int] = None,
+    deal_type_id: Optional[int] = None,
+    search: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis)
+):
+    search = search.strip() if search else None
+    # Сигнатура фильтров: текст поиска хэшируем, чтобы ключ был ограниченной длины
+    search_hash = hashlib.sha1(search.lower().encode()).hexdigest() if search else "none"
+    cache_key = None
+    try:
+        cache_key = await DEAL_FACETS_CACHE.key(
+            redis, f"region_{region_id or 'all'}", f"branch_{deal_branch_id or 'all'}",
+            f"type_{deal_type_id or 'all'}", f"search_{search_hash}"
+        )
+        cached = await DEAL_FACETS_CACHE.get(redis, cache_key)
+        if cached:
+            return DealFacets(**json.loads(cached))
+    except RedisError as e:
+        logger.warning(f"Кэш фасетов сделок недоступен: {str(e)}")
+
+    facets = await count_facets(db, region_id, deal_branch_id, deal_type_id, search)
+
+    if cache_key is not None:
+        try:
+            await DEAL_FACETS_CACHE.set(redis, cache_key, json.dumps(facets), FACETS_CACHE_TTL)
+        except RedisError as e:
+            logger.warning(f"Не удалось сохранить фасеты сделок в кэш: {str(e)}")
+    return DealFacets(**facets)
+
+@router.get(
+    "/export",
+    summary="GET на выгрузку каталога сделок",
+    description=(
+        "Потоковая выгрузка сделок (с названиями региона, отрасли, типа, статуса и счётчиками) "
+        "в формате ndjson или csv, gzip=true — сжатый файл. Фильтры те же, что у /list. "
+        "updated_since — только сделки, изменённые после указанного времени; значение для "
+        "следующей инкрементальной выгрузки возвращается в заголовке X-Export-Watermark. "
+        "Удалённые и архивированные сделки в инкрементальную выгрузку не попадают — "
+        "для их учёта нужна полная выгрузка."
+    )
+)
+async def export_deals(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    gzip: bool = False,
+    region_id: Optional[int] = None,
+    deal_branch_id: Optional[int] = None,
+    deal_type_id: Optional[int] = None,
+    search: Optional[str] = None,
+    updated_since: Optional[datetime] = None,
+    current_account: Account_Model = Depends(get_current_account)
+):
+    search = search.strip() if search else None
+    watermark = await export_watermark()
+    return StreamingResponse(
+        stream_deals_export(export_format, gzip, region_id, deal_branch_id, deal_type_id, search, updated_since),
+        media_type=export_media_type(export_format, gzip),
+        headers={
+            "Content-Disposition": f'attachment; filename="{export_file_name(export_format, gzip)}"',
+            "X-Export-Watermark": watermark.isoformat(),
+        }
+    )
+
 @router.get(
     "/view-deal/{deal_id}",
     response_model=Deal,
@@ -178,61 +351,78 @@ add_pagination(router)
 )
 async def view_deal(
     deal_id: int,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis)
 ):
-    # Получаем сделку с дополнительной информацией
-    stmt = select(Deal_Model).options(
-        joinedload(Deal_Model.region),
-        joinedload(Deal_Model.deal_branch),
-        joinedload(Deal_Model.deal_type),
-        joinedload(Deal_Model.deal_details),
-        joinedload(Deal_Model.seller)
-    ).where(Deal_Model.id == deal_id)
-
-    result = await db.execute(stmt)
-    deal = result.unique().scalar_one_or_none()  # Используем unique() из-за joinedload
+    # Карточка читается из кэша; сбрасывается через invalidate_deal при любых изменениях
+    cached = await get_cached_deal(redis, deal_id)
+    if cached is not None:
+        return Deal(**cached)
+    # Поколение — до чтения из БД, чтобы не закэшировать карточку, сброшенную во время запроса
+    generation = await deal_generation(redis, deal_id)
+
+    # В ответ идут только поля самой сделки (счётчики денормализованы) — связи не подгружаем
+    # (seller по умолчанию lazy="joined" — отключаем, JOIN с accounts не нужен)
+    result = await db.execute(
+        select(Deal_Model).where(Deal_Model.id == deal_id).options(lazyload(Deal_Model.seller))
+    )
+    deal = result.scalar_one_or_none()
 
     if not deal:
         raise HTTPException(status_code=404, detail="Сделка не найдена")
 
-    # Подсчитываем количество покупателей (order_count)
-    count_stmt = (
-        select(func.count())
-        .select_from(DealConsumers)
-        .where(DealConsumers.c.deal_id == deal_id)
-    )
-    count_result = await db.execute(count_stmt)
-    order_count = count_result.scalar() or 0  # 0, если покупателей нет
-
-    # Подсчитываем количество отзывов (feedback_count)
-    feedback_stmt = (
-        select(func.count())
-        .select_from(Feedback_Model)  # Используем модель Feedback_Model
-        .where(Feedback_Model.deal_id == deal_id)
-    )
-    feedback_result = await db.execute(feedback_stmt)
-    feedback_count = feedback_result.scalar() or 0  # 0, если отзывов нет
-
     # Формируем ответ
-    return Deal(
-        id=deal.id,
-        name_deal=deal.name_deal,
-        seller_id=deal.seller_id,
-        seller_price=deal.seller_price,
-        YAMS_percent=deal.YAMS_percent,
-        total_cost=deal.total_cost,
-        region_id=deal.region_id,
-        address_deal=deal.address_deal,
-        date_close=deal.date_close,
-        photos_url=deal.photos_url,
-        deal_type_id=deal.deal_type_id,
-        deal_details_id=deal.deal_details_id,
-        deal_branch_id=deal.deal_branch_id,
-        created_at=deal.created_at,
-        order_count=order_count,  # Количество покупателей
-        feedback_count=feedback_count  # Количество отзывов
-    )
+    response = _to_deal_schemas([deal])[0]
+    await cache_deal(redis, deal_id, response.model_dump(mode="json"), generation)
+    return response
 
+@router.get(
+    "/{deal_id}/similar",
+    response_model=List[SimilarDeal],
+    summary="GET на похожие сделки («с этой сделкой также покупают»)",
+    description=(
+        "Сделки, которые чаще всего покупают те же покупатели (косинусная близость по покупкам). "
+        "Списки предрассчитываются в фоне; возвращаются только активные сделки."
+    )
+)
+async def similar_deals(
+    deal_id: int,
+    limit: int = Query(10, ge=1, le=SIMILAR_TOP_K),
+    db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis),
+    reference: ReferenceData = Depends(get_reference_data)
+):
+    try:
+        similar = await get_similar(redis, deal_id)
+    except RedisError as e:
+        logger.warning(f"Похожие сделки для {deal_id} недоступны: {str(e)}")
+        return []
+    if not similar:
+        return []
+
+    # Один запрос по первичному ключу на K сделок списка
+    scores = dict(similar)
+    result = await db.execute(
+        select(
+            Deal_Model.id, Deal_Model.name_deal, Deal_Model.total_cost, Deal_Model.photos_url
+        ).where(Deal_Model.id.in_(list(scores)), Deal_Model.deal_details_id == reference.status_id("Активно"))
+    )
+    deals = {row.id: row for row in result.all()}
+    items = []
+    for similar_id, score in similar:
+        row = deals.get(similar_id)
+        if row is None:
+            continue
+        items.append(SimilarDeal(
+            id=row.id,
+            name_deal=row.name_deal,
+            total_cost=row.total_cost,
+            thumbnail_url=thumbnail_url(row.photos_url[0]) if row.photos_url else None,
+            score=score,
+        ))
+        if len(items) == limit:
+            break
+    return items
 
 @router.post(
     "/create-deal",
@@ -252,7 +442,9 @@ async def create_deal(
     deal_branch_id: int = Form(...),
     photos: List[UploadFile] = File(default_factory=list),  # Список файлов, по умолчанию пустой
     db: AsyncSession = Depends(get_db),
-    current_account: Account_Model = Depends(get_current_account)
+    current_account: Account_Model = Depends(get_current_account),
+    redis: Redis = Depends(get_redis),
+    reference: ReferenceData = Depends(get_reference_data)
 ):
     # Проверка роли
     if current_account.role != "company":
@@ -261,27 +453,15 @@ async def create_deal(
             detail="У вас нет прав на создание сделки"
         )
 
-    # Проверка существования региона
-    region = await db.execute(select(Region).where(Region.id == region_id))
-    if not region.scalar():
+    # Проверка справочных значений — по снимку в памяти, без запросов к БД
+    if region_id not in reference.regions:
         raise HTTPException(400, "Указанный регион не существует")
-
-    # Проверка существования отрасли
-    branch = await db.execute(select(DealBranch).where(DealBranch.id == deal_branch_id))
-    if not branch.scalar():
+    if deal_branch_id not in reference.branches:
         raise HTTPException(400, "Указанная отрасль не существует")
-
-    # Получаем ID статуса "Активно"
-    status_result = await db.execute(
-        select(DealDetail.id).where(DealDetail.detail == "Активно")
-    )
-    active_status_id = status_result.scalar()
+    active_status_id = reference.status_id("Активно")
     if not active_status_id:
         raise HTTPException(500, "Статус 'Активно' не найден")
-
-    # Проверяем существование типа сделки
-    deal_type = await db.execute(select(DealTypes).where(DealTypes.id == deal_type_id))
-    if not deal_type.scalar():
+    if deal_type_id not in reference.types:
         raise HTTPException(400, "Указанный тип сделки не существует")
 
     # Валидация адреса
@@ -291,12 +471,14 @@ async def create_deal(
     if not parts[0] or not parts[1] or not parts[2]:
         raise HTTPException(400, "Город, улица и дом должны быть указаны")
 
-    # Проверка количества файлов
-    if len(photos) > 5:
-        raise HTTPException(400, "Нельзя загрузить больше 5 фотографий")
+    # Проверка количества, формата и заявленного размера файлов до загрузки
+    photos = check_uploads(photos)
+
+    # Фото сохраняются в медиахранилище (имя — хэш содержимого), поэтому не зависят от ID сделки
+    photo_urls = await store_uploads(photos)
 
     yams_percent = round(seller_price * 0.03, 2)
-    # Создаём сделку без фото
+    # Создаём сделку сразу с фото
     new_deal = Deal_Model(
         name_deal=name_deal,
         seller_id=current_account.id,
@@ -306,59 +488,24 @@ async def create_deal(
         region_id=region_id,
         address_deal=address_deal,
         date_close=None,
-        photos_url=[],  # Инициализируем пустым списком
+        photos_url=photo_urls,
+        photos_variants=[variant_urls(url) for url in photo_urls],
         deal_type_id=deal_type_id,
         deal_details_id=active_status_id,
         deal_branch_id=deal_branch_id
     )
     db.add(new_deal)
+    await acquire_media(db, photo_urls)
     await db.commit()
     await db.refresh(new_deal)
 
-    # Обработка фото
-    saved_paths = []
-    if photos:  # Проверяем, что photos не пустой список
-        folder_path = Path(f"static/deals/{new_deal.id}")
-        folder_path.mkdir(parents=True, exist_ok=True)
-
-        for photo in photos:
-            if not photo.filename:  # Пропускаем пустые файлы
-                continue
-
-            ext = Path(photo.filename).suffix
-            filename = f"{uuid.uuid4().hex}{ext}"
-            full_path = folder_path / filename
-
-            try:
-                with open(full_path, "wb") as f:
-                    content = await photo.read()
-                    f.write(content)
-            except Exception as e:
-                raise HTTPException(500, f"Ошибка при сохранении файла {photo.filename}: {str(e)}")
-
-            saved_paths.append(f"/{full_path.as_posix()}")
-
-        # Обновим пути к фото в сделке
-        new_deal.photos_url = saved_paths
-        await db.commit()
-        await db.refresh(new_deal)
-
-    return Deal(
-        id=new_deal.id,
-        name_deal=new_deal.name_deal,
-        seller_id=new_deal.seller_id,
-        seller_price=new_deal.seller_price,
-        YAMS_percent=new_deal.YAMS_percent,
-        total_cost=new_deal.total_cost,
-        region_id=new_deal.region_id,
-        address_deal=new_deal.address_deal,
-        date_close=new_deal.date_close,
-        photos_url=new_deal.photos_url,
-        deal_type_id=new_deal.deal_type_id,
-        deal_details_id=new_deal.deal_details_id,
-        deal_branch_id=new_deal.deal_branch_id,
-        created_at=new_deal.created_at,
-    )
+    # Количество сделок продавца входит в рейтинг компаний
+    await mark_ranking_dirty(redis, current_account.id)
+    await invalidate_deal_facets(redis)
+    # Сопоставление с сохранёнными поисками и письма — в фоне
+    await enqueue_new_deal(redis, new_deal.id)
+
+    return _to_deal_schemas([new_deal])[0]
 
 @router.put(
     "/update-deal/{deal_id}",
@@ -380,7 +527,9 @@ async def update_deal(
     deal_details_id: Optional[int] = Form(None),
     photos: List[UploadFile] = File(default_factory=list),  # Изменяем на List с default_factory
     db: AsyncSession = Depends(get_db),
-    current_account: Account_Model = Depends(get_current_account)
+    current_account: Account_Model = Depends(get_current_account),
+    redis: Redis = Depends(get_redis),
+    reference: ReferenceData = Depends(get_reference_data)
 ):
     # Получаем сделку
     result = await db.execute(
@@ -408,6 +557,8 @@ async def update_deal(
         deal.YAMS_percent = yams_percent
         deal.total_cost = seller_price + yams_percent
     if region_id is not None:
+        if region_id not in reference.regions:
+            raise HTTPException(400, "Указанный регион не существует")
         deal.region_id = region_id
     if address_deal is not None:
         # Валидация адреса
@@ -418,11 +569,8 @@ async def update_deal(
             raise HTTPException(400, "Город, улица и дом должны быть указаны")
         deal.address_deal = address_deal
     if deal_details_id is not None:
-        # Получаем строковое значение нового статуса
-        status_result = await db.execute(
-            select(DealDetail.detail).where(DealDetail.id == deal_details_id)
-        )
-        new_status = status_result.scalar()
+        # Строковое значение нового статуса и тип сделки — из справочников в памяти
+        new_status = reference.statuses.get(deal_details_id)
 
         if not new_status:
             raise HTTPException(400, detail="Недопустимый ID статуса")
@@ -432,10 +580,7 @@ async def update_deal(
         allowed_for_sale = ["Продано вне YAMS", "Продано (YAMS)"]
         allowed_for_service = ["Услуга закрыта"]
 
-        deal_type_result = await db.execute(
-            select(DealTypes.name).where(DealTypes.id == deal.deal_type_id)
-        )
-        deal_type_name = deal_type_result.scalar()
+        deal_type_name = reference.types.get(deal.deal_type_id)
 
         if new_status in allowed_common:
             pass
@@ -458,82 +603,22 @@ async def update_deal(
 
         deal.deal_details_id = deal_details_id
 
-        # Обработка фото
-    if photos is not None and photos:  # Проверяем, что photos не None и не пустой список
-        # Валидация количества фотографий
-        if len(photos) > 5:
-            raise HTTPException(400, "Нельзя загрузить больше 5 фотографий")
-
-        # Валидация формата и размера
-        ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png"}
-        MAX_FILE_SIZE = 5 * 1024 * 1024  # 5 МБ
-
-        for photo in photos:
-            if not photo.filename:
-                continue
-            ext = Path(photo.filename).suffix.lower()
-            if ext not in ALLOWED_EXTENSIONS:
-                raise HTTPException(
-                    400,
-                    f"Файл {photo.filename} имеет недопустимый формат. Разрешённые форматы: {ALLOWED_EXTENSIONS}"
-                )
-            if photo.size > MAX_FILE_SIZE:
-                raise HTTPException(400, f"Файл {photo.filename} превышает 5 МБ")
-
-        # Создаём папку для фотографий
-        folder_path = Path(f"static/deals/{deal.id}")
-        try:
-            # Создаём папку, если её нет
-            await aio_os.makedirs(folder_path, exist_ok=True)
-
-            # Удаляем старые файлы, если они есть
-            if await aio_ospath.exists(folder_path):
-                for file in folder_path.iterdir():
-                    if file.is_file():
-                        await aio_os.remove(file)  # Удаляем только файлы, а не папку
-
-            saved_photo_urls = []
-
-            # Сохраняем новые фотографии
-            for photo in photos:
-                if not photo.filename:
-                    continue
-                ext = Path(photo.filename).suffix
-                filename = f"{uuid.uuid4().hex}{ext}"
-                file_path = folder_path / filename
-
-                async with aiofiles.open(file_path, "wb") as out_file:
-                    content = await photo.read()
-                    await out_file.write(content)
-
-                saved_photo_urls.append(f"/{file_path.as_posix()}")
-
-            # Обновляем пути в модели
-            deal.photos_url = saved_photo_urls
-
-        except Exception as e:
-            raise HTTPException(500, f"Ошибка при сохранении фотографий: {str(e)}")
+    # Обработка фото: новые файлы — в медиахранилище, старые освобождает сборщик мусора
+    photos = check_uploads(photos)
+    if photos:
+        photo_urls = await store_uploads(photos)
+        await replace_media(db, deal.photos_url or [], photo_urls)
+        deal.photos_url = photo_urls
+        deal.photos_variants = [variant_urls(url) for url in photo_urls]
 
     await db.commit()
     await db.refresh(deal)
 
-    return Deal(
-        id=deal.id,
-        name_deal=deal.name_deal,
-        seller_id=deal.seller_id,
-        seller_price=deal.seller_price,
-        YAMS_percent=deal.YAMS_percent,
-        total_cost=deal.total_cost,
-        region_id=deal.region_id,
-        address_deal=deal.address_deal,
-        date_close=deal.date_close,
-        photos_url=deal.photos_url,
-        deal_type_id=deal.deal_type_id,
-        deal_details_id=deal.deal_details_id,
-        deal_branch_id=deal.deal_branch_id,
-        created_at=deal.created_at,
-        order_count=None  # Указываем order_count как None, если его нет в модели
-    )
+    await invalidate_deal(redis, deal.id)
+    # Регион и статус сделки входят в фасеты каталога
+    await invalidate_deal_facets(redis)
+
+    return _to_deal_schemas([deal])[0]
 
 @router.post(
     "/buy-deal/{deal_id}",
@@ -547,47 +632,68 @@ async def buy_deal(
     deal_id: int,
     background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
-    current_account: Account_Model = Depends(get_current_account)
+    current_account: Account_Model = Depends(get_current_account),
+    redis: Redis = Depends(get_redis),
+    reference: ReferenceData = Depends(get_reference_data)
 ):
-    # Получаем сделку
+    # Только нужные поля сделки — без загрузки списка покупателей; статус по справочнику в памяти
     result = await db.execute(
-        select(Deal_Model)
-        .options(joinedload(Deal_Model.consumers), joinedload(Deal_Model.deal_details))
-        .filter(Deal_Model.id == deal_id)
+        select(
+            Deal_Model.id, Deal_Model.seller_id, Deal_Model.name_deal,
+            Deal_Model.seller_price, Deal_Model.YAMS_percent, Deal_Model.deal_details_id
+        )
+        .where(Deal_Model.id == deal_id)
     )
-    result = result.unique()
-    deal = result.scalar_one_or_none()
+    deal = result.one_or_none()
     if not deal:
         raise HTTPException(404, detail="Сделка не найдена")
+    deal_status = reference.statuses.get(deal.deal_details_id)
 
     # Проверка, что покупатель не продавец
     if deal.seller_id == current_account.id:
         raise HTTPException(403, detail="Нельзя купить собственную сделку")
 
     # Проверка текущего статуса сделки
-    if deal.deal_details.detail != "Активно":
+    if deal_status != "Активно":
         raise HTTPException(
             status_code=400,
-            detail=f"Покупка возможна только для сделок в статусе 'Активно'. Текущий статус: '{deal.deal_details.detail}'"
+            detail=f"Покупка возможна только для сделок в статусе 'Активно'. Текущий статус: '{deal_status}'"
         )
 
-    # Добавляем текущего пользователя в список покупателей
-    # Разрешаем повторную покупку, поэтому не проверяем, есть ли пользователь в списке
-    deal.consumers.append(current_account)
+    # Чек отправляется на email текущего аккаунта
+    if not current_account.email:
+        raise HTTPException(500, detail="Не удалось получить email покупателя")
+
+    # Повторная покупка разрешена — просто добавляем запись о покупке.
+    # Статус проверяется повторно в самом INSERT: сделку могли закрыть после проверки выше
+    purchase = await db.execute(
+        insert(DealConsumers)
+        .from_select(
+            ["deal_id", "consumer_id"],
+            select(Deal_Model.id, literal(current_account.id)).where(
+                Deal_Model.id == deal_id, Deal_Model.deal_details_id == deal.deal_details_id
+            )
+        )
+        .returning(DealConsumers.c.id)
+    )
+    if purchase.scalar_one_or_none() is None:
+        await db.rollback()
+        raise HTTPException(400, detail="Статус сделки изменился, покупка невозможна")
+    await increment_order_count(db, deal.id)
 
     await db.commit()
-    await db.refresh(deal)
 
-    # Получаем email покупателя
-    buyer_result = await db.execute(select(Account_Model).filter(Account_Model.id == current_account.id))
-    buyer = buyer_result.scalar_one_or_none()
-    if not buyer or not buyer.email:
-        raise HTTPException(500, detail="Не удалось получить email покупателя")
+    # Изменилось количество покупателей в карточке
+    await invalidate_deal(redis, deal.id)
+    # Повторные покупки влияют на рейтинг продавца
+    await mark_ranking_dirty(redis, deal.seller_id)
+    # Новая совместная покупка — пересчитать похожие сделки
+    await mark_similar_dirty(redis, deal.id)
 
-    # Отправка письма с чеком
+    # Отправка письма с чеком (данные сделки и покупателя уже загружены)
     background_tasks.add_task(
         send_purchase_email,
-        buyer.email,
+        current_account.email,
         deal.name_deal,
         deal.seller_price,
         deal.YAMS_percent
@@ -605,7 +711,8 @@ async def buy_deal(
 async def delete_deal(
         deal_id: int,
         db: AsyncSession = Depends(get_db),
-        current_account: Account_Model = Depends(get_current_account)
+        current_account: Account_Model = Depends(get_current_account),
+        redis: Redis = Depends(get_redis)
 ):
     result = await db.execute(select(Deal_Model).filter(Deal_Model.id == deal_id))
     deal = result.scalar_one_or_none()
@@ -619,10 +726,11 @@ async def delete_deal(
             detail="Нет прав для удаления сделки"
         )
 
-    photos_folder = f"static/deals/{deal_id}"
-    if os.path.exists(photos_folder):
-        shutil.rmtree(photos_folder)
-
+    # Файлы фото удалит сборщик мусора, когда на них не останется ссылок
+    await release_media(db, deal.photos_url or [])
     await db.delete(deal)
     await db.commit()
+    await invalidate_deal(redis, deal_id)
+    await invalidate_rankings(redis)
+    await invalidate_deal_facets(redis)
     return {"message": f"Сделка с id={deal_id} удалена успешно"}
\ No newline at end of file
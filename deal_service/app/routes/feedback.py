@@ -1,7 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
+from deal_service.app.services.counters import change_feedback_count
+from shared.cache.deal_view import invalidate_deal
+from shared.cache.namespace import mark_ranking_dirty
+from shared.db.redis import get_redis
 from shared.db.session import get_db
 from shared.moderation.profanity_filter import filter
 from shared.services.auth import get_current_account
@@ -55,7 +60,8 @@ async def create_feedback(
     feedback_data: FeedbackCreate,
     deal_id: int,  # Добавляем deal_id как параметр пути
     db: AsyncSession = Depends(get_db),
-    current_account: Account_Model = Depends(get_current_account)
+    current_account: Account_Model = Depends(get_current_account),
+    redis: Redis = Depends(get_redis)
 ):
     # Получаем сделку
     deal_result = await db.execute(
@@ -113,7 +119,12 @@ async def create_feedback(
     )
 
     db.add(new_feedback)
+    await change_feedback_count(db, deal_id, 1)
     await db.commit()
     await db.refresh(new_feedback)
 
+    # Отзыв меняет счётчик в карточке сделки, среднюю оценку и количество отзывов продавца
+    await invalidate_deal(redis, deal_id)
+    await mark_ranking_dirty(redis, deal.seller_id)
+
     return new_feedback
\ No newline at end of file
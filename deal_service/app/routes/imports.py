@@ -0,0 +1,61 @@
+# deal_service/app/routes/imports.py
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from redis.asyncio import Redis
+from starlette.background import BackgroundTasks
+
+from deal_service.app.schemas.deal import DealImportJob
+from deal_service.app.services.imports import (
+    import_format, save_import_file, create_import_job, get_import_job, run_import_job
+)
+from shared.db.models import Account_Model
+from shared.db.redis import get_redis
+from shared.services.auth import get_current_account
+
+router = APIRouter()
+
+
+@router.post(
+    "/import",
+    response_model=DealImportJob,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="POST на массовый импорт сделок",
+    description=(
+        "Файл CSV (с заголовком) или NDJSON (один JSON-объект на строку) с полями "
+        "name_deal, seller_price, region_id, address_deal, deal_type_id, deal_branch_id. "
+        "Размер до 20 МБ. Импорт идёт в фоне, прогресс и ошибки по строкам — в GET /deal/import/{job_id}."
+    )
+)
+async def import_deals(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    current_account: Account_Model = Depends(get_current_account),
+    redis: Redis = Depends(get_redis)
+):
+    if current_account.role != "company":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="У вас нет прав на создание сделки"
+        )
+
+    fmt = import_format(file)
+    path = await save_import_file(file)
+    job_id = await create_import_job(redis, current_account.id)
+    background_tasks.add_task(run_import_job, job_id, path, fmt, current_account.id)
+    return DealImportJob(job_id=job_id, status="queued")
+
+
+@router.get(
+    "/import/{job_id}",
+    response_model=DealImportJob,
+    summary="GET состояние импорта сделок",
+    description="Прогресс задачи импорта и отчёт об ошибках по строкам (первые 1000)"
+)
+async def import_status(
+    job_id: str,
+    current_account: Account_Model = Depends(get_current_account),
+    redis: Redis = Depends(get_redis)
+):
+    job = await get_import_job(redis, job_id, current_account.id)
+    if job is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Задача импорта не найдена")
+    return job
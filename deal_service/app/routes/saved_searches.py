@@ -0,0 +1,110 @@
+# deal_service/app/routes/saved_searches.py
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from redis.asyncio import Redis
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from deal_service.app.schemas.deal import SavedSearch, SavedSearchCreate
+from deal_service.app.services.saved_searches import (
+    SAVED_SEARCH_LIMIT, search_terms, index_saved_search, unindex_saved_search
+)
+from shared.cache.reference_data import ReferenceData, get_reference_data
+from shared.db.models import Account_Model, SavedSearch_Model
+from shared.db.redis import get_redis
+from shared.db.session import get_db
+from shared.services.auth import get_current_account
+
+router = APIRouter()
+
+
+@router.post(
+    "/saved-searches",
+    response_model=SavedSearch,
+    status_code=status.HTTP_201_CREATED,
+    summary="POST на сохранение поиска",
+    description=(
+        "Сохраняет фильтры (регион, отрасль, тип, поисковый запрос). "
+        "О новых сделках, подходящих под фильтры, приходит письмо на email аккаунта. "
+        f"Не больше {SAVED_SEARCH_LIMIT} поисков на аккаунт."
+    )
+)
+async def create_saved_search(
+    data: SavedSearchCreate,
+    db: AsyncSession = Depends(get_db),
+    current_account: Account_Model = Depends(get_current_account),
+    redis: Redis = Depends(get_redis),
+    reference: ReferenceData = Depends(get_reference_data)
+):
+    if data.region_id is not None and data.region_id not in reference.regions:
+        raise HTTPException(400, "Указанный регион не существует")
+    if data.deal_branch_id is not None and data.deal_branch_id not in reference.branches:
+        raise HTTPException(400, "Указанная отрасль не существует")
+    if data.deal_type_id is not None and data.deal_type_id not in reference.types:
+        raise HTTPException(400, "Указанный тип сделки не существует")
+
+    search = (data.search or "").strip() or None
+    terms = await search_terms(db, search) if search else []
+    if search and not terms:
+        raise HTTPException(400, "Поисковый запрос не содержит значимых слов")
+    if search is None and data.region_id is None and data.deal_branch_id is None and data.deal_type_id is None:
+        raise HTTPException(400, "Укажите хотя бы один фильтр")
+
+    count = (await db.execute(
+        select(func.count()).select_from(SavedSearch_Model).where(SavedSearch_Model.account_id == current_account.id)
+    )).scalar_one()
+    if count >= SAVED_SEARCH_LIMIT:
+        raise HTTPException(400, f"Нельзя сохранить больше {SAVED_SEARCH_LIMIT} поисков")
+
+    saved_search = SavedSearch_Model(
+        account_id=current_account.id,
+        region_id=data.region_id,
+        deal_branch_id=data.deal_branch_id,
+        deal_type_id=data.deal_type_id,
+        search=search,
+        terms=terms
+    )
+    db.add(saved_search)
+    await db.commit()
+    await db.refresh(saved_search)
+
+    await index_saved_search(redis, saved_search)
+    return saved_search
+
+
+@router.get(
+    "/saved-searches",
+    response_model=List[SavedSearch],
+    summary="GET сохранённых поисков текущего аккаунта"
+)
+async def list_saved_searches(
+    db: AsyncSession = Depends(get_db),
+    current_account: Account_Model = Depends(get_current_account)
+):
+    result = await db.execute(
+        select(SavedSearch_Model)
+        .where(SavedSearch_Model.account_id == current_account.id)
+        .order_by(SavedSearch_Model.id)
+    )
+    return result.scalars().all()
+
+
+@router.delete(
+    "/saved-searches/{saved_search_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="DELETE сохранённого поиска"
+)
+async def delete_saved_search(
+    saved_search_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_account: Account_Model = Depends(get_current_account),
+    redis: Redis = Depends(get_redis)
+):
+    saved_search = await db.get(SavedSearch_Model, saved_search_id)
+    if saved_search is None or saved_search.account_id != current_account.id:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Сохранённый поиск не найден")
+
+    await db.delete(saved_search)
+    await db.commit()
+    await unindex_saved_search(redis, saved_search)
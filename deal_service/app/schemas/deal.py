@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, validator
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Dict
 from fastapi import UploadFile
 
 class DealBase(BaseModel):
@@ -40,8 +40,74 @@ class Deal(DealBase):
     id: Optional[int] = Field(default=None, description="Идентификатор сделки")
     created_at: Optional[datetime] = Field(default_factory=datetime.utcnow, description="Дата создания сделки")
     order_count: Optional[int] = None  # Количество покупателей
+    photos_variants: Optional[List[Optional[Dict[str, str]]]] = Field(None, description="Миниатюры для каждого фото")
+    thumbnails_url: Optional[List[str]] = Field(None, description="Миниатюры фото для списков (WebP)")
     feedback_count: Optional[int] = None  # Количество отзывов
 
     class Config:
         from_attributes = True
-        arbitrary_types_allowed = True
\ No newline at end of file
+        arbitrary_types_allowed = True
+
+class DealCursorPage(BaseModel):
+    items: List[Deal] = Field(..., description="Сделки текущей страницы")
+    next_cursor: Optional[str] = Field(None, description="Курсор следующей страницы (None — страниц больше нет)")
+
+class FacetCount(BaseModel):
+    id: Optional[int] = Field(None, description="ID значения фильтра (None — не указано)")
+    count: int = Field(..., description="Количество сделок")
+
+class DealFacets(BaseModel):
+    regions: List[FacetCount] = Field(default_factory=list, description="Сделки по регионам")
+    branches: List[FacetCount] = Field(default_factory=list, description="Сделки по отраслям")
+    types: List[FacetCount] = Field(default_factory=list, description="Сделки по типам")
+    statuses: List[FacetCount] = Field(default_factory=list, description="Сделки по статусам")
+
+class DealImportRow(BaseModel):
+    """Строка файла массового импорта (CSV или NDJSON)."""
+    name_deal: str = Field(..., min_length=1, max_length=255, description="Название сделки")
+    seller_price: float = Field(..., gt=0, lt=10 ** 10, description="Цена продавца")
+    region_id: int = Field(..., description="ID региона сделки")
+    address_deal: str = Field(..., max_length=255, description="Адрес сделки (формат: 'Город, улица, дом[, квартира]')")
+    deal_type_id: int = Field(..., description="ID типа сделки")
+    deal_branch_id: int = Field(..., description="ID отрасли сделки")
+
+    @validator('address_deal')
+    def validate_address(cls, v):
+        parts = [p.strip() for p in v.split(',')]
+        if len(parts) < 3 or not all(parts[:3]):
+            raise ValueError("Неверный формат адреса. Введите: Город, улица, дом[, квартира]")
+        return v
+
+class DealImportError(BaseModel):
+    row: int = Field(..., description="Номер строки данных (с 1, без заголовка)")
+    errors: List[str] = Field(..., description="Ошибки строки")
+
+class DealImportJob(BaseModel):
+    job_id: str = Field(..., description="ID задачи импорта")
+    status: str = Field(..., description="queued | running | done | failed")
+    processed: int = Field(0, description="Обработано строк")
+    imported: int = Field(0, description="Создано сделок")
+    failed: int = Field(0, description="Строк с ошибками")
+    detail: Optional[str] = Field(None, description="Причина сбоя задачи")
+    errors: List[DealImportError] = Field(default_factory=list, description="Ошибки по строкам (первые 1000)")
+
+class SimilarDeal(BaseModel):
+    id: int = Field(..., description="ID сделки")
+    name_deal: str = Field(..., description="Название сделки")
+    total_cost: Optional[float] = Field(None, description="Финальная стоимость")
+    thumbnail_url: Optional[str] = Field(None, description="Миниатюра первого фото (WebP)")
+    score: float = Field(..., description="Близость по совместным покупкам (косинус, 0..1)")
+
+class SavedSearchCreate(BaseModel):
+    """Фильтры сохранённого поиска; пустой фильтр — любое значение."""
+    region_id: Optional[int] = Field(None, description="ID региона")
+    deal_branch_id: Optional[int] = Field(None, description="ID отрасли")
+    deal_type_id: Optional[int] = Field(None, description="ID типа сделки")
+    search: Optional[str] = Field(None, max_length=255, description="Поисковый запрос (как в GET /deal/list)")
+
+class SavedSearch(SavedSearchCreate):
+    id: int = Field(..., description="ID сохранённого поиска")
+    created_at: datetime = Field(..., description="Дата создания")
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,116 @@
+# deal_service/app/services/archive.py
+# Перенос закрытых сделок в холодный архив и обслуживание помесячных секций
+import asyncio
+import logging
+from typing import List
+
+from redis.asyncio import Redis
+from sqlalchemy import select, insert, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared.cache.deal_view import invalidate_deal
+from shared.cache.namespace import invalidate_deal_facets
+from shared.core.config import settings
+from shared.db.models import (
+    Deal_Model, Feedback_Model, Message_Model, DealArchive_Model, FeedbackArchive_Model, MessageArchive_Model
+)
+from shared.db.models.archive import DealConsumersArchive
+from shared.db.models.deal_consumers import DealConsumers
+from shared.db.partitions import PARTITIONED_TABLES, ensure_partitions
+from shared.db.redis import get_redis_client
+from shared.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_BATCH = 500  # Сделок за одну транзакцию
+ARCHIVE_INTERVAL = 24 * 3600  # Период архивации и проверки секций, сек
+ARCHIVE_LOCK_KEY = "deal_archive:lock"
+
+DEAL_ARCHIVE_COLUMNS = [
+    "id", "name_deal", "seller_id", "seller_price", "YAMS_percent", "total_cost", "region_id",
+    "address_deal", "date_close", "photos_url", "photos_variants", "deal_details_id", "created_at",
+    "updated_at", "deal_branch_id", "deal_type_id", "order_count", "feedback_count",
+]
+FEEDBACK_ARCHIVE_COLUMNS = ["id", "deal_id", "stars", "details", "created_at", "author_id", "is_purchaser"]
+MESSAGE_ARCHIVE_COLUMNS = ["id", "deal_id", "consumer_id", "sender_id", "recipient_id", "content", "created_at"]
+PURCHASE_ARCHIVE_COLUMNS = ["id", "deal_id", "consumer_id", "created_at"]
+
+
+async def _copy(db: AsyncSession, source, target, columns: List[str], key: str, deal_ids: List[int]) -> None:
+    """INSERT ... SELECT строк сделок deal_ids из горячей таблицы source в архивную target."""
+    await db.execute(
+        insert(target)
+        .from_select(columns, select(*(source.c[column] for column in columns)).where(source.c[key].in_(deal_ids)))
+    )
+
+
+async def archive_batch(db: AsyncSession) -> List[int]:
+    """
+    Переносит в архив одну пачку сделок, закрытых раньше DEAL_ARCHIVE_AFTER_MONTHS
+    месяцев назад, вместе с покупками, отзывами и перепиской.
+
+    Строки сделок блокируются (SKIP LOCKED), покупки и отзывы по ним в это время
+    не появятся. Из горячих таблиц связанные строки удаляет ON DELETE CASCADE.
+    Ссылки на медиафайлы не освобождаются — архивная сделка продолжает их использовать.
+
+    :return: ID перенесённых сделок
+    """
+    deal_ids = (await db.execute(
+        select(Deal_Model.id)
+        .where(Deal_Model.date_close < func.now() - func.make_interval(0, settings.DEAL_ARCHIVE_AFTER_MONTHS))
+        .order_by(Deal_Model.id)
+        .limit(ARCHIVE_BATCH)
+        .with_for_update(skip_locked=True)
+    )).scalars().all()
+    if not deal_ids:
+        return []
+    await _copy(db, Deal_Model.__table__, DealArchive_Model, DEAL_ARCHIVE_COLUMNS, "id", deal_ids)
+    await _copy(db, DealConsumers, DealConsumersArchive, PURCHASE_ARCHIVE_COLUMNS, "deal_id", deal_ids)
+    await _copy(db, Feedback_Model.__table__, FeedbackArchive_Model, FEEDBACK_ARCHIVE_COLUMNS, "deal_id", deal_ids)
+    await _copy(db, Message_Model.__table__, MessageArchive_Model, MESSAGE_ARCHIVE_COLUMNS, "deal_id", deal_ids)
+    await db.execute(delete(Deal_Model).where(Deal_Model.id.in_(deal_ids)))
+    await db.commit()
+    return list(deal_ids)
+
+
+async def archive_closed_deals(redis: Redis) -> int:
+    """Архивирует все подходящие сделки пачками. :return: количество перенесённых сделок"""
+    total = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            deal_ids = await archive_batch(db)
+        if not deal_ids:
+            break
+        for deal_id in deal_ids:
+            await invalidate_deal(redis, deal_id)
+        total += len(deal_ids)
+    if total:
+        await invalidate_deal_facets(redis)
+        logger.info(f"В архив перенесено сделок: {total}")
+    return total
+
+
+async def archive_loop() -> None:
+    """
+    Фоновая задача: раз в сутки (одна реплика, по блокировке) заводит секции
+    messages и deal_consumers на следующие месяцы и архивирует закрытые сделки.
+    """
+    redis = get_redis_client()
+    while True:
+        try:
+            if await redis.set(ARCHIVE_LOCK_KEY, "1", nx=True, ex=ARCHIVE_INTERVAL):
+                async with AsyncSessionLocal() as db:
+                    for table in PARTITIONED_TABLES:
+                        await ensure_partitions(db, table)
+                await archive_closed_deals(redis)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка архивации сделок: {str(e)}")
+        await asyncio.sleep(ARCHIVE_INTERVAL)
+
+
+if __name__ == "__main__":
+    # Ручной запуск: python -m deal_service.app.services.archive
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(archive_closed_deals(get_redis_client()))
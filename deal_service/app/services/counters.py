@@ -0,0 +1,102 @@
+# Сверка денормализованных счётчиков сделок (order_count, feedback_count)
+import asyncio
+import logging
+from typing import List
+
+from redis.asyncio import Redis
+from sqlalchemy import select, update, func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared.cache.deal_view import invalidate_deal
+from shared.db.models import Deal_Model, Feedback_Model
+from shared.db.models.deal_consumers import DealConsumers
+from shared.db.redis import get_redis_client
+from shared.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_INTERVAL = 6 * 3600  # Период сверки, сек
+RECONCILE_LOCK_KEY = "deal_counters:reconcile_lock"
+
+
+async def increment_order_count(db: AsyncSession, deal_id: int) -> None:
+    """Атомарно увеличивает число покупок сделки (в транзакции вызывающего)."""
+    await db.execute(
+        update(Deal_Model)
+        .where(Deal_Model.id == deal_id)
+        .values(order_count=Deal_Model.order_count + 1)
+    )
+
+
+async def change_feedback_count(db: AsyncSession, deal_id: int, delta: int) -> None:
+    """Атомарно меняет число отзывов сделки (не уходя ниже нуля)."""
+    await db.execute(
+        update(Deal_Model)
+        .where(Deal_Model.id == deal_id)
+        .values(feedback_count=func.greatest(Deal_Model.feedback_count + delta, 0))
+    )
+
+
+async def reconcile_deal_counters(db: AsyncSession) -> List[int]:
+    """
+    Пересчитывает счётчики по deal_consumers и feedback одним UPDATE.
+
+    Нужна на случай удалений в обход API (каскадное удаление аккаунтов, ручные правки).
+
+    :return: ID исправленных сделок
+    """
+    order_count = (
+        select(func.count())
+        .select_from(DealConsumers)
+        .where(DealConsumers.c.deal_id == Deal_Model.id)
+        .scalar_subquery()
+    )
+    feedback_count = (
+        select(func.count())
+        .select_from(Feedback_Model)
+        .where(Feedback_Model.deal_id == Deal_Model.id)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        update(Deal_Model)
+        .where(or_(Deal_Model.order_count != order_count, Deal_Model.feedback_count != feedback_count))
+        .values(order_count=order_count, feedback_count=feedback_count)
+        .returning(Deal_Model.id)
+        .execution_options(synchronize_session=False)
+    )
+    deal_ids = list(result.scalars().all())
+    await db.commit()
+    return deal_ids
+
+
+async def run_reconciliation(redis: Redis) -> int:
+    async with AsyncSessionLocal() as db:
+        deal_ids = await reconcile_deal_counters(db)
+    # Карточки в кэше содержат счётчики — сбрасываем исправленные
+    for deal_id in deal_ids:
+        await invalidate_deal(redis, deal_id)
+    if deal_ids:
+        logger.warning(f"Исправлены счётчики у {len(deal_ids)} сделок")
+    else:
+        logger.info("Счётчики сделок согласованы")
+    return len(deal_ids)
+
+
+async def reconcile_loop() -> None:
+    """Фоновая задача: периодическая сверка. Из всех реплик сверку выполняет одна."""
+    redis = get_redis_client()
+    while True:
+        try:
+            if await redis.set(RECONCILE_LOCK_KEY, "1", nx=True, ex=RECONCILE_INTERVAL):
+                await run_reconciliation(redis)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка сверки счётчиков сделок: {str(e)}")
+        await asyncio.sleep(RECONCILE_INTERVAL)
+
+
+if __name__ == "__main__":
+    # Ручной запуск: python -m deal_service.app.services.counters
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_reconciliation(get_redis_client()))
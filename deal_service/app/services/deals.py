@@ -1,5 +1,77 @@
+from html import escape
+from typing import Dict, List, Optional
+
+from sqlalchemy import select, func, or_, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared.db.models.deals import Deal_Model
 from shared.services.email import send_email
 
+# Фасеты каталога: имя в ответе -> столбец группировки (статус — deal_details_id)
+FACET_COLUMNS = {
+    "regions": Deal_Model.region_id,
+    "branches": Deal_Model.deal_branch_id,
+    "types": Deal_Model.deal_type_id,
+    "statuses": Deal_Model.deal_details_id,
+}
+
+
+def apply_deal_filters(
+    stmt,
+    region_id: Optional[int],
+    deal_branch_id: Optional[int],
+    deal_type_id: Optional[int],
+    search: Optional[str]
+):
+    """Фильтры каталога сделок (общие для списков и фасетов)."""
+    if region_id is not None:
+        stmt = stmt.where(Deal_Model.region_id == region_id)
+    if deal_branch_id is not None:
+        stmt = stmt.where(Deal_Model.deal_branch_id == deal_branch_id)
+    if deal_type_id is not None:
+        stmt = stmt.where(Deal_Model.deal_type_id == deal_type_id)
+    if search:
+        # Полнотекстовый поиск (GIN по search_vector) + триграммы по названию для опечаток
+        stmt = stmt.where(or_(
+            Deal_Model.search_vector.op("@@")(func.websearch_to_tsquery("russian", search)),
+            Deal_Model.name_deal.op("%")(search)
+        ))
+    return stmt
+
+
+async def count_facets(
+    db: AsyncSession,
+    region_id: Optional[int],
+    deal_branch_id: Optional[int],
+    deal_type_id: Optional[int],
+    search: Optional[str]
+) -> Dict[str, List[dict]]:
+    """
+    Количество сделок по регионам, отраслям, типам и статусам одним запросом.
+
+    GROUPING SETS считает все фасеты за один проход по отфильтрованным сделкам;
+    grouping(column) = 0 указывает, к какому набору относится строка результата.
+    """
+    columns = list(FACET_COLUMNS.values())
+    stmt = select(
+        *columns,
+        *(func.grouping(column) for column in columns),
+        func.count().label("count")
+    ).group_by(func.grouping_sets(*(tuple_(column) for column in columns)))
+    stmt = apply_deal_filters(stmt, region_id, deal_branch_id, deal_type_id, search)
+
+    facets: Dict[str, List[dict]] = {name: [] for name in FACET_COLUMNS}
+    names = list(FACET_COLUMNS)
+    for row in (await db.execute(stmt)).all():
+        values, grouping, count = row[:len(columns)], row[len(columns):-1], row[-1]
+        index = list(grouping).index(0)
+        facets[names[index]].append({"id": values[index], "count": count})
+
+    for items in facets.values():
+        items.sort(key=lambda item: item["count"], reverse=True)
+    return facets
+
+
 # Отправка чека о сделке в приложении
 async def send_purchase_email(email: str, name_deal: str, price: float, yams_fee: float):
     html = f"""
@@ -17,3 +89,20 @@ async def send_purchase_email(email: str, name_deal: str, price: float, yams_fee
     </html>
     """
     await send_email(email, "Подтверждение покупки сделки", html, content_type="text/html")
+
+
+async def send_saved_search_email(email: str, deal_id: int, name_deal: str, total_cost: float, address_deal: str):
+    html = f"""
+    <html>
+      <body style="font-family: Arial, sans-serif; color: #333;">
+        <h2>Новая сделка по вашему сохранённому поиску</h2>
+        <p>Сделка: <strong>{escape(name_deal)}</strong></p>
+        <p>Стоимость: <strong>{total_cost:.2f} ₽</strong></p>
+        <p>Адрес: {escape(address_deal)}</p>
+        <p>Номер сделки на платформе: <strong>{deal_id}</strong></p>
+        <br>
+        <p style="color: gray;">С уважением, команда YAMS</p>
+      </body>
+    </html>
+    """
+    await send_email(email, "Новая сделка по сохранённому поиску", html, content_type="text/html")
@@ -0,0 +1,149 @@
+# deal_service/app/services/export.py
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import AsyncIterator, Iterable, Optional
+
+from sqlalchemy import select, func
+
+from deal_service.app.services.deals import apply_deal_filters
+from shared.cache.reference_data import ReferenceData, get_reference_data
+from shared.db.models.deals import Deal_Model
+from shared.db.session import AsyncSessionLocal
+
+EXPORT_YIELD_PER = 1000  # Строк за одну выборку из серверного курсора
+# Транзакции, начатые до выгрузки, могут зафиксироваться позже с более ранним updated_at:
+# водяной знак для следующей выгрузки берётся с запасом
+EXPORT_WATERMARK_OVERLAP = timedelta(minutes=5)
+
+EXPORT_FIELDS = [
+    "id", "name_deal", "seller_id", "seller_price", "YAMS_percent", "total_cost",
+    "region_id", "region", "address_deal", "deal_branch_id", "deal_branch",
+    "deal_type_id", "deal_type", "deal_details_id", "deal_status",
+    "photos_url", "order_count", "feedback_count", "date_close", "created_at", "updated_at",
+]
+PHOTOS_INDEX = EXPORT_FIELDS.index("photos_url")
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _export_statement(
+    region_id: Optional[int],
+    deal_branch_id: Optional[int],
+    deal_type_id: Optional[int],
+    search: Optional[str],
+    updated_since: Optional[datetime]
+):
+    # Только нужные столбцы (без ORM-объектов и search_vector); названия справочников
+    # подставляются из памяти процесса, без JOIN
+    stmt = select(
+        Deal_Model.id, Deal_Model.name_deal, Deal_Model.seller_id, Deal_Model.seller_price,
+        Deal_Model.YAMS_percent, Deal_Model.total_cost, Deal_Model.region_id, Deal_Model.address_deal,
+        Deal_Model.deal_branch_id, Deal_Model.deal_type_id, Deal_Model.deal_details_id,
+        Deal_Model.photos_url, Deal_Model.order_count, Deal_Model.feedback_count,
+        Deal_Model.date_close, Deal_Model.created_at, Deal_Model.updated_at,
+    )
+    stmt = apply_deal_filters(stmt, region_id, deal_branch_id, deal_type_id, search)
+    if updated_since is not None:
+        stmt = stmt.where(Deal_Model.updated_at > updated_since)
+    # По индексу (updated_at, id): выгрузка идёт в порядке изменения
+    return stmt.order_by(Deal_Model.updated_at, Deal_Model.id)
+
+
+def _export_row(row, reference: ReferenceData) -> tuple:
+    """Строка выгрузки в порядке EXPORT_FIELDS."""
+    return (
+        row.id, row.name_deal, row.seller_id, row.seller_price, row.YAMS_percent, row.total_cost,
+        row.region_id, reference.regions.get(row.region_id), row.address_deal,
+        row.deal_branch_id, reference.branches.get(row.deal_branch_id),
+        row.deal_type_id, reference.types.get(row.deal_type_id),
+        row.deal_details_id, reference.statuses.get(row.deal_details_id),
+        row.photos_url, row.order_count, row.feedback_count, row.date_close, row.created_at, row.updated_at,
+    )
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _ndjson_chunk(rows: Iterable) -> str:
+    return "".join(
+        json.dumps({field: _json_value(value) for field, value in zip(EXPORT_FIELDS, row)}, ensure_ascii=False) + "\n"
+        for row in rows
+    )
+
+
+def _csv_chunk(rows: Iterable, header: bool) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        values = [_json_value(value) for value in row]
+        values[PHOTOS_INDEX] = " ".join(values[PHOTOS_INDEX] or [])
+        writer.writerow(values)
+    return buffer.getvalue()
+
+
+async def export_watermark() -> datetime:
+    """Значение updated_since для следующей инкрементальной выгрузки."""
+    async with AsyncSessionLocal() as db:
+        now = (await db.execute(select(func.now()))).scalar_one()
+    return now - EXPORT_WATERMARK_OVERLAP
+
+
+async def stream_deals_export(
+    fmt: str,
+    compress: bool,
+    region_id: Optional[int] = None,
+    deal_branch_id: Optional[int] = None,
+    deal_type_id: Optional[int] = None,
+    search: Optional[str] = None,
+    updated_since: Optional[datetime] = None
+) -> AsyncIterator[bytes]:
+    """
+    Потоковая выгрузка сделок в NDJSON или CSV.
+
+    Строки читаются из серверного курсора пачками по EXPORT_YIELD_PER и сразу
+    отдаются клиенту, поэтому память не зависит от размера каталога.
+    Сессия своя: она живёт, пока отдаётся ответ.
+
+    С updated_since выгружаются только изменённые и новые сделки: удалённые
+    и перенесённые в архив сделки в инкрементальной выгрузке не отражаются
+    (записей-«надгробий» нет), их выявляет периодическая полная выгрузка.
+    """
+    stmt = _export_statement(region_id, deal_branch_id, deal_type_id, search, updated_since)
+    # wbits=31 — формат gzip (заголовок и контрольная сумма)
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    reference = await get_reference_data()
+    header = True
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(stmt.execution_options(yield_per=EXPORT_YIELD_PER))
+        async for partition in result.partitions():
+            rows = [_export_row(row, reference) for row in partition]
+            chunk = (_csv_chunk(rows, header) if fmt == "csv" else _ndjson_chunk(rows)).encode()
+            header = False
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+    if fmt == "csv" and header:
+        # Пустая выгрузка — только заголовок
+        chunk = _csv_chunk([], True).encode()
+        yield compressor.compress(chunk) if compressor is not None else chunk
+    if compressor is not None:
+        yield compressor.flush()
+
+
+def export_file_name(fmt: str, compress: bool) -> str:
+    return f"deals.{fmt}{'.gz' if compress else ''}"
+
+
+def export_media_type(fmt: str, compress: bool) -> str:
+    return "application/gzip" if compress else EXPORT_MEDIA_TYPES[fmt]
@@ -0,0 +1,277 @@
+# deal_service/app/services/imports.py
+import asyncio
+import csv
+import json
+import logging
+import tempfile
+import uuid
+from decimal import Decimal, ROUND_HALF_UP
+from itertools import islice
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import aiofiles
+import aiofiles.os as aio_os
+from fastapi import HTTPException, UploadFile, status
+from pydantic import ValidationError
+from redis.asyncio import Redis
+from sqlalchemy import select, insert, literal, func, text, table, column, Integer, String, Numeric
+
+from deal_service.app.schemas.deal import DealImportRow, DealImportJob, DealImportError
+from deal_service.app.services.saved_searches import enqueue_new_deals
+from shared.cache.namespace import mark_ranking_dirty, invalidate_deal_facets
+from shared.cache.reference_data import ReferenceData, get_reference_data
+from shared.db.models.deals import Deal_Model
+from shared.db.redis import get_redis_client
+from shared.db.session import AsyncSessionLocal
+from shared.services.uploads import CHUNK_SIZE, remove_quietly
+
+logger = logging.getLogger(__name__)
+
+IMPORT_MAX_SIZE = 20 * 1024 * 1024  # 20 МБ на файл импорта
+IMPORT_BATCH = 1000  # Строк на один COPY и одну транзакцию
+IMPORT_JOB_TTL = 24 * 60 * 60  # Сколько хранить состояние задачи в Redis, сек
+MAX_REPORTED_ERRORS = 1000  # Ошибок в отчёте (остальные только считаются)
+# Не внутри static: эти файлы не должны раздаваться media_service
+IMPORT_TEMP_DIR = Path(tempfile.gettempdir()) / "yams_imports"
+IMPORT_FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+YAMS_RATE = Decimal("0.03")
+CENT = Decimal("0.01")
+
+IMPORT_COLUMNS = ["row_number", "name_deal", "seller_price", "region_id", "address_deal", "deal_type_id", "deal_branch_id"]
+
+# Промежуточная таблица живёт в пределах соединения, строки очищаются при коммите
+STAGING_DDL = """
+    CREATE TEMP TABLE IF NOT EXISTS deal_import_staging (
+        row_number integer NOT NULL,
+        name_deal varchar(255) NOT NULL,
+        seller_price numeric(12, 2) NOT NULL,
+        region_id integer NOT NULL,
+        address_deal varchar(255) NOT NULL,
+        deal_type_id integer NOT NULL,
+        deal_branch_id integer NOT NULL
+    ) ON COMMIT DELETE ROWS
+"""
+staging = table(
+    "deal_import_staging",
+    column("row_number", Integer),
+    column("name_deal", String),
+    column("seller_price", Numeric),
+    column("region_id", Integer),
+    column("address_deal", String),
+    column("deal_type_id", Integer),
+    column("deal_branch_id", Integer),
+)
+
+
+def job_key(job_id: str) -> str:
+    return f"deal_import:{job_id}"
+
+
+def job_errors_key(job_id: str) -> str:
+    return f"deal_import:{job_id}:errors"
+
+
+def import_format(file: UploadFile) -> str:
+    fmt = IMPORT_FORMATS.get(Path(file.filename or "").suffix.lower())
+    if fmt is None:
+        raise HTTPException(
+            status.HTTP_400_BAD_REQUEST,
+            f"Файл {file.filename} имеет недопустимый формат. Разрешённые форматы: {sorted(IMPORT_FORMATS)}"
+        )
+    return fmt
+
+
+async def save_import_file(file: UploadFile) -> Path:
+    """Потоково сохраняет файл импорта во временный файл с ограничением размера."""
+    await aio_os.makedirs(IMPORT_TEMP_DIR, exist_ok=True)
+    path = IMPORT_TEMP_DIR / f"{uuid.uuid4().hex}.part"
+    written = 0
+    try:
+        async with aiofiles.open(path, "wb") as out_file:
+            while chunk := await file.read(CHUNK_SIZE):
+                written += len(chunk)
+                if written > IMPORT_MAX_SIZE:
+                    raise HTTPException(
+                        status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        f"Файл {file.filename} превышает {IMPORT_MAX_SIZE // (1024 * 1024)} МБ"
+                    )
+                await out_file.write(chunk)
+    except BaseException:
+        await remove_quietly(path)
+        raise
+    if written == 0:
+        await remove_quietly(path)
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, f"Файл {file.filename} пустой")
+    return path
+
+
+async def create_import_job(redis: Redis, seller_id: int) -> str:
+    job_id = uuid.uuid4().hex
+    await redis.hset(job_key(job_id), mapping={
+        "seller_id": seller_id, "status": "queued", "processed": 0, "imported": 0, "failed": 0
+    })
+    await redis.expire(job_key(job_id), IMPORT_JOB_TTL)
+    return job_id
+
+
+async def get_import_job(redis: Redis, job_id: str, seller_id: int) -> Optional[DealImportJob]:
+    """Состояние задачи импорта; None, если задачи нет или она чужая."""
+    state = await redis.hgetall(job_key(job_id))
+    if not state or int(state["seller_id"]) != seller_id:
+        return None
+    errors = await redis.lrange(job_errors_key(job_id), 0, -1)
+    return DealImportJob(
+        job_id=job_id,
+        status=state["status"],
+        processed=int(state["processed"]),
+        imported=int(state["imported"]),
+        failed=int(state["failed"]),
+        detail=state.get("detail"),
+        errors=[DealImportError(**json.loads(error)) for error in errors],
+    )
+
+
+def _read_rows(path: Path, fmt: str) -> Iterator[Tuple[int, object]]:
+    """Строки файла по одной: (номер строки данных, dict или текст ошибки разбора)."""
+    with open(path, encoding="utf-8-sig", newline="") as source:
+        if fmt == "csv":
+            for number, row in enumerate(csv.DictReader(source), start=1):
+                yield number, row
+            return
+        number = 0
+        for line in source:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                yield number, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield number, f"Некорректный JSON: {e.msg}"
+
+
+def _validate(value: object, reference: ReferenceData) -> Tuple[Optional[DealImportRow], List[str]]:
+    """Проверка строки: типы и формат полей, затем существование справочных значений."""
+    if isinstance(value, str):
+        return None, [value]
+    if not isinstance(value, dict):
+        return None, ["Строка должна быть объектом"]
+    try:
+        row = DealImportRow(**{field: data for field, data in value.items() if field})
+    except ValidationError as e:
+        return None, [f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors()]
+    errors = []
+    if row.region_id not in reference.regions:
+        errors.append("Указанный регион не существует")
+    if row.deal_branch_id not in reference.branches:
+        errors.append("Указанная отрасль не существует")
+    if row.deal_type_id not in reference.types:
+        errors.append("Указанный тип сделки не существует")
+    return (None, errors) if errors else (row, [])
+
+
+async def _copy_batch(rows: List[Tuple], seller_id: int, active_status_id: int) -> List[int]:
+    """
+    Загружает пачку проверенных строк: COPY в промежуточную таблицу,
+    затем одна вставка в deals с расчётом комиссии на стороне БД.
+
+    :return: ID вставленных сделок
+    """
+    yams_percent = func.round(staging.c.seller_price * YAMS_RATE, 2)
+    async with AsyncSessionLocal() as db:
+        await db.execute(text(STAGING_DDL))
+        connection = await db.connection()
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            "deal_import_staging", records=rows, columns=IMPORT_COLUMNS
+        )
+        result = await db.execute(
+            insert(Deal_Model).from_select(
+                [
+                    "name_deal", "seller_id", "seller_price", "YAMS_percent", "total_cost", "region_id",
+                    "address_deal", "deal_type_id", "deal_branch_id", "deal_details_id", "photos_url",
+                ],
+                select(
+                    staging.c.name_deal,
+                    literal(seller_id),
+                    staging.c.seller_price,
+                    yams_percent,
+                    staging.c.seller_price + yams_percent,
+                    staging.c.region_id,
+                    staging.c.address_deal,
+                    staging.c.deal_type_id,
+                    staging.c.deal_branch_id,
+                    literal(active_status_id),
+                    literal([], Deal_Model.photos_url.type),
+                ).order_by(staging.c.row_number)
+            ).returning(Deal_Model.id)
+        )
+        deal_ids = list(result.scalars().all())
+        await db.commit()
+    return deal_ids
+
+
+async def _report_errors(redis: Redis, job_id: str, errors: List[dict], reported: int) -> int:
+    room = MAX_REPORTED_ERRORS - reported
+    if errors and room > 0:
+        await redis.rpush(job_errors_key(job_id), *(json.dumps(error, ensure_ascii=False) for error in errors[:room]))
+        await redis.expire(job_errors_key(job_id), IMPORT_JOB_TTL)
+        reported += min(len(errors), room)
+    return reported
+
+
+async def run_import_job(job_id: str, path: Path, fmt: str, seller_id: int) -> None:
+    """
+    Фоновая задача импорта.
+
+    Файл читается пачками по IMPORT_BATCH строк (чтение и разбор — в потоке,
+    чтобы не блокировать цикл событий), каждая пачка проверяется и загружается
+    в своей транзакции. Прогресс и ошибки по строкам пишутся в Redis.
+    """
+    redis = get_redis_client()
+    key = job_key(job_id)
+    rows = _read_rows(path, fmt)
+    try:
+        await redis.hset(key, "status", "running")
+        # Справочники — из памяти процесса, без запросов на каждую строку
+        reference = await get_reference_data()
+        active_status_id = reference.status_id("Активно")
+        if not active_status_id:
+            raise RuntimeError("Статус 'Активно' не найден")
+
+        reported = 0
+        imported_total = 0
+        while batch := await asyncio.to_thread(lambda: list(islice(rows, IMPORT_BATCH))):
+            valid, errors = [], []
+            for number, value in batch:
+                row, row_errors = _validate(value, reference)
+                if row is None:
+                    errors.append({"row": number, "errors": row_errors})
+                    continue
+                valid.append((
+                    number, row.name_deal,
+                    Decimal(str(row.seller_price)).quantize(CENT, ROUND_HALF_UP),
+                    row.region_id, row.address_deal, row.deal_type_id, row.deal_branch_id,
+                ))
+            deal_ids = await _copy_batch(valid, seller_id, active_status_id) if valid else []
+            imported = len(deal_ids)
+            imported_total += imported
+            # Пачка уже закоммичена — уведомления по сохранённым поискам не зависят от следующих пачек
+            await enqueue_new_deals(redis, deal_ids)
+            reported = await _report_errors(redis, job_id, errors, reported)
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.hincrby(key, "processed", len(batch))
+                pipe.hincrby(key, "imported", imported)
+                pipe.hincrby(key, "failed", len(errors))
+                await pipe.execute()
+
+        await redis.hset(key, "status", "done")
+        if imported_total:
+            await mark_ranking_dirty(redis, seller_id)
+            await invalidate_deal_facets(redis)
+    except Exception as e:
+        logger.error(f"Ошибка импорта сделок {job_id}: {str(e)}")
+        await redis.hset(key, mapping={"status": "failed", "detail": str(e)})
+    finally:
+        rows.close()
+        await remove_quietly(path)
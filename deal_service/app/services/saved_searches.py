@@ -0,0 +1,241 @@
+# deal_service/app/services/saved_searches.py
+# Сохранённые поиски: инвертированный индекс в Redis и сопоставление новых сделок («перколятор»)
+import asyncio
+import logging
+from itertools import product
+from typing import List, Optional, Set
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import select, func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from deal_service.app.services.deals import send_saved_search_email
+from shared.db.models import Account_Model, SavedSearch_Model
+from shared.db.models.deals import Deal_Model
+from shared.db.redis import get_redis_client
+from shared.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+SAVED_SEARCH_LIMIT = 20  # Сохранённых поисков на аккаунт
+NEW_DEALS_QUEUE = "saved_search:new_deals"  # Очередь ID новых сделок на сопоставление
+INDEX_READY_KEY = "saved_search:index_ready"  # Индекс построен (нет после очистки Redis)
+INDEX_REBUILD_LOCK_KEY = "saved_search:rebuild_lock"
+INDEX_REBUILD_LOCK_TTL = 600  # сек
+INDEX_KEY_PATTERN = "saved_search:i:*"
+QUEUE_WAIT_TIMEOUT = 2  # BRPOP, сек (меньше REDIS_SOCKET_TIMEOUT)
+EMAIL_CONCURRENCY = 10
+ANY = "*"
+
+
+def index_key(region_id, deal_branch_id, deal_type_id, term) -> str:
+    return f"saved_search:i:{region_id}:{deal_branch_id}:{deal_type_id}:{term}"
+
+
+def anchor_term(search: Optional[str], terms: List[str]) -> str:
+    """
+    Лексема, по которой поиск попадает в индекс: самая длинная (как правило,
+    самая редкая). Запросы с OR индексируются без лексемы — совпасть может
+    любая из альтернатив.
+    """
+    if not terms or any(word.lower() == "or" for word in (search or "").split()):
+        return ANY
+    return max(terms, key=lambda term: (len(term), term))
+
+
+def search_index_key(saved_search: SavedSearch_Model) -> str:
+    """
+    Единственный ключ индекса поиска. Пустой фильтр — «*», поэтому структурные
+    фильтры в ключе проверяются точно, а текст — по одной опорной лексеме.
+    """
+    return index_key(
+        saved_search.region_id or ANY,
+        saved_search.deal_branch_id or ANY,
+        saved_search.deal_type_id or ANY,
+        anchor_term(saved_search.search, saved_search.terms)
+    )
+
+
+async def search_terms(db: AsyncSession, search: str) -> List[str]:
+    """Лексемы запроса тем же разбором, что и search_vector сделок (исключённые слова «-слово» не входят)."""
+    positive = " ".join(word for word in search.split() if not word.startswith("-"))
+    terms = (await db.execute(
+        select(func.tsvector_to_array(func.to_tsvector("russian", positive)))
+    )).scalar_one()
+    return sorted(terms or [])
+
+
+async def index_saved_search(redis: Optional[Redis], saved_search: SavedSearch_Model) -> None:
+    if redis is None:
+        return
+    try:
+        await redis.sadd(search_index_key(saved_search), saved_search.id)
+    except RedisError as e:
+        # Поиск попадёт в индекс при следующей перестройке
+        logger.warning(f"Не удалось проиндексировать сохранённый поиск {saved_search.id}: {str(e)}")
+        await _reset_index(redis)
+
+
+async def unindex_saved_search(redis: Optional[Redis], saved_search: SavedSearch_Model) -> None:
+    if redis is None:
+        return
+    try:
+        await redis.srem(search_index_key(saved_search), saved_search.id)
+    except RedisError as e:
+        # Лишний кандидат отсеется проверкой в БД
+        logger.warning(f"Не удалось удалить сохранённый поиск {saved_search.id} из индекса: {str(e)}")
+
+
+async def _reset_index(redis: Redis) -> None:
+    try:
+        await redis.delete(INDEX_READY_KEY)
+    except RedisError:
+        pass
+
+
+async def enqueue_new_deals(redis: Optional[Redis], deal_ids: List[int]) -> None:
+    """Ставит новые сделки в очередь сопоставления с сохранёнными поисками (одним LPUSH)."""
+    if redis is None or not deal_ids:
+        return
+    try:
+        await redis.lpush(NEW_DEALS_QUEUE, *deal_ids)
+    except RedisError as e:
+        logger.warning(f"Не удалось поставить сделки {deal_ids[:10]} в очередь сохранённых поисков: {str(e)}")
+
+
+async def enqueue_new_deal(redis: Optional[Redis], deal_id: int) -> None:
+    """Ставит новую сделку в очередь сопоставления с сохранёнными поисками."""
+    await enqueue_new_deals(redis, [deal_id])
+
+
+async def rebuild_index(redis: Redis) -> int:
+    """Полная перестройка индекса из таблицы saved_searches. :return: количество поисков"""
+    keys = [key async for key in redis.scan_iter(match=INDEX_KEY_PATTERN, count=1000)]
+    for start in range(0, len(keys), 1000):
+        await redis.delete(*keys[start:start + 1000])
+    total = 0
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(select(SavedSearch_Model).execution_options(yield_per=1000))
+        async for partition in result.scalars().partitions():
+            async with redis.pipeline(transaction=False) as pipe:
+                for saved_search in partition:
+                    pipe.sadd(search_index_key(saved_search), saved_search.id)
+                await pipe.execute()
+            total += len(partition)
+    await redis.set(INDEX_READY_KEY, "1")
+    logger.info(f"Индекс сохранённых поисков перестроен: {total}")
+    return total
+
+
+async def candidate_searches(redis: Redis, region_id, deal_branch_id, deal_type_id, lexemes: List[str]) -> Set[int]:
+    """
+    Поиски-кандидаты для сделки: SUNION по ключам, в которые мог попасть
+    подходящий поиск, — 8 сочетаний «значение сделки или *» по трём фильтрам
+    на каждую лексему сделки и «*». Стоимость зависит от числа лексем сделки
+    и размера найденных множеств, а не от общего числа поисков.
+    """
+    keys = [
+        index_key(*combination)
+        for combination in product(
+            (region_id, ANY), (deal_branch_id, ANY), (deal_type_id, ANY), (*lexemes, ANY)
+        )
+    ]
+    return {int(search_id) for search_id in await redis.sunion(keys)}
+
+
+async def match_deal(redis: Redis, deal_id: int) -> List[tuple]:
+    """
+    Аккаунты, чьи сохранённые поиски подходят под сделку: кандидаты из индекса,
+    затем точная проверка в БД (полнотекстовый запрос против search_vector сделки).
+
+    :return: [(account_id, email), ...] без продавца сделки
+    """
+    async with AsyncSessionLocal() as db:
+        deal = (await db.execute(
+            select(
+                Deal_Model.region_id, Deal_Model.deal_branch_id, Deal_Model.deal_type_id, Deal_Model.seller_id,
+                func.tsvector_to_array(Deal_Model.search_vector).label("lexemes")
+            ).where(Deal_Model.id == deal_id)
+        )).one_or_none()
+        if deal is None:
+            return []
+        candidates = await candidate_searches(
+            redis, deal.region_id, deal.deal_branch_id, deal.deal_type_id, deal.lexemes or []
+        )
+        if not candidates:
+            return []
+        result = await db.execute(
+            select(Account_Model.id, Account_Model.email)
+            .select_from(SavedSearch_Model)
+            .join(Account_Model, Account_Model.id == SavedSearch_Model.account_id)
+            .join(Deal_Model, Deal_Model.id == deal_id)
+            .where(
+                SavedSearch_Model.id.in_(candidates),
+                or_(SavedSearch_Model.region_id.is_(None), SavedSearch_Model.region_id == Deal_Model.region_id),
+                or_(SavedSearch_Model.deal_branch_id.is_(None), SavedSearch_Model.deal_branch_id == Deal_Model.deal_branch_id),
+                or_(SavedSearch_Model.deal_type_id.is_(None), SavedSearch_Model.deal_type_id == Deal_Model.deal_type_id),
+                or_(
+                    SavedSearch_Model.search.is_(None),
+                    Deal_Model.search_vector.op("@@")(func.websearch_to_tsquery("russian", SavedSearch_Model.search))
+                ),
+                Deal_Model.seller_id.is_distinct_from(Account_Model.id),
+                Account_Model.is_active.is_(True)
+            )
+            .distinct()
+        )
+        return result.all()
+
+
+async def notify_matches(deal_id: int, matches: List[tuple]) -> None:
+    if not matches:
+        return
+    async with AsyncSessionLocal() as db:
+        deal = (await db.execute(
+            select(Deal_Model.name_deal, Deal_Model.total_cost, Deal_Model.address_deal).where(Deal_Model.id == deal_id)
+        )).one_or_none()
+    if deal is None:
+        return
+    semaphore = asyncio.Semaphore(EMAIL_CONCURRENCY)
+
+    async def send(email: str):
+        async with semaphore:
+            await send_saved_search_email(email, deal_id, deal.name_deal, float(deal.total_cost or 0), deal.address_deal)
+
+    await asyncio.gather(*(send(email) for _, email in matches))
+    logger.info(f"Сделка {deal_id}: уведомлений по сохранённым поискам — {len(matches)}")
+
+
+async def saved_searches_loop() -> None:
+    """
+    Фоновая задача: разбирает очередь новых сделок (BRPOP, каждую сделку
+    обрабатывает одна реплика) и отправляет письма по совпавшим поискам.
+    Если индекса нет (очистка Redis), сначала перестраивает его.
+    """
+    redis = get_redis_client(purpose="pubsub")
+    while True:
+        deal_id = None
+        try:
+            if not await redis.exists(INDEX_READY_KEY):
+                if await redis.set(INDEX_REBUILD_LOCK_KEY, "1", nx=True, ex=INDEX_REBUILD_LOCK_TTL):
+                    try:
+                        await rebuild_index(redis)
+                    finally:
+                        await redis.delete(INDEX_REBUILD_LOCK_KEY)
+                else:
+                    # Индекс перестраивает другая реплика
+                    await asyncio.sleep(QUEUE_WAIT_TIMEOUT)
+                    continue
+            item = await redis.brpop(NEW_DEALS_QUEUE, timeout=QUEUE_WAIT_TIMEOUT)
+            if item is None:
+                continue
+            deal_id = int(item[1])
+            await notify_matches(deal_id, await match_deal(redis, deal_id))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка обработки сохранённых поисков (сделка {deal_id}): {str(e)}")
+            if deal_id is not None:
+                # Письма ещё не отправлены (ошибки отправки не всплывают) — вернём сделку в конец очереди
+                await enqueue_new_deal(redis, deal_id)
+            await asyncio.sleep(QUEUE_WAIT_TIMEOUT)
@@ -0,0 +1,204 @@
+# deal_service/app/services/similar.py
+# Рекомендации «с этой сделкой также покупают»: косинусная близость сделок по покупателям
+import asyncio
+import json
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from scipy import sparse
+from sqlalchemy import select, func, distinct
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared.db.models.deal_consumers import DealConsumers
+from shared.db.redis import get_redis_client
+from shared.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+SIMILAR_TOP_K = 20  # Сколько похожих сделок хранить на сделку
+SIMILAR_TTL = 2 * 24 * 3600  # Списки переживают один пропуск полной перестройки, сек
+SIMILAR_DIRTY_KEY = "deal_similar:dirty"
+SIMILAR_REBUILD_LOCK_KEY = "deal_similar:rebuild_lock"
+SIMILAR_REBUILD_INTERVAL = 24 * 3600  # Полная перестройка, сек
+SIMILAR_UPDATE_INTERVAL = 60  # Обновление сделок с новыми покупками, сек
+SIMILAR_UPDATE_BATCH = 500
+BLOCK_ROWS = 2048  # Строк матрицы за одно умножение (ограничивает память)
+PURCHASES_YIELD_PER = 10000
+
+
+def similar_key(deal_id: int) -> str:
+    return f"deal_similar:{deal_id}"
+
+
+async def mark_similar_dirty(redis: Optional[Redis], deal_id: int) -> None:
+    """Помечает сделку для пересчёта похожих (после покупки)."""
+    if redis is None:
+        return
+    try:
+        await redis.sadd(SIMILAR_DIRTY_KEY, deal_id)
+    except RedisError as e:
+        logger.warning(f"Не удалось пометить сделку {deal_id} для пересчёта похожих: {str(e)}")
+
+
+async def get_similar(redis: Redis, deal_id: int) -> List[List]:
+    """Предрассчитанный список [[deal_id, score], ...] по убыванию близости (один GET)."""
+    value = await redis.get(similar_key(deal_id))
+    return json.loads(value) if value else []
+
+
+def purchase_matrix(pairs: np.ndarray):
+    """
+    Бинарная разреженная матрица сделки × покупатели.
+
+    :param pairs: массив (n, 2) пар (deal_id, consumer_id)
+    :return: (CSR-матрица, deal_id по номеру строки)
+    """
+    deal_ids, rows = np.unique(pairs[:, 0], return_inverse=True)
+    consumer_ids, columns = np.unique(pairs[:, 1], return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.float32), (rows, columns)),
+        shape=(len(deal_ids), len(consumer_ids))
+    )
+    # Повторные покупки одним покупателем не усиливают связь
+    matrix.data[:] = 1.0
+    return matrix, deal_ids
+
+
+def top_k_similar(
+    matrix: sparse.csr_matrix,
+    deal_ids: np.ndarray,
+    counts: np.ndarray,
+    rows: np.ndarray,
+    k: int = SIMILAR_TOP_K
+) -> Dict[int, List[List]]:
+    """
+    Top-K похожих сделок для строк rows.
+
+    Совместные покупки — произведение matrix[rows] @ matrix.T (блоками по BLOCK_ROWS),
+    близость — косинус бинарных векторов: co / sqrt(|A| * |B|), где |A| — число
+    покупателей сделки (counts, по всем покупкам, а не только попавшим в матрицу).
+    """
+    norms = np.sqrt(np.maximum(counts, 1)).astype(np.float64)
+    transposed = matrix.T.tocsr()
+    result = {}
+    for start in range(0, len(rows), BLOCK_ROWS):
+        block = rows[start:start + BLOCK_ROWS]
+        co = (matrix[block] @ transposed).tocsr()
+        for position, row in enumerate(block):
+            begin, end = co.indptr[position], co.indptr[position + 1]
+            columns, values = co.indices[begin:end], co.data[begin:end]
+            keep = columns != row
+            columns, values = columns[keep], values[keep]
+            scores = values / (norms[row] * norms[columns])
+            if len(scores) > k:
+                top = np.argpartition(-scores, k)[:k]
+            else:
+                top = np.arange(len(scores))
+            top = top[np.argsort(-scores[top], kind="stable")]
+            result[int(deal_ids[row])] = [[int(deal_ids[columns[i]]), round(float(scores[i]), 4)] for i in top]
+    return result
+
+
+async def _load_pairs(db: AsyncSession, stmt) -> np.ndarray:
+    """Пары (deal_id, consumer_id) из серверного курсора пачками."""
+    result = await db.stream(stmt.execution_options(yield_per=PURCHASES_YIELD_PER))
+    chunks = [np.array([tuple(row) for row in partition], dtype=np.int64) async for partition in result.partitions()]
+    return np.concatenate(chunks) if chunks else np.empty((0, 2), dtype=np.int64)
+
+
+async def _store(redis: Redis, lists: Dict[int, List[List]]) -> None:
+    items = list(lists.items())
+    for start in range(0, len(items), 1000):
+        async with redis.pipeline(transaction=False) as pipe:
+            for deal_id, similar in items[start:start + 1000]:
+                pipe.setex(similar_key(deal_id), SIMILAR_TTL, json.dumps(similar))
+            await pipe.execute()
+
+
+async def rebuild_similar(redis: Redis) -> int:
+    """Полная перестройка по всем покупкам. :return: количество сделок со списком"""
+    async with AsyncSessionLocal() as db:
+        pairs = await _load_pairs(
+            db,
+            select(DealConsumers.c.deal_id, DealConsumers.c.consumer_id)
+            .where(DealConsumers.c.consumer_id.isnot(None))
+            .distinct()
+        )
+    if not len(pairs):
+        return 0
+    matrix, deal_ids = purchase_matrix(pairs)
+    counts = np.asarray(matrix.sum(axis=1)).ravel()
+    # Умножение матриц — в потоке, чтобы не блокировать цикл событий
+    lists = await asyncio.to_thread(top_k_similar, matrix, deal_ids, counts, np.arange(len(deal_ids)))
+    await _store(redis, lists)
+    logger.info(f"Похожие сделки перестроены: {len(lists)}")
+    return len(lists)
+
+
+async def refresh_similar(redis: Redis, dirty_ids: List[int]) -> None:
+    """
+    Пересчёт списков только для сделок с новыми покупками.
+
+    Берутся покупки тех, кто купил эти сделки: совместные покупки с ними
+    целиком попадают в такую подматрицу. Нормы — по полному числу покупателей.
+    Списки соседей обновит полная перестройка.
+    """
+    buyers = select(DealConsumers.c.consumer_id).where(
+        DealConsumers.c.deal_id.in_(dirty_ids), DealConsumers.c.consumer_id.isnot(None)
+    )
+    async with AsyncSessionLocal() as db:
+        pairs = await _load_pairs(
+            db,
+            select(DealConsumers.c.deal_id, DealConsumers.c.consumer_id)
+            .where(DealConsumers.c.consumer_id.in_(buyers))
+            .distinct()
+        )
+        if not len(pairs):
+            return
+        candidates = select(DealConsumers.c.deal_id).where(DealConsumers.c.consumer_id.in_(buyers))
+        totals = dict((await db.execute(
+            select(DealConsumers.c.deal_id, func.count(distinct(DealConsumers.c.consumer_id)))
+            .where(DealConsumers.c.deal_id.in_(candidates))
+            .group_by(DealConsumers.c.deal_id)
+        )).all())
+    matrix, deal_ids = purchase_matrix(pairs)
+    counts = np.array([totals.get(int(deal_id), 1) for deal_id in deal_ids], dtype=np.float64)
+    rows = np.flatnonzero(np.isin(deal_ids, dirty_ids))
+    lists = await asyncio.to_thread(top_k_similar, matrix, deal_ids, counts, rows)
+    await _store(redis, lists)
+
+
+async def similar_deals_loop() -> None:
+    """
+    Фоновая задача: раз в минуту пересчитывает сделки с новыми покупками,
+    раз в сутки (одна реплика, по блокировке) перестраивает все списки.
+    """
+    redis = get_redis_client()
+    while True:
+        dirty_ids = []
+        try:
+            if await redis.set(SIMILAR_REBUILD_LOCK_KEY, "1", nx=True, ex=SIMILAR_REBUILD_INTERVAL):
+                await redis.delete(SIMILAR_DIRTY_KEY)
+                await rebuild_similar(redis)
+            dirty_ids = [int(value) for value in await redis.spop(SIMILAR_DIRTY_KEY, SIMILAR_UPDATE_BATCH) or []]
+            if dirty_ids:
+                await refresh_similar(redis, dirty_ids)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка пересчёта похожих сделок: {str(e)}")
+            if dirty_ids:
+                try:
+                    await redis.sadd(SIMILAR_DIRTY_KEY, *dirty_ids)
+                except RedisError:
+                    pass
+        await asyncio.sleep(SIMILAR_UPDATE_INTERVAL)
+
+
+if __name__ == "__main__":
+    # Ручной запуск полной перестройки: python -m deal_service.app.services.similar
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(rebuild_similar(get_redis_client()))
@@ -0,0 +1,12 @@
+# media_service/app/main.py
+from fastapi import FastAPI
+
+from media_service.app.routes import files
+
+app = FastAPI(
+    title="Media Service",
+    description="Сервис раздачи статики: фото сделок, логотипы компаний, аватары"
+)
+
+# Подключение роутов
+app.include_router(files.router, prefix="/static", tags=["static"])
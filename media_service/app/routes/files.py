@@ -0,0 +1,97 @@
+from email.utils import formatdate
+
+import aiofiles.os as aio_os
+from fastapi import APIRouter, HTTPException, Request, Response, status
+
+from media_service.app.services.files import (
+    STATIC_ROOT, IMMUTABLE_CACHE, DEFAULT_CACHE, LARGE_TRANSFER_SIZE, TRANSFER_WAIT_TIMEOUT,
+    FileRangeResponse, resolve_path, is_hashed, make_etag, etag_matches, parse_range,
+    pick_encoding, content_type, acquire_transfer_slot
+)
+from shared.core.config import settings
+from shared.services.media import variant_source
+
+router = APIRouter()
+
+
+@router.api_route("/{path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def serve_static(path: str, request: Request):
+    """
+    Отдача статики: фото сделок, логотипы, аватары.
+
+    Поддерживает условные запросы (ETag / If-None-Match), диапазоны байт (Range / If-Range)
+    и предварительно сжатые копии. Файлы медиахранилища отдаются с immutable-кэшированием.
+    """
+    hashed = is_hashed(path)
+    cache_control = IMMUTABLE_CACHE if hashed else DEFAULT_CACHE
+    full_path = resolve_path(path)
+    if full_path is None and hashed:
+        # Вариант ещё не сгенерирован — отдаём оригинал, но без долгого кэширования
+        full_path = variant_source(STATIC_ROOT / path)
+        cache_control = "no-cache"
+    if full_path is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Файл не найден")
+
+    send_path, encoding = pick_encoding(full_path, request.headers.get("accept-encoding", ""))
+    stat = await aio_os.stat(send_path)
+    etag = make_etag(full_path, stat, hashed)
+    if encoding:
+        # У сжатой копии своё представление — и свой ETag
+        etag = f'{etag[:-1]}-{encoding}"'
+
+    headers = {
+        "cache-control": cache_control,
+        "etag": etag,
+        "last-modified": formatdate(stat.st_mtime, usegmt=True),
+        "accept-ranges": "bytes",
+        "vary": "Accept-Encoding",
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    headers["content-type"] = content_type(full_path)
+    if encoding:
+        headers["content-encoding"] = encoding
+
+    if settings.MEDIA_ACCEL_REDIRECT_PREFIX:
+        # За nginx: он сам отдаст файл через sendfile и обработает Range
+        relative = send_path.relative_to(STATIC_ROOT).as_posix()
+        headers["x-accel-redirect"] = f"{settings.MEDIA_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{relative}"
+        return Response(headers=headers)
+
+    size = stat.st_size
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range and if_range.strip() != etag:
+        # Файл изменился с момента первой части — отдаём целиком
+        range_header = None
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        return Response(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            headers={"content-range": f"bytes */{size}"}
+        )
+
+    if byte_range is None:
+        start, length, status_code = 0, size, status.HTTP_200_OK
+    else:
+        start, end = byte_range
+        length, status_code = end - start + 1, status.HTTP_206_PARTIAL_CONTENT
+        headers["content-range"] = f"bytes {start}-{end}/{size}"
+
+    send_body = request.method != "HEAD"
+    release = None
+    if send_body and length >= LARGE_TRANSFER_SIZE:
+        release = await acquire_transfer_slot()
+        if release is None:
+            raise HTTPException(
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+                "Сервер перегружен, повторите запрос позже",
+                headers={"Retry-After": str(TRANSFER_WAIT_TIMEOUT)}
+            )
+
+    return FileRangeResponse(
+        send_path, start, length, status_code, headers,
+        send_body=send_body, on_complete=release
+    )
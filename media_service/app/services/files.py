@@ -0,0 +1,173 @@
+# media_service/app/services/files.py
+import asyncio
+import mimetypes
+import os
+import re
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+import aiofiles
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from shared.core.config import settings
+
+STATIC_ROOT = Path("static").resolve()
+CHUNK_SIZE = 64 * 1024
+
+# Имена файлов медиахранилища содержат SHA-256 содержимого — их можно кэшировать навсегда
+HASHED_NAME = re.compile(r"^media/[0-9a-f]{2}/[0-9a-f]{64}(_[a-z]+)?\.[a-z0-9]+$")
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+DEFAULT_CACHE = "public, max-age=300"
+
+# Предварительно сжатые копии рядом с файлом (file.svg.br, file.svg.gz), в порядке предпочтения
+SIDECARS = (("br", ".br"), ("gzip", ".gz"))
+
+LARGE_TRANSFER_SIZE = 256 * 1024  # С какого размера отдача считается крупной
+TRANSFER_WAIT_TIMEOUT = 10  # Сколько ждать свободный слот для крупной отдачи, сек
+
+# Ограничение одновременных крупных отдач: загрузка фото не должна занимать все соединения процесса
+_large_transfers = asyncio.Semaphore(settings.MEDIA_MAX_LARGE_TRANSFERS)
+
+
+def resolve_path(path: str) -> Optional[Path]:
+    """Путь к файлу внутри STATIC_ROOT (None, если его нет или путь выходит за пределы каталога)."""
+    full_path = (STATIC_ROOT / path).resolve()
+    if STATIC_ROOT not in full_path.parents:
+        return None
+    return full_path if full_path.is_file() else None
+
+
+def is_hashed(path: str) -> bool:
+    return HASHED_NAME.match(path) is not None
+
+
+def make_etag(full_path: Path, stat: os.stat_result, hashed: bool) -> str:
+    """Сильный ETag: хэш из имени для медиахранилища, иначе — время изменения и размер."""
+    if hashed:
+        return f'"{full_path.stem}"'
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Проверка If-None-Match / If-Range (слабое сравнение для If-None-Match допустимо по RFC 9110)."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [value.strip().removeprefix("W/") for value in header.split(",")]
+    return etag in candidates
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Разбирает заголовок Range с одним диапазоном.
+
+    :return: (start, end) включительно; None — отдать файл целиком
+             (нет заголовка, несколько диапазонов или неизвестная единица)
+    :raises ValueError: диапазон невыполним (ответ 416)
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_text, _, end_text = header[len("bytes="):].strip().partition("-")
+    try:
+        if not start_text:
+            # bytes=-N — последние N байт
+            length = int(end_text)
+            if length <= 0:
+                raise ValueError
+            return max(size - length, 0), size - 1
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+    except ValueError:
+        raise ValueError("Некорректный диапазон")
+    if start >= size or start > end:
+        raise ValueError("Диапазон за пределами файла")
+    return start, min(end, size - 1)
+
+
+def pick_encoding(full_path: Path, accept_encoding: str) -> Tuple[Path, Optional[str]]:
+    """Выбирает предварительно сжатую копию файла, если клиент её принимает."""
+    accepted = {value.split(";")[0].strip() for value in accept_encoding.split(",")}
+    for encoding, suffix in SIDECARS:
+        if encoding in accepted:
+            sidecar = full_path.with_name(full_path.name + suffix)
+            if sidecar.is_file():
+                return sidecar, encoding
+    return full_path, None
+
+
+def content_type(full_path: Path) -> str:
+    media_type, _ = mimetypes.guess_type(full_path.name)
+    return media_type or "application/octet-stream"
+
+
+async def acquire_transfer_slot() -> Optional[Callable[[], None]]:
+    """
+    Занимает слот для крупной отдачи.
+
+    :return: функция освобождения слота; None — свободных слотов нет (ответ 503)
+    """
+    try:
+        await asyncio.wait_for(_large_transfers.acquire(), TRANSFER_WAIT_TIMEOUT)
+    except asyncio.TimeoutError:
+        return None
+    return _large_transfers.release
+
+
+class FileRangeResponse(Response):
+    """
+    Отдача файла целиком или диапазона байт.
+
+    Если ASGI-сервер поддерживает расширение http.response.zerocopysend,
+    файл передаётся без копирования в пространство пользователя (sendfile);
+    иначе — читается кусками по CHUNK_SIZE.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        start: int,
+        length: int,
+        status_code: int,
+        headers: dict,
+        send_body: bool = True,
+        on_complete: Optional[Callable[[], None]] = None
+    ):
+        super().__init__(status_code=status_code, headers={**headers, "content-length": str(length)})
+        self.path = path
+        self.start = start
+        self.length = length
+        self.send_body = send_body
+        self.on_complete = on_complete
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            if not self.send_body or self.length == 0:
+                await send({"type": "http.response.body", "body": b""})
+                return
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                with open(self.path, "rb") as file:
+                    await send({
+                        "type": "http.response.zerocopysend",
+                        "file": file.fileno(),
+                        "offset": self.start,
+                        "count": self.length,
+                    })
+                return
+            async with aiofiles.open(self.path, "rb") as file:
+                await file.seek(self.start)
+                remaining = self.length
+                while remaining > 0:
+                    chunk = await file.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+                if remaining > 0:
+                    # Файл укоротился во время отдачи — закрываем ответ
+                    await send({"type": "http.response.body", "body": b""})
+        finally:
+            if self.on_complete is not None:
+                self.on_complete()
@@ -1,8 +1,15 @@
 # rating_service/app/main.py
+import asyncio
+
 from fastapi import FastAPI
-from starlette.staticfiles import StaticFiles
 
 from rating_service.app.routes import ratings
+from rating_service.app.services.ranking_incremental import ranking_updates_loop
+from rating_service.app.services.top_positions import top_positions_loop
+from shared.cache.reference_data import reference_data_listener
+from shared.db.redis import close_redis_pools, redis_pool_stats
+from shared.services.media import LegacyStaticFiles
+from shared.services.partners import partner_names_listener
 
 app = FastAPI(
     title="Rating Service",
@@ -12,4 +19,30 @@ app = FastAPI(
 # Подключение роутов
 app.include_router(ratings.router, prefix="/rating", tags=["rating"])
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Статика (фото, логотипы) раздаётся отдельным media_service (через шлюз: /static/...).
+# Прежний /static сервиса оставлен, пока клиенты не перейдут на новые URL
+app.mount("/static", LegacyStaticFiles(directory="static"), name="static")
+
+# Метрики пулов соединений Redis
+@app.get("/metrics/redis", include_in_schema=False)
+async def redis_metrics():
+    return {"pools": redis_pool_stats()}
+
+# Фоновые задачи: инкрементальное обновление рейтинга, расписание окончания топ-позиций,
+# обновление справочников и названий партнёров в памяти процесса
+@app.on_event("startup")
+async def startup_event():
+    app.state.ranking_updates = asyncio.create_task(ranking_updates_loop())
+    app.state.top_positions = asyncio.create_task(top_positions_loop())
+    app.state.reference_data = asyncio.create_task(reference_data_listener())
+    app.state.partner_names = asyncio.create_task(partner_names_listener())
+
+# Закрываем пулы Redis при остановке
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.ranking_updates.cancel()
+    app.state.top_positions.cancel()
+    app.state.reference_data.cancel()
+    app.state.partner_names.cancel()
+    await close_redis_pools()
+
@@ -1,40 +1,46 @@
-import os
 from decimal import Decimal
-from zoneinfo import ZoneInfo
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select, func, distinct, update
+from sqlalchemy import select, func, distinct
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 import sqlalchemy as sa
 from typing import Optional
 from fastapi_pagination import Page, add_pagination, Params
 from sqlalchemy.orm import joinedload
 from redis.asyncio import Redis
-from datetime import datetime, timedelta
-import json
+from datetime import timedelta
 
 from starlette.background import BackgroundTasks
 from rating_service.app.services.mail import send_top_purchase_email
-from shared.db.models import (
-    Company_Model, Account_Model, Deal_Model, Feedback_Model,
-    DealBranch, Region, BuyTop, deal_consumers as DealConsumers
+from shared.db.archive import deals_with_archive, feedback_with_archive
+from shared.db.models import Company_Model, Account_Model, DealBranch, Region, BuyTop
+from shared.cache.namespace import (
+    COMPANIES_CACHE, VIKOR_COMPANIES_CACHE, company_tag, account_tag
 )
+from shared.cache.reference_data import ReferenceData, get_reference_data
+from shared.cache.swr import get_or_compute
+from shared.db.redis import get_redis
 from shared.db.session import get_db
 from shared.services.auth import get_current_company
+from shared.services.media import thumbnail_url
+from shared.services.partners import resolve_partner_names, build_partners, get_partners
 from rating_service.app.schemas.ratings import (
     CompanyShortSchema, CompanyDetailSchema, CompanyVikorSchema,
     BuyingTopCreate, BuyingTopPublic
 )
-from rating_service.app.services.ranking import calculate_company_rankings
+from rating_service.app.services.ranking import (
+    RANKING_METHODS, RANKING_PROFILES, DEFAULT_METHOD, DEFAULT_PROFILE, segment_name
+)
+from rating_service.app.services.ranking_snapshots import ensure_snapshots, read_combined_page
+from rating_service.app.services.top_positions import get_active_top_ids, schedule_top
 
 router = APIRouter()
 
-MOSCOW_TZ = ZoneInfo("Europe/Moscow")
-
-# Зависимость для Redis
-async def get_redis() -> Redis:
-    redis_url = os.getenv("REDIS_URL", "redis://redis:6379/0")
-    return Redis.from_url(redis_url, decode_responses=True)
+# Страницы рейтинга: после мягкого срока отдаём устаревшие данные и пересчитываем в фоне,
+# жёсткий срок — сколько ключ вообще живёт в Redis
+RATING_CACHE_SOFT_TTL = 3600
+RATING_CACHE_HARD_TTL = 4 * 3600
 
 @router.get(
     "/regions",
@@ -42,10 +48,9 @@ async def get_redis() -> Redis:
     summary="GET регионы нашей страны на 2025 год",
     description="Для фильтров выборка по регионам"
 )
-async def get_regions(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Region.id, Region.name))
-    regions = result.all()
-    return [{"id": r[0], "name": r[1]} for r in regions]
+async def get_regions(reference: ReferenceData = Depends(get_reference_data)):
+    # Справочники отдаются из памяти процесса, см. shared/cache/reference_data.py
+    return ReferenceData.as_list(reference.regions)
 
 @router.get(
     "/industries",
@@ -53,10 +58,8 @@ async def get_regions(db: AsyncSession = Depends(get_db)):
     summary="GET на получение отраслей (выбрал основные, можно добавить)",
     description="ИТ/сельское хозяйство и т.д., см в seed_deal_branches"
 )
-async def get_deal_branches(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(DealBranch.id, DealBranch.name))
-    branches = result.all()
-    return [{"id": r[0], "name": r[1]} for r in branches]
+async def get_deal_branches(reference: ReferenceData = Depends(get_reference_data)):
+    return ReferenceData.as_list(reference.branches)
 
 @router.get(
     "/companies",
@@ -72,163 +75,172 @@ async def get_companies(
     db: AsyncSession = Depends(get_db),
     redis: Redis = Depends(get_redis)
 ):
-    cache_key = f"companies:region_{region_id or 'all'}:industry_{industry_id or 'all'}:page_{params.page}:size_{params.size}"
-    cached = await redis.get(cache_key)
-    if cached:
-        return Page(**json.loads(cached))
-
-    # Подзапрос для средней оценки
-    avg_rating_subquery = (
-        select(
-            Deal_Model.seller_id,
-            func.avg(Feedback_Model.stars).label("avg_rating")
-        )
-        .join(Feedback_Model, Feedback_Model.deal_id == Deal_Model.id)
-        .group_by(Deal_Model.seller_id)
-        .subquery()
+    # Сортировка зависит от региона пользователя — он входит в ключ кэша
+    user_region_id = current_company.account.region_id
+    cache_key = await COMPANIES_CACHE.key(
+        redis, f"region_{region_id or 'all'}", f"industry_{industry_id or 'all'}",
+        f"user_region_{user_region_id}", f"page_{params.page}", f"size_{params.size}"
     )
 
-    # Подзапрос для индустрий
-    industries_subquery = (
-        select(
-            Deal_Model.seller_id,
-            func.array_agg(distinct(DealBranch.id)).label("industry_ids"),
-            func.array_agg(distinct(DealBranch.name)).label("industry_names")
-        )
-        .join(DealBranch, Deal_Model.deal_branch_id == DealBranch.id)
-        .group_by(Deal_Model.seller_id)
-        .subquery()
-    )
+    async def build_page(session: AsyncSession):
+        # Сделки и отзывы — вместе с архивом закрытых сделок
+        deals = deals_with_archive("id", "seller_id", "deal_branch_id")
+        feedback = feedback_with_archive("deal_id", "stars")
 
-    # Запрос для компаний с активной топ-позицией
-    top_companies_query = (
-        select(
-            Company_Model,
-            avg_rating_subquery.c.avg_rating,
-            industries_subquery.c.industry_ids,
-            industries_subquery.c.industry_names,
-            BuyTop.time_stop,
-            Account_Model.region_id,
-            Region.name.label("region_name")
+        # Подзапрос для средней оценки
+        avg_rating_subquery = (
+            select(
+                deals.c.seller_id,
+                func.avg(feedback.c.stars).label("avg_rating")
+            )
+            .join(feedback, feedback.c.deal_id == deals.c.id)
+            .group_by(deals.c.seller_id)
+            .subquery()
         )
-        .join(Account_Model, Company_Model.account_id == Account_Model.id)
-        .join(Region, Account_Model.region_id == Region.id)
-        .join(BuyTop, BuyTop.id_company == Company_Model.id)
-        .outerjoin(avg_rating_subquery, avg_rating_subquery.c.seller_id == Company_Model.account_id)
-        .outerjoin(industries_subquery, industries_subquery.c.seller_id == Company_Model.account_id)
-        .where(BuyTop.time_stop >= func.now())
-        .order_by(BuyTop.time_stop.desc())
-    )
 
-    top_companies_result = await db.execute(top_companies_query)
-    top_companies = top_companies_result.all()
+        # Подзапрос для индустрий
+        industries_subquery = (
+            select(
+                deals.c.seller_id,
+                func.array_agg(distinct(DealBranch.id)).label("industry_ids"),
+                func.array_agg(distinct(DealBranch.name)).label("industry_names")
+            )
+            .join(DealBranch, deals.c.deal_branch_id == DealBranch.id)
+            .group_by(deals.c.seller_id)
+            .subquery()
+        )
 
-    # Основной запрос для остальных компаний
-    query = (
-        select(
-            Company_Model,
-            avg_rating_subquery.c.avg_rating,
-            industries_subquery.c.industry_ids,
-            industries_subquery.c.industry_names,
-            Account_Model.region_id,
-            Region.name.label("region_name")
+        # Компании с активной топ-позицией — из реестра расписания топа, без запроса к buy_top
+        top_company_ids = await get_active_top_ids(redis)
+        top_companies_query = (
+            select(
+                Company_Model,
+                avg_rating_subquery.c.avg_rating,
+                industries_subquery.c.industry_ids,
+                industries_subquery.c.industry_names,
+                Account_Model.region_id,
+                Region.name.label("region_name")
+            )
+            .join(Account_Model, Company_Model.account_id == Account_Model.id)
+            .join(Region, Account_Model.region_id == Region.id)
+            .outerjoin(avg_rating_subquery, avg_rating_subquery.c.seller_id == Company_Model.account_id)
+            .outerjoin(industries_subquery, industries_subquery.c.seller_id == Company_Model.account_id)
+            .where(Company_Model.id.in_(top_company_ids))
         )
-        .join(Account_Model, Company_Model.account_id == Account_Model.id)
-        .join(Region, Account_Model.region_id == Region.id)
-        .outerjoin(avg_rating_subquery, avg_rating_subquery.c.seller_id == Company_Model.account_id)
-        .outerjoin(industries_subquery, industries_subquery.c.seller_id == Company_Model.account_id)
-        .where(~Company_Model.id.in_([c[0].id for c in top_companies]))  # Исключаем топ-компании
-    )
 
-    # Фильтры
-    if region_id:
-        query = query.filter(Account_Model.region_id == region_id)
-    if industry_id:
-        query = query.filter(industries_subquery.c.industry_ids.op('@>')(sa.cast([industry_id], sa.ARRAY(sa.Integer))))
+        top_companies_result = await session.execute(top_companies_query)
+        # Порядок реестра — по убыванию time_stop
+        top_order = {company_id: index for index, company_id in enumerate(top_company_ids)}
+        top_companies = sorted(top_companies_result.all(), key=lambda row: top_order[row[0].id])
+
+        # Основной запрос для остальных компаний
+        query = (
+            select(
+                Company_Model,
+                avg_rating_subquery.c.avg_rating,
+                industries_subquery.c.industry_ids,
+                industries_subquery.c.industry_names,
+                Account_Model.region_id,
+                Region.name.label("region_name")
+            )
+            .join(Account_Model, Company_Model.account_id == Account_Model.id)
+            .join(Region, Account_Model.region_id == Region.id)
+            .outerjoin(avg_rating_subquery, avg_rating_subquery.c.seller_id == Company_Model.account_id)
+            .outerjoin(industries_subquery, industries_subquery.c.seller_id == Company_Model.account_id)
+            .where(~Company_Model.id.in_([c[0].id for c in top_companies]))  # Исключаем топ-компании
+        )
 
-    # Сортировка: по региону текущего пользователя, затем по средней оценке
-    query = query.order_by(
-        (Account_Model.region_id == current_company.account.region_id).desc(),
-        func.coalesce(avg_rating_subquery.c.avg_rating, 0).desc()
-    )
+        # Фильтры
+        if region_id:
+            query = query.filter(Account_Model.region_id == region_id)
+        if industry_id:
+            query = query.filter(industries_subquery.c.industry_ids.op('@>')(sa.cast([industry_id], sa.ARRAY(sa.Integer))))
 
-    # Выполняем запрос для остальных компаний
-    other_companies_result = await db.execute(query)
-    other_companies = other_companies_result.all()
-
-    # Формируем объединенный результат
-    result = []
-
-    # Добавляем топ-компании
-    for company, avg_rating, industry_ids, industry_names, time_stop, region_id, region_name in top_companies:
-        partners = []
-        if company.partner_companies:
-            partner_result = await db.execute(
-                select(Account_Model.id, Company_Model.name)
-                .join(Company_Model, Company_Model.account_id == Account_Model.id)
-                .where(Account_Model.id.in_(company.partner_companies))
-            )
-            partners = [{"id": row[0], "name": row[1]} for row in partner_result.all()]
+        # Сортировка: по региону текущего пользователя, затем по средней оценке
+        query = query.order_by(
+            (Account_Model.region_id == user_region_id).desc(),
+            func.coalesce(avg_rating_subquery.c.avg_rating, 0).desc()
+        )
 
-        industries = [
-            {"id": id, "name": name}
-            for id, name in zip(industry_ids or [], industry_names or [])
-        ]
+        # Выполняем запрос для остальных компаний
+        other_companies_result = await session.execute(query)
+        other_companies = other_companies_result.all()
+
+        # Формируем объединенный результат
+        result = []
+
+        # Добавляем топ-компании
+        for company, avg_rating, industry_ids, industry_names, company_region_id, region_name in top_companies:
+            industries = [
+                {"id": id, "name": name}
+                for id, name in zip(industry_ids or [], industry_names or [])
+            ]
+
+            result.append({
+                "id": company.id,
+                "name": company.name,
+                "logo_url": company.logo_url,
+                "logo_thumb_url": thumbnail_url(company.logo_url),
+                "description": company.description,
+                "director_full_name": company.director_full_name,
+                "average_rating": float(avg_rating) if avg_rating is not None else None,  # Соответствует Optional[float]
+                "region_id": company_region_id,
+                "region_name": region_name,
+                "industries": industries,
+                "partners": company.partner_companies or [],  # ID партнёров, названия подставим после пагинации
+                "is_top": True
+            })
+
+        # Добавляем остальные компании
+        for company, avg_rating, industry_ids, industry_names, company_region_id, region_name in other_companies:
+            industries = [
+                {"id": id, "name": name}
+                for id, name in zip(industry_ids or [], industry_names or [])
+            ]
+
+            result.append({
+                "id": company.id,
+                "name": company.name,
+                "logo_url": company.logo_url,
+                "logo_thumb_url": thumbnail_url(company.logo_url),
+                "description": company.description,
+                "director_full_name": company.director_full_name,
+                "average_rating": float(avg_rating) if avg_rating is not None else None,  # Соответствует Optional[float]
+                "region_id": company_region_id,
+                "region_name": region_name,
+                "industries": industries,
+                "partners": company.partner_companies or [],  # ID партнёров, названия подставим после пагинации
+                "is_top": False
+            })
+
+        # Пагинация: вырезаем текущую страницу
+        raw_params = params.to_raw_params()
+        page_items = result[raw_params.offset:raw_params.offset + raw_params.limit]
+
+        # Названия партнёров для всей страницы — одним запросом
+        partner_names = await resolve_partner_names(
+            session,
+            (partner_id for item in page_items for partner_id in item["partners"]),
+            redis
+        )
+        for item in page_items:
+            item["partners"] = build_partners(item["partners"], partner_names)
 
-        result.append({
-            "id": company.id,
-            "name": company.name,
-            "logo_url": company.logo_url,
-            "description": company.description,
-            "director_full_name": company.director_full_name,
-            "average_rating": float(avg_rating) if avg_rating is not None else None,  # Соответствует Optional[float]
-            "region_id": region_id,
-            "region_name": region_name,
-            "industries": industries,
-            "partners": partners,
-            "is_top": True
-        })
-
-    # Добавляем остальные компании
-    for company, avg_rating, industry_ids, industry_names, region_id, region_name in other_companies:
-        partners = []
-        if company.partner_companies:
-            partner_result = await db.execute(
-                select(Account_Model.id, Company_Model.name)
-                .join(Company_Model, Company_Model.account_id == Account_Model.id)
-                .where(Account_Model.id.in_(company.partner_companies))
-            )
-            partners = [{"id": row[0], "name": row[1]} for row in partner_result.all()]
+        page_response = Page.create(
+            items=page_items,
+            total=len(result),
+            params=params
+        )
 
-        industries = [
-            {"id": id, "name": name}
-            for id, name in zip(industry_ids or [], industry_names or [])
-        ]
+        # Помечаем страницу тегами компаний (и их партнёров) на ней
+        tags = {company_tag(item["id"]) for item in page_items}
+        tags.update(account_tag(partner["id"]) for item in page_items for partner in item["partners"])
+        return page_response.dict(), tags
 
-        result.append({
-            "id": company.id,
-            "name": company.name,
-            "logo_url": company.logo_url,
-            "description": company.description,
-            "director_full_name": company.director_full_name,
-            "average_rating": float(avg_rating) if avg_rating is not None else None,  # Соответствует Optional[float]
-            "region_id": region_id,
-            "region_name": region_name,
-            "industries": industries,
-            "partners": partners,
-            "is_top": False
-        })
-
-    # Пагинация через fastapi_pagination
-    page_response = Page.create(
-        items=result,
-        total=len(result),
-        params=params
+    page = await get_or_compute(
+        COMPANIES_CACHE, redis, db, cache_key, build_page, RATING_CACHE_SOFT_TTL, RATING_CACHE_HARD_TTL
     )
-
-    # Кэшируем результат
-    await redis.setex(cache_key, 3600, json.dumps(page_response.dict()))
-    return page_response
+    return Page(**page)
 
 @router.get(
     "/companies/{company_id}",
@@ -238,7 +250,8 @@ async def get_companies(
 )
 async def get_company_details(
     company_id: int,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis)
 ):
     result = await db.execute(
         select(
@@ -258,19 +271,13 @@ async def get_company_details(
 
     company, region_id, region_name = row[0], row[1], row[2]
 
-    partners = []
-    if company.partner_companies:
-        partner_result = await db.execute(
-            select(Account_Model.id, Company_Model.name)
-            .join(Company_Model, Company_Model.account_id == Account_Model.id)
-            .where(Account_Model.id.in_(company.partner_companies))
-        )
-        partners = [{"id": row[0], "name": row[1]} for row in partner_result.all()]
+    partners = await get_partners(db, company.partner_companies, redis)
 
     return {
         "id": company.id,
         "name": company.name,
         "logo_url": company.logo_url,
+        "logo_variants": company.logo_variants,
         "slogan": company.slogan,
         "description": company.description,
         "region_id": region_id,
@@ -285,117 +292,93 @@ async def get_company_details(
         "partners": partners
     }
 
+@router.get(
+    "/ranking-profiles",
+    response_model=dict,
+    summary="GET доступные методы и профили весов рейтинга",
+    description="Для выбора параметров method и profile в /ranking-vikor-companies"
+)
+async def get_ranking_profiles():
+    return {
+        "methods": [
+            {"id": method, "title": config["title"], "ascending": config["ascending"]}
+            for method, config in RANKING_METHODS.items()
+        ],
+        "profiles": [
+            {"id": profile, "title": config["title"], "weights": config["weights"], "v": config["v"]}
+            for profile, config in RANKING_PROFILES.items()
+        ],
+        "default_method": DEFAULT_METHOD,
+        "default_profile": DEFAULT_PROFILE
+    }
+
 @router.get(
     "/ranking-vikor-companies",
     response_model=Page[CompanyVikorSchema],
-    summary="Рейтинг компаний по VIKOR с учетом топ-позиций",
-    description="Выводит компании по 30 на страницу, сначала компании с активной топ-позицией (по убыванию time_stop), затем по VIKOR"
+    summary="Рейтинг компаний (VIKOR, TOPSIS, взвешенная сумма) с учетом топ-позиций",
+    description="Выводит компании по 30 на страницу, сначала компании с активной топ-позицией (по убыванию time_stop), затем по оценке выбранного метода и профиля весов. С region_id/industry_id — рейтинг внутри сегмента (нормализация относительно компаний сегмента)"
 )
 async def get_vikor_companies(
+    region_id: Optional[int] = Query(None, description="Рейтинг внутри региона"),
+    industry_id: Optional[int] = Query(None, description="Рейтинг внутри отрасли"),
+    profile: str = Query(DEFAULT_PROFILE, description="Профиль весов критериев (см. /ranking-profiles)"),
+    method: str = Query(DEFAULT_METHOD, description="Метод ранжирования: vikor, topsis, weighted_sum"),
     params: Params = Depends(),  # Используем параметры пагинации
     db: AsyncSession = Depends(get_db),
     redis: Redis = Depends(get_redis)
 ):
-    cache_key = f"vikor_companies:page_{params.page}:size_{params.size}"
-    cached = await redis.get(cache_key)
-    if cached:
-        return Page(**json.loads(cached))
+    if profile not in RANKING_PROFILES:
+        raise HTTPException(status_code=400, detail=f"Неизвестный профиль рейтинга: {profile}")
+    if method not in RANKING_METHODS:
+        raise HTTPException(status_code=400, detail=f"Неизвестный метод рейтинга: {method}")
+
+    segment = segment_name(region_id, industry_id)
+    cache_key = await VIKOR_COMPANIES_CACHE.key(
+        redis, method, profile, segment, f"page_{params.page}", f"size_{params.size}"
+    )
 
-    # Получаем компании с активной топ-позицией
-    top_companies_query = (
-        select(
-            Company_Model,
-            BuyTop.time_stop,
-            func.coalesce(
-                (select(func.avg(Feedback_Model.stars))
-                 .join(Deal_Model, Feedback_Model.deal_id == Deal_Model.id)
-                 .where(Deal_Model.seller_id == Company_Model.account_id)
-                 .scalar_subquery()), 0
-            ).label("avg_rating"),
-            func.coalesce(
-                (select(func.count(Feedback_Model.id))
-                 .join(Deal_Model, Feedback_Model.deal_id == Deal_Model.id)
-                 .where(Deal_Model.seller_id == Company_Model.account_id)
-                 .scalar_subquery()), 0
-            ).label("feedback_count"),
-            func.coalesce(
-                (select(func.count(Deal_Model.id))
-                 .where(Deal_Model.seller_id == Company_Model.account_id)
-                 .scalar_subquery()), 0
-            ).label("order_count"),
-            func.coalesce(
-                (select(func.count(distinct(DealConsumers.c.consumer_id)))
-                 .join(Deal_Model, DealConsumers.c.deal_id == Deal_Model.id)
-                 .where(Deal_Model.seller_id == Company_Model.account_id)
-                 .group_by(Deal_Model.seller_id)
-                 .having(func.count(DealConsumers.c.deal_id) > 1)
-                 .scalar_subquery()), 0
-            ).label("repeat_customer_orders"),
-            Account_Model.region_id,
-            Region.name.label("region_name")
+    async def build_page(session: AsyncSession):
+        # ID компаний с активной топ-позицией (по убыванию time_stop) из реестра; метрики берём из снимка
+        top_company_ids = await get_active_top_ids(redis)
+
+        # Снимки всех методов, профилей и сегментов строятся одним проходом по БД и живут до инвалидации рейтинга
+        prefix = await ensure_snapshots(session, redis)
+        raw_params = params.to_raw_params()
+        rows, total = await read_combined_page(
+            redis, prefix, method, profile, list(top_company_ids), raw_params.offset, raw_params.limit, segment
         )
-        .join(Account_Model, Company_Model.account_id == Account_Model.id)  # Добавляем JOIN
-        .join(Region, Account_Model.region_id == Region.id)
-        .join(BuyTop, BuyTop.id_company == Company_Model.id)
-        .where(BuyTop.time_stop >= func.now())
-        .order_by(BuyTop.time_stop.desc())
-    )
 
-    top_companies_result = await db.execute(top_companies_query)
-    top_companies = top_companies_result.all()
-
-    # Получаем VIKOR-рейтинг для остальных компаний
-    ranked_companies = await calculate_company_rankings(db)
-
-    # Исключаем компании с топ-позицией из VIKOR-рейтинга
-    top_company_ids = {c[0].id for c in top_companies}
-    ranked_companies = [c for c in ranked_companies if c["company"].id not in top_company_ids]
-
-    # Формируем объединенный результат
-    result = []
-
-    # Добавляем топ-компании
-    for company, time_stop, avg_rating, feedback_count, order_count, repeat_customer_orders, region_id, region_name in top_companies:
-        result.append({
-            "id": company.id,
-            "name": company.name,
-            "logo_url": company.logo_url,
-            "average_rating": float(avg_rating) if avg_rating is not None else None,  # Соответствует Optional[float]
-            "feedback_count": int(feedback_count),  # Убедимся, что это int
-            "order_count": int(order_count),
-            "repeat_customer_orders": int(repeat_customer_orders),
-            "region_id": region_id,
-            "region_name": region_name,
-            "vikor_score": 0.0,  # Топ-компании не используют VIKOR
-            "is_top": True
-        })
-
-    # Добавляем компании из VIKOR-рейтинга
-    for item in ranked_companies:
-        result.append({
-            "id": item["company"].id,
-            "name": item["company"].name,
-            "logo_url": item["company"].logo_url,
-            "average_rating": float(item["avg_rating"]) if item["avg_rating"] is not None else None,
-            "feedback_count": int(item["feedback_count"]),
-            "order_count": int(item["order_count"]),
-            "repeat_customer_orders": int(item["repeat_customer_orders"]),
-            "region_id": item["region_id"],
-            "region_name": item["region_name"],
-            "vikor_score": float(item["score"]),
-            "is_top": False
-        })
-
-    # Пагинация через fastapi_pagination
-    page_response = Page.create(
-        items=result,
-        total=len(result),
-        params=params
-    )
+        result = [
+            {
+                "id": row["id"],
+                "name": row["name"],
+                "logo_url": row["logo_url"],
+                "logo_thumb_url": thumbnail_url(row["logo_url"]),
+                "average_rating": row["avg_rating"],
+                "feedback_count": row["feedback_count"],
+                "order_count": row["order_count"],
+                "repeat_customer_orders": row["repeat_customer_orders"],
+                "region_id": row["region_id"],
+                "region_name": row["region_name"],
+                "vikor_score": row["score"],  # Для топ-компаний 0.0 — они не ранжируются
+                "is_top": row["is_top"]
+            }
+            for row in rows
+        ]
+
+        page_response = Page.create(
+            items=result,
+            total=total,
+            params=params
+        )
+
+        tags = {company_tag(item["id"]) for item in result}
+        return page_response.dict(), tags
 
-    # Кэшируем результат
-    await redis.setex(cache_key, 3600, json.dumps(page_response.dict()))
-    return page_response
+    page = await get_or_compute(
+        VIKOR_COMPANIES_CACHE, redis, db, cache_key, build_page, RATING_CACHE_SOFT_TTL, RATING_CACHE_HARD_TTL
+    )
+    return Page(**page)
 
 @router.post(
     "/buy-top",
@@ -422,52 +405,29 @@ async def buy_top_position(
     cost_per_day = Decimal("500.00")  # Стоимость за сутки
     total_cost = days * cost_per_day  # Общая стоимость покупки
 
-    # Проверяем, есть ли запись о топ-позиции (активной или неактивной)
-    existing_top = (
-        await db.execute(
-            select(BuyTop)
-            .where(BuyTop.id_company == current_company.id)
-        )
-    ).scalar_one_or_none()
-
-    # Получаем текущее время в Moscow TZ
-    current_time = datetime.now(MOSCOW_TZ)
-
-    if existing_top:
-        is_active = (
-            await db.execute(
-                select(existing_top.time_stop >= func.timezone('Europe/Moscow', func.now()))
-            )
-        ).scalar()
-        new_time_stop = (
-            existing_top.time_stop.astimezone(MOSCOW_TZ) + timedelta(days=days)
-            if is_active
-            else current_time + timedelta(days=days)
-        )
-        await db.execute(
-            update(BuyTop)
-            .where(BuyTop.id == existing_top.id)
-            .values(
-                time_stop=new_time_stop,
-                total_spent=existing_top.total_spent + total_cost,
-                purchase_count=existing_top.purchase_count + 1
-            )
-        )
-        await db.commit()
-        await db.refresh(existing_top)
-        result = existing_top
-    else:
-        new_time_stop = current_time + timedelta(days=days)
-        new_top = BuyTop(
-            id_company=current_company.id,
-            time_stop=new_time_stop,
-            total_spent=total_cost,
-            purchase_count=1
-        )
-        db.add(new_top)
-        await db.commit()
-        await db.refresh(new_top)
-        result = new_top
+    # Одна операция: создаём запись или продлеваем существующую.
+    # Новое окончание считается в SQL: активный топ продлевается от time_stop,
+    # истёкший — от текущего момента. Конкурентные покупки не теряют время.
+    period = timedelta(days=days)
+    insert_stmt = pg_insert(BuyTop).values(
+        id_company=current_company.id,
+        time_stop=func.now() + period,
+        total_spent=total_cost,
+        purchase_count=1
+    )
+    upsert_stmt = insert_stmt.on_conflict_do_update(
+        index_elements=[BuyTop.id_company],
+        set_={
+            "time_stop": func.greatest(BuyTop.time_stop, func.now()) + period,
+            "total_spent": BuyTop.total_spent + insert_stmt.excluded.total_spent,
+            "purchase_count": BuyTop.purchase_count + 1
+        }
+    ).returning(BuyTop)
+
+    result = (
+        await db.execute(upsert_stmt, execution_options={"populate_existing": True})
+    ).scalar_one()
+    await db.commit()
 
     # Отправка письма с чеком в фоновом режиме, включая time_stop
     background_tasks.add_task(
@@ -478,17 +438,9 @@ async def buy_top_position(
         result.time_stop
     )
 
-    # Очищаем кэш рейтингов, чтобы обновить списки с учетом новой топ-позиции
-
-    # Удаляем кэш для vikor_companies
-    keys = await redis.keys("vikor_companies:*")
-    if keys:
-        await redis.delete(*keys)
-
-    # Удаляем кэш для companies
-    keys = await redis.keys("companies:*")
-    if keys:
-        await redis.delete(*keys)
+    # Ставим окончание топа в расписание и сбрасываем страницы с блоком топ-компаний
+    # (сам рейтинг от топа не зависит — снимки не пересчитываем)
+    await schedule_top(redis, current_company.id, result.time_stop)
 
     return BuyingTopPublic.from_orm_with_company(result, current_company.name)
 
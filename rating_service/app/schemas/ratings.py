@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel, HttpUrl, Field
 from datetime import date, datetime
 
@@ -20,6 +20,7 @@ class CompanyShortSchema(BaseModel):
     id: int
     name: str
     logo_url: Optional[str]
+    logo_thumb_url: Optional[str] = Field(None, description="Миниатюра логотипа для списков")
     description: Optional[str]
     director_full_name: Optional[str]
     average_rating: Optional[float]
@@ -36,6 +37,7 @@ class CompanyDetailSchema(BaseModel):
     id: int
     name: str
     logo_url: Optional[str]
+    logo_variants: Optional[Dict[str, str]] = Field(None, description="Миниатюры логотипа (thumb, medium, *_webp)")
     slogan: Optional[str]
     description: Optional[str]
     legal_address: Optional[str]
@@ -56,11 +58,12 @@ class CompanyVikorSchema(BaseModel):
     id: int
     name: str
     logo_url: Optional[str]
+    logo_thumb_url: Optional[str] = Field(None, description="Миниатюра логотипа для списков")
     average_rating: Optional[float]
     feedback_count: int
     order_count: int
     repeat_customer_orders: int
-    vikor_score: float  # Вычисленный рейтинг по VIKOR
+    vikor_score: float  # Оценка выбранного метода (VIKOR, TOPSIS, взвешенная сумма)
     region_id: int
     region_name: str
     is_top: bool = Field(..., description="Флаг топ-позиции")
@@ -1,267 +1,457 @@
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, distinct
-from shared.db.models import (
-    Company_Model, Account_Model, Deal_Model, Feedback_Model,
-    deal_consumers as DealConsumers, Region
-)
+from shared.db.archive import deals_with_archive, feedback_with_archive, purchases_with_archive
+from shared.db.models import Company_Model, Account_Model, Region
 import numpy as np
 import logging
 
 logger = logging.getLogger(__name__)
 
-async def calculate_company_rankings(db: AsyncSession) -> List[Dict]:
-    logger.info("Starting VIKOR ranking calculation with Z-Score normalization")
+# Критерии решающей матрицы (порядок столбцов)
+CRITERIA = ("avg_rating", "feedback_count", "repeat_customer_orders", "order_count", "year_founded")
+# Направление критерия: 1 — максимизируем, -1 — минимизируем (старые компании лучше)
+CRITERIA_DIRECTION = np.array([1, 1, 1, 1, -1], dtype=float)
+
+# Профили весов. v — параметр компромисса VIKOR (0.5 — баланс между S и R)
+RANKING_PROFILES = {
+    "balanced": {
+        "title": "Сбалансированный",
+        "weights": {"avg_rating": 0.4, "feedback_count": 0.3, "repeat_customer_orders": 0.2,
+                    "order_count": 0.05, "year_founded": 0.05},
+        "v": 0.5,
+    },
+    "quality-first": {
+        "title": "Сначала качество",
+        "weights": {"avg_rating": 0.55, "feedback_count": 0.2, "repeat_customer_orders": 0.15,
+                    "order_count": 0.05, "year_founded": 0.05},
+        "v": 0.6,
+    },
+    "volume-first": {
+        "title": "Сначала объём",
+        "weights": {"avg_rating": 0.15, "feedback_count": 0.2, "repeat_customer_orders": 0.25,
+                    "order_count": 0.35, "year_founded": 0.05},
+        "v": 0.5,
+    },
+}
+DEFAULT_PROFILE = "balanced"
+
+# Методы ранжирования и направление сортировки оценки
+RANKING_METHODS = {
+    "vikor": {"title": "VIKOR (меньше — лучше)", "ascending": True},
+    "topsis": {"title": "TOPSIS (больше — лучше)", "ascending": False},
+    "weighted_sum": {"title": "Взвешенная сумма (больше — лучше)", "ascending": False},
+}
+DEFAULT_METHOD = "vikor"
+
+
+def _safe_divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """Поэлементное деление, где деление на 0 даёт 0 (как в исходной формуле VIKOR)."""
+    denominator = np.broadcast_to(denominator, np.broadcast_shapes(np.shape(numerator), np.shape(denominator)))
+    result = np.zeros(np.broadcast_shapes(np.shape(numerator), np.shape(denominator)))
+    np.divide(numerator, denominator, out=result, where=denominator != 0)
+    return result
+
+
+def _group_reduce(values: np.ndarray, groups: np.ndarray, n_groups: int, ufunc, initial: float) -> np.ndarray:
+    """Групповая свёртка по первой оси: ufunc.at по индексам групп."""
+    out = np.full((n_groups,) + values.shape[1:], initial, dtype=float)
+    ufunc.at(out, groups, values)
+    return out
+
+
+async def load_decision_matrix(
+    db: AsyncSession,
+    account_ids: Optional[List[int]] = None
+) -> Tuple[List[Dict], np.ndarray]:
+    """
+    Один проход по БД: метрики всех компаний (вместе с регионом и отраслями для сегментов).
+
+    :param account_ids: только компании этих аккаунтов (для инкрементального обновления)
+    :return: (строки с данными компаний для ответа, матрица n×len(CRITERIA) в float)
+    """
+    # Подзапросы для критериев. Сделки, отзывы и покупки — вместе с архивом
+    # закрытых сделок: архивация не должна менять метрики продавца
+    deals = deals_with_archive("id", "seller_id", "deal_branch_id")
+    feedback = feedback_with_archive("id", "deal_id", "stars")
+    purchases = purchases_with_archive("deal_id", "consumer_id")
 
-    # Подзапросы для критериев
     avg_rating_subquery = (
         select(
-            Deal_Model.seller_id,
-            func.avg(Feedback_Model.stars).label("avg_rating"),
-            func.count(Feedback_Model.id).label("feedback_count")
+            deals.c.seller_id,
+            func.avg(feedback.c.stars).label("avg_rating"),
+            func.count(feedback.c.id).label("feedback_count")
         )
-        .join(Feedback_Model, Feedback_Model.deal_id == Deal_Model.id)
-        .group_by(Deal_Model.seller_id)
+        .join(feedback, feedback.c.deal_id == deals.c.id)
+        .group_by(deals.c.seller_id)
         .subquery()
     )
 
     order_count_subquery = (
         select(
-            Deal_Model.seller_id,
-            func.count(Deal_Model.id).label("order_count")
+            deals.c.seller_id,
+            func.count(deals.c.id).label("order_count")
         )
-        .group_by(Deal_Model.seller_id)
+        .group_by(deals.c.seller_id)
         .subquery()
     )
 
     repeat_customer_subquery = (
         select(
-            Deal_Model.seller_id,
-            func.count(distinct(DealConsumers.c.consumer_id)).label("repeat_customer_orders")
+            deals.c.seller_id,
+            func.count(distinct(purchases.c.consumer_id)).label("repeat_customer_orders")
+        )
+        .join(purchases, purchases.c.deal_id == deals.c.id)
+        .group_by(deals.c.seller_id)
+        .having(func.count(purchases.c.deal_id) > 1)
+        .subquery()
+    )
+
+    # Отрасли компании — для сегментных рейтингов
+    industries_subquery = (
+        select(
+            deals.c.seller_id,
+            func.array_agg(distinct(deals.c.deal_branch_id)).label("industry_ids")
         )
-        .join(DealConsumers, DealConsumers.c.deal_id == Deal_Model.id)
-        .group_by(Deal_Model.seller_id)
-        .having(func.count(DealConsumers.c.deal_id) > 1)
+        .where(deals.c.deal_branch_id.isnot(None))
+        .group_by(deals.c.seller_id)
         .subquery()
     )
 
     # Основной запрос
     query = (
         select(
-            Company_Model,
+            Company_Model.id,
+            Company_Model.name,
+            Company_Model.logo_url,
             func.coalesce(avg_rating_subquery.c.avg_rating, 0).label("avg_rating"),
             func.coalesce(avg_rating_subquery.c.feedback_count, 0).label("feedback_count"),
             func.coalesce(order_count_subquery.c.order_count, 0).label("order_count"),
             func.coalesce(repeat_customer_subquery.c.repeat_customer_orders, 0).label("repeat_customer_orders"),
             func.coalesce(func.extract('year', Company_Model.year_founded), 1900).label("year_founded"),
+            industries_subquery.c.industry_ids,
             Account_Model.region_id,
             Region.name.label("region_name")
         )
         .join(Account_Model, Company_Model.account_id == Account_Model.id)
         .join(Region, Account_Model.region_id == Region.id)
+        .outerjoin(industries_subquery, industries_subquery.c.seller_id == Company_Model.account_id)
         .outerjoin(avg_rating_subquery, avg_rating_subquery.c.seller_id == Company_Model.account_id)
         .outerjoin(order_count_subquery, order_count_subquery.c.seller_id == Company_Model.account_id)
         .outerjoin(repeat_customer_subquery, repeat_customer_subquery.c.seller_id == Company_Model.account_id)
     )
+    if account_ids is not None:
+        query = query.where(Company_Model.account_id.in_(account_ids))
 
     result = await db.execute(query)
-    companies = result.all()
-
-    # VIKOR с Z-Score нормализацией
-    scores = []
-    if not companies:
-        logger.warning("No companies found for ranking")
-        return scores
-
-    # Преобразуем данные в float для избежания проблем с Decimal
-    companies_data = []
-    for company, avg_rating, feedback_count, order_count, repeat_customer_orders, year_founded, region_id, region_name in companies:
-        companies_data.append({
-            "company": company,
-            "avg_rating": float(avg_rating),
-            "feedback_count": float(feedback_count),
-            "order_count": float(order_count),
-            "repeat_customer_orders": float(repeat_customer_orders),
-            "year_founded": float(year_founded),
-            "region_id": region_id,
-            "region_name": region_name
+    rows = []
+    for row in result.all():
+        rows.append({
+            "id": row.id,
+            "name": row.name,
+            "logo_url": row.logo_url,
+            # Преобразуем в float для избежания проблем с Decimal
+            "avg_rating": float(row.avg_rating),
+            "feedback_count": int(row.feedback_count),
+            "order_count": int(row.order_count),
+            "repeat_customer_orders": int(row.repeat_customer_orders),
+            "year_founded": int(row.year_founded),
+            "region_id": row.region_id,
+            "region_name": row.region_name,
+            "industry_ids": sorted(row.industry_ids or []),
         })
 
-    # Веса критериев
-    weights = {
-        "rating": 0.4,
-        "feedback": 0.3,
-        "repeat": 0.2,
-        "orders": 0.05,
-        "year_founded": 0.05
+    matrix = np.array(
+        [[row[criterion] for criterion in CRITERIA] for row in rows],
+        dtype=float
+    ).reshape(len(rows), len(CRITERIA))
+    return rows, matrix
+
+
+def group_constants(matrix: np.ndarray, groups: np.ndarray, n_groups: int) -> Dict[str, np.ndarray]:
+    """
+    Константы нормализации по группам: количество, среднее, M2 (сумма квадратов
+    отклонений, как в алгоритме Уэлфорда), std, лучшие/худшие Z и сырые min/max.
+    """
+    count = np.bincount(groups, minlength=n_groups).astype(float)
+    mean = _safe_divide(_group_reduce(matrix, groups, n_groups, np.add, 0.0), count[:, None])
+    deviation = matrix - mean[groups]
+    m2 = _group_reduce(deviation ** 2, groups, n_groups, np.add, 0.0)
+    std = group_std(m2, count)
+    z = deviation / std[groups]
+
+    # Лучшие и худшие значения с учётом направления критерия
+    z_max = _group_reduce(z, groups, n_groups, np.maximum, -np.inf)
+    z_min = _group_reduce(z, groups, n_groups, np.minimum, np.inf)
+    return {
+        "count": count,
+        "mean": mean,
+        "m2": m2,
+        "std": std,
+        "best": np.where(CRITERIA_DIRECTION > 0, z_max, z_min),
+        "worst": np.where(CRITERIA_DIRECTION > 0, z_min, z_max),
+        "raw_min": _group_reduce(matrix, groups, n_groups, np.minimum, np.inf),
+        "raw_max": _group_reduce(matrix, groups, n_groups, np.maximum, -np.inf),
     }
 
-    # Извлекаем данные для Z-Score
-    ratings = [d["avg_rating"] for d in companies_data]
-    feedbacks = [d["feedback_count"] for d in companies_data]
-    orders = [d["order_count"] for d in companies_data]
-    repeats = [d["repeat_customer_orders"] for d in companies_data]
-    years = [d["year_founded"] for d in companies_data]
-
-    logger.debug(f"Extracted metrics: ratings={ratings[:5]}, feedbacks={feedbacks[:5]}, orders={orders[:5]}, repeats={repeats[:5]}, years={years[:5]}")
-
-    # Вычисляем среднее и стандартное отклонение
-    mean_rating = np.mean(ratings)
-    std_rating = np.std(ratings, ddof=1) or 1  # ddof=1 для выборочного std, защита от деления на 0
-    mean_feedback = np.mean(feedbacks)
-    std_feedback = np.std(feedbacks, ddof=1) or 1
-    mean_orders = np.mean(orders)
-    std_orders = np.std(orders, ddof=1) or 1
-    mean_repeat = np.mean(repeats)
-    std_repeat = np.std(repeats, ddof=1) or 1
-    mean_year = np.mean(years)
-    std_year = np.std(years, ddof=1) or 1
-
-    logger.debug(f"Means: rating={mean_rating}, feedback={mean_feedback}, orders={mean_orders}, repeat={mean_repeat}, year={mean_year}")
-    logger.debug(f"Stds: rating={std_rating}, feedback={std_feedback}, orders={std_orders}, repeat={std_repeat}, year={std_year}")
-
-    # Z-Score нормализация
-    normalized = []
-    for data in companies_data:
-        company = data["company"]
-        # Z-Score
-        z_rating = (data["avg_rating"] - mean_rating) / std_rating
-        z_feedback = (data["feedback_count"] - mean_feedback) / std_feedback
-        z_orders = (data["order_count"] - mean_orders) / std_orders
-        z_repeat = (data["repeat_customer_orders"] - mean_repeat) / std_repeat
-        z_year = (data["year_founded"] - mean_year) / std_year
-
-        normalized.append({
-            "company": company,
-            "avg_rating": z_rating,
-            "feedback_count": z_feedback,
-            "order_count": z_orders,
-            "repeat_customer_orders": z_repeat,
-            "year_founded": z_year,
-            "region_id": data["region_id"],
-            "region_name": data["region_name"],
-            "original_metrics": {
-                "avg_rating": data["avg_rating"],
-                "feedback_count": data["feedback_count"],
-                "order_count": data["order_count"],
-                "repeat_customer_orders": data["repeat_customer_orders"],
-                "year_founded": data["year_founded"]
-            }
-        })
 
-    # Масштабирование Z-Score значений к [0, 1] для VIKOR
-    z_ratings = [d["avg_rating"] for d in normalized]
-    z_feedbacks = [d["feedback_count"] for d in normalized]
-    z_orders = [d["order_count"] for d in normalized]
-    z_repeats = [d["repeat_customer_orders"] for d in normalized]
-    z_years = [d["year_founded"] for d in normalized]
-
-    min_rating, max_rating = min(z_ratings, default=0), max(z_ratings, default=1)
-    min_feedback, max_feedback = min(z_feedbacks, default=0), max(z_feedbacks, default=1)
-    min_orders, max_orders = min(z_orders, default=0), max(z_orders, default=1)
-    min_repeat, max_repeat = min(z_repeats, default=0), max(z_repeats, default=1)
-    min_year, max_year = min(z_years, default=0), max(z_years, default=1)
-
-    # Находим лучшие и худшие значения (для VIKOR)
-    best_values = {
-        "rating": max(z_ratings, default=1),  # Максимизируем рейтинг
-        "feedback": max(z_feedbacks, default=1),  # Максимизируем количество отзывов
-        "orders": max(z_orders, default=1),  # Максимизируем количество заказов
-        "repeat": max(z_repeats, default=1),  # Максимизируем повторные заказы
-        "year_founded": min(z_years, default=1)  # Минимизируем год основания (старые компании лучше)
+def group_std(m2: np.ndarray, count: np.ndarray) -> np.ndarray:
+    """Выборочное std (ddof=1) из M2; защита от деления на 0 и от групп из одной компании."""
+    std = np.sqrt(_safe_divide(m2, (count - 1)[..., None]))
+    return np.where(np.isfinite(std) & (std > 0), std, 1.0)
+
+
+def apply_normalization(matrix: np.ndarray, constants: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Z-Score и приведение к [0, 1] «отклонения от лучшего» по заданным константам.
+
+    :param constants: mean/std/best/worst, уже выбранные под каждую строку (m×C)
+    :return: матрица m×C: 0 — лучшее значение критерия в группе, 1 — худшее
+    """
+    z = (matrix - constants["mean"]) / constants["std"]
+    return _safe_divide(constants["best"] - z, constants["best"] - constants["worst"])
+
+
+def normalize_groups(matrix: np.ndarray, groups: np.ndarray, n_groups: int) -> np.ndarray:
+    """
+    Групповая Z-Score нормализация и приведение к [0, 1] «отклонения от лучшего».
+
+    Среднее, std, лучшие и худшие значения считаются внутри каждой группы
+    (сегмента), а не по всем компаниям сразу.
+
+    :param matrix: матрица m×C (строки могут повторяться в разных группах)
+    :param groups: индекс группы для каждой строки (m,)
+    """
+    if len(matrix) == 0:
+        return matrix.copy()
+    constants = group_constants(matrix, groups, n_groups)
+    return apply_normalization(matrix, {key: constants[key][groups] for key in ("mean", "std", "best", "worst")})
+
+
+def normalize_matrix(matrix: np.ndarray) -> np.ndarray:
+    """Нормализация по всем компаниям сразу (одна группа)."""
+    return normalize_groups(matrix, np.zeros(len(matrix), dtype=int), 1)
+
+
+def profile_arrays(profiles: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Матрица весов P×C и вектор v длины P для указанных профилей."""
+    weights = np.array(
+        [[RANKING_PROFILES[profile]["weights"][criterion] for criterion in CRITERIA] for profile in profiles],
+        dtype=float
+    )
+    v = np.array([RANKING_PROFILES[profile]["v"] for profile in profiles], dtype=float)
+    return weights, v
+
+
+def _weighted(regret: np.ndarray, weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """S, R (m×P) и взвешенная полезность (m×P×C) для всех профилей."""
+    weighted_regret = regret[:, None, :] * weights[None, :, :]
+    utility = (1.0 - regret)[:, None, :] * weights[None, :, :]
+    return weighted_regret.sum(axis=2), weighted_regret.max(axis=2), utility
+
+
+def score_bounds(
+    regret: np.ndarray,
+    groups: np.ndarray,
+    n_groups: int,
+    weights: np.ndarray
+) -> Dict[str, np.ndarray]:
+    """
+    Границы оценок по группам: min/max S и R для VIKOR (G×P),
+    идеальное и анти-идеальное решение для TOPSIS (G×P×C).
+    """
+    s, r, utility = _weighted(regret, weights)
+    flat_utility = utility.reshape(len(utility), -1)
+
+    def group_min(values):
+        return _group_reduce(values, groups, n_groups, np.minimum, np.inf)
+
+    def group_max(values):
+        return _group_reduce(values, groups, n_groups, np.maximum, -np.inf)
+
+    return {
+        "s_min": group_min(s),
+        "s_max": group_max(s),
+        "r_min": group_min(r),
+        "r_max": group_max(r),
+        "ideal": group_max(flat_utility).reshape((n_groups,) + utility.shape[1:]),
+        "anti_ideal": group_min(flat_utility).reshape((n_groups,) + utility.shape[1:]),
     }
-    worst_values = {
-        "rating": min(z_ratings, default=0),
-        "feedback": min(z_feedbacks, default=0),
-        "orders": min(z_orders, default=0),
-        "repeat": min(z_repeats, default=0),
-        "year_founded": max(z_years, default=0)
+
+
+def apply_scores(
+    regret: np.ndarray,
+    weights: np.ndarray,
+    v: np.ndarray,
+    bounds: Dict[str, np.ndarray]
+) -> Dict[str, np.ndarray]:
+    """
+    Оценки всеми методами по заданным границам.
+
+    :param bounds: границы score_bounds, уже выбранные под каждую строку
+    :return: {метод: массив оценок m×P}
+    """
+    s, r, utility = _weighted(regret, weights)
+
+    # VIKOR: S — групповая полезность, R — индивидуальное сожаление
+    q = (
+        v[None, :] * _safe_divide(s - bounds["s_min"], bounds["s_max"] - bounds["s_min"])
+        + (1 - v[None, :]) * _safe_divide(r - bounds["r_min"], bounds["r_max"] - bounds["r_min"])
+    )
+
+    # Взвешенная сумма полезностей
+    weighted_sum = utility.sum(axis=2)
+
+    # TOPSIS: близость к идеальному решению группы
+    distance_best = np.sqrt(((utility - bounds["ideal"]) ** 2).sum(axis=2))
+    distance_worst = np.sqrt(((utility - bounds["anti_ideal"]) ** 2).sum(axis=2))
+    topsis = _safe_divide(distance_worst, distance_best + distance_worst)
+
+    return {"vikor": q, "topsis": topsis, "weighted_sum": weighted_sum}
+
+
+def score_groups(
+    regret: np.ndarray,
+    groups: np.ndarray,
+    n_groups: int,
+    weights: np.ndarray,
+    v: np.ndarray
+) -> Dict[str, np.ndarray]:
+    """
+    Считает оценки всеми методами для всех профилей и всех групп за один векторный проход.
+
+    :param regret: нормализованная матрица m×C (0 — лучшее значение в группе)
+    :param groups: индекс группы для каждой строки (m,)
+    :param weights: веса профилей P×C
+    :param v: параметр компромисса VIKOR для каждого профиля (P,)
+    :return: {метод: массив оценок m×P}
+    """
+    if regret.shape[0] == 0:
+        empty = np.zeros((0, weights.shape[0]))
+        return {method: empty for method in RANKING_METHODS}
+
+    bounds = score_bounds(regret, groups, n_groups, weights)
+    return apply_scores(regret, weights, v, {key: value[groups] for key, value in bounds.items()})
+
+
+def score_matrix(
+    regret: np.ndarray,
+    weights: np.ndarray,
+    v: np.ndarray
+) -> Dict[str, np.ndarray]:
+    """Оценки по всем компаниям сразу (одна группа): {метод: массив P×n}."""
+    scores = score_groups(regret, np.zeros(len(regret), dtype=int), 1, weights, v)
+    return {method: values.T for method, values in scores.items()}
+
+
+def segment_name(region_id: Optional[int] = None, industry_id: Optional[int] = None) -> str:
+    """Имя сегмента рейтинга: all, region:1, industry:2, region:1:industry:2."""
+    parts = []
+    if region_id is not None:
+        parts.append(f"region:{region_id}")
+    if industry_id is not None:
+        parts.append(f"industry:{industry_id}")
+    return ":".join(parts) or "all"
+
+
+def row_segments(row: Dict) -> List[str]:
+    """Сегменты, в которые входит компания: весь рейтинг, регион, отрасли, регион×отрасль."""
+    segments = [segment_name(), segment_name(region_id=row["region_id"])]
+    for industry_id in row["industry_ids"]:
+        segments.append(segment_name(industry_id=industry_id))
+        segments.append(segment_name(row["region_id"], industry_id))
+    return segments
+
+
+def build_segments(rows: List[Dict]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """
+    Раскладывает компании по сегментам.
+
+    :return: (имена сегментов, индекс сегмента для каждой пары, индекс строки компании для каждой пары)
+    """
+    segment_index: Dict[str, int] = {}
+    groups, row_indices = [], []
+    for row_index, row in enumerate(rows):
+        for segment in row_segments(row):
+            groups.append(segment_index.setdefault(segment, len(segment_index)))
+            row_indices.append(row_index)
+    return list(segment_index), np.array(groups, dtype=int), np.array(row_indices, dtype=int)
+
+
+def compute_segment_rankings(
+    rows: List[Dict],
+    matrix: np.ndarray
+) -> Tuple[Dict[Tuple[str, str, str], Tuple[np.ndarray, np.ndarray]], Dict[str, Dict[str, np.ndarray]]]:
+    """
+    Оценки для всех комбинаций метод×профиль×сегмент одним групповым проходом.
+
+    Нормализация внутри сегмента своя (Z-Score относительно компаний сегмента).
+
+    :return: ({(method, profile, segment): (индексы строк компаний, оценки)},
+              {segment: константы нормализации и границы оценок} — для инкрементальных обновлений)
+    """
+    segments, groups, row_indices = build_segments(rows)
+    if not segments:
+        return {}, {}
+    profiles = list(RANKING_PROFILES)
+    weights, v = profile_arrays(profiles)
+
+    pairs = matrix[row_indices]
+    constants = group_constants(pairs, groups, len(segments))
+    regret = apply_normalization(pairs, {key: constants[key][groups] for key in ("mean", "std", "best", "worst")})
+    bounds = score_bounds(regret, groups, len(segments), weights)
+    scores = apply_scores(regret, weights, v, {key: value[groups] for key, value in bounds.items()})
+
+    # Пары отсортированы по сегменту, чтобы разрезать их на непрерывные куски
+    order = np.argsort(groups, kind="stable")
+    edges = np.searchsorted(groups[order], np.arange(len(segments) + 1))
+    rankings, segment_constants = {}, {}
+    for group, segment in enumerate(segments):
+        selected = order[edges[group]:edges[group + 1]]
+        for method in RANKING_METHODS:
+            for index, profile in enumerate(profiles):
+                rankings[(method, profile, segment)] = (row_indices[selected], scores[method][selected, index])
+        segment_constants[segment] = {
+            key: value[group] for key, value in {**constants, **bounds}.items()
+        }
+    return rankings, segment_constants
+
+
+def score_row(row: np.ndarray, constants: Dict[str, np.ndarray]) -> Dict[Tuple[str, str], float]:
+    """
+    Оценка одной компании по замороженным константам сегмента (без пересчёта остальных).
+
+    :param row: строка решающей матрицы (C,)
+    :return: {(method, profile): оценка}
+    """
+    profiles = list(RANKING_PROFILES)
+    weights, v = profile_arrays(profiles)
+    regret = apply_normalization(row[None, :], constants)
+    bounds = {key: constants[key][None, ...] for key in ("s_min", "s_max", "r_min", "r_max", "ideal", "anti_ideal")}
+    scores = apply_scores(regret, weights, v, bounds)
+    return {
+        (method, profile): float(scores[method][0, index])
+        for method in RANKING_METHODS
+        for index, profile in enumerate(profiles)
     }
 
-    logger.debug(f"Best values: {best_values}")
-    logger.debug(f"Worst values: {worst_values}")
-
-    # Нормализованная матрица и расчёт S и R
-    s_values = []  # Групповая полезность
-    r_values = []  # Индивидуальное сожаление
-    scores = []  # Инициализируем scores здесь
-    for data in normalized:
-        company = data["company"]
-        # Нормализация Z-Score к [0, 1] для VIKOR
-        norm_rating = (
-            (best_values["rating"] - data["avg_rating"]) / (best_values["rating"] - worst_values["rating"])
-            if best_values["rating"] != worst_values["rating"] else 0
-        )
-        norm_feedback = (
-            (best_values["feedback"] - data["feedback_count"]) / (best_values["feedback"] - worst_values["feedback"])
-            if best_values["feedback"] != worst_values["feedback"] else 0
-        )
-        norm_orders = (
-            (best_values["orders"] - data["order_count"]) / (best_values["orders"] - worst_values["orders"])
-            if best_values["orders"] != worst_values["orders"] else 0
-        )
-        norm_repeat = (
-            (best_values["repeat"] - data["repeat_customer_orders"]) / (best_values["repeat"] - worst_values["repeat"])
-            if best_values["repeat"] != worst_values["repeat"] else 0
-        )
-        norm_year = (
-            (best_values["year_founded"] - data["year_founded"]) / (best_values["year_founded"] - worst_values["year_founded"])
-            if best_values["year_founded"] != worst_values["year_founded"] else 0
-        )
 
-        # Взвешенные нормализованные значения
-        weighted_rating = weights["rating"] * norm_rating
-        weighted_feedback = weights["feedback"] * norm_feedback
-        weighted_orders = weights["orders"] * norm_orders
-        weighted_repeat = weights["repeat"] * norm_repeat
-        weighted_year = weights["year_founded"] * norm_year
-
-        # S (групповая полезность) — сумма взвешенных отклонений
-        s = weighted_rating + weighted_feedback + weighted_orders + weighted_repeat + weighted_year
-        # R (индивидуальное сожаление) — максимальное взвешенное отклонение
-        r = max(weighted_rating, weighted_feedback, weighted_orders, weighted_repeat, weighted_year)
-
-        s_values.append(s)
-        r_values.append(r)
-
-        scores.append({
-            "company": company,
-            "region_id": data["region_id"],  # Используем data из normalized
-            "region_name": data["region_name"],  # Используем data из normalized
-            "avg_rating": data["original_metrics"]["avg_rating"],
-            "feedback_count": data["original_metrics"]["feedback_count"],
-            "order_count": data["original_metrics"]["order_count"],
-            "repeat_customer_orders": data["original_metrics"]["repeat_customer_orders"],
-            "year_founded": data["original_metrics"]["year_founded"],
-            "s": s,
-            "r": r
-        })
+async def calculate_company_rankings(
+    db: AsyncSession,
+    method: str = DEFAULT_METHOD,
+    profile: str = DEFAULT_PROFILE
+) -> List[Dict]:
+    """Рейтинг компаний выбранным методом и профилем (отсортирован от лучшей к худшей)."""
+    logger.info(f"Starting {method} ranking calculation for profile {profile}")
 
-    # Находим минимальные и максимальные S и R
-    s_min = min(s_values, default=0)
-    s_max = max(s_values, default=1)
-    r_min = min(r_values, default=0)
-    r_max = max(r_values, default=1)
-
-    logger.debug(f"S range: min={s_min}, max={s_max}")
-    logger.debug(f"R range: min={r_min}, max={r_max}")
-
-    # Параметр компромисса (v = 0.5 — баланс между S и R)
-    v = 0.5
-
-    # Вычисляем Q для каждой компании
-    for i, score in enumerate(scores):
-        s = score["s"]
-        r = score["r"]
-        # Формула Q
-        q = (
-            v * (s - s_min) / (s_max - s_min) if s_max != s_min else 0
-        ) + (
-            (1 - v) * (r - r_min) / (r_max - r_min) if r_max != r_min else 0
-        )
-        score["score"] = q
+    rows, matrix = await load_decision_matrix(db)
+    if not rows:
+        logger.warning("No companies found for ranking")
+        return []
 
-    # Сортируем по Q (меньше — лучше)
-    scores.sort(key=lambda x: x["score"])
-    logger.info(f"Calculated VIKOR scores for {len(scores)} companies")
-    return scores
\ No newline at end of file
+    weights, v = profile_arrays([profile])
+    scores = score_matrix(normalize_matrix(matrix), weights, v)[method][0]
+    ranked = [dict(row, score=float(score)) for row, score in zip(rows, scores)]
+    ranked.sort(key=lambda x: x["score"], reverse=not RANKING_METHODS[method]["ascending"])
+    logger.info(f"Calculated {method} scores for {len(ranked)} companies")
+    return ranked
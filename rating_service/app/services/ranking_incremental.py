@@ -0,0 +1,169 @@
+# Инкрементальное обновление снимков рейтинга: пересчёт только изменившихся компаний
+import asyncio
+import json
+import logging
+from typing import Dict, List
+
+import numpy as np
+from redis.asyncio import Redis
+from redis.exceptions import LockError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from rating_service.app.services.ranking import (
+    CRITERIA, load_decision_matrix, row_segments, score_row, group_std
+)
+from rating_service.app.services.ranking_snapshots import (
+    rows_key, segments_key, ranking_key, ready_key, get_rows
+)
+from shared.cache.namespace import RANKING_SNAPSHOTS, VIKOR_COMPANIES_CACHE, RANKING_DIRTY_KEY
+from shared.db.redis import get_redis_client
+from shared.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Допустимый дрейф констант нормализации (в долях замороженного std),
+# после которого оценки остальных компаний считаются устаревшими
+DRIFT_THRESHOLD = 0.1
+UPDATE_INTERVAL = 5  # Период обработки изменившихся продавцов, сек
+UPDATE_BATCH = 500  # Сколько продавцов забираем за один проход
+
+
+def welford_replace(running: dict, old: np.ndarray, new: np.ndarray) -> dict:
+    """
+    Заменяет строку old на new в текущей статистике сегмента (алгоритм Уэлфорда:
+    удаление старого значения и добавление нового без прохода по сегменту).
+    """
+    count = running["count"]
+    mean = np.array(running["mean"], dtype=float)
+    m2 = np.array(running["m2"], dtype=float)
+
+    if count > 1:
+        # Удаляем старое значение
+        mean_without = (count * mean - old) / (count - 1)
+        m2 = m2 - (old - mean) * (old - mean_without)
+        # Добавляем новое
+        delta = new - mean_without
+        mean = mean_without + delta / count
+        m2 = m2 + delta * (new - mean)
+    else:
+        mean, m2 = new.copy(), np.zeros_like(new)
+
+    return {
+        "count": count,
+        "mean": mean.tolist(),
+        "m2": np.maximum(m2, 0.0).tolist(),
+        "raw_min": np.minimum(running["raw_min"], new).tolist(),
+        "raw_max": np.maximum(running["raw_max"], new).tolist(),
+    }
+
+
+def has_drifted(frozen: dict, running: dict) -> bool:
+    """Сдвинулись ли среднее, std или границы критериев сегмента сильнее порога."""
+    frozen_std = np.array(frozen["std"])
+    running_std = group_std(np.array(running["m2"]), np.array(running["count"], dtype=float))
+    mean_shift = np.abs(np.array(running["mean"]) - np.array(frozen["mean"])) / frozen_std
+    std_shift = np.abs(running_std / frozen_std - 1.0)
+    # Новый рекорд по критерию меняет лучшее/худшее значение — а значит, и оценки всех
+    out_of_range = (
+        (np.array(running["raw_min"]) < np.array(frozen["raw_min"]))
+        | (np.array(running["raw_max"]) > np.array(frozen["raw_max"]))
+    )
+    return bool((mean_shift > DRIFT_THRESHOLD).any() or (std_shift > DRIFT_THRESHOLD).any() or out_of_range.any())
+
+
+async def rebuild_rankings(redis: Redis, reason: str) -> None:
+    """Полная перестройка: новое поколение снимков строится при следующем чтении."""
+    logger.info(f"Полная перестройка рейтинга: {reason}")
+    await RANKING_SNAPSHOTS.invalidate(redis)
+    await VIKOR_COMPANIES_CACHE.invalidate(redis)
+
+
+async def update_companies(db: AsyncSession, redis: Redis, account_ids: List[int]) -> bool:
+    """
+    Обновляет в текущем снимке строки и оценки компаний указанных продавцов.
+
+    Оценки считаются по замороженным константам сегментов, поэтому остальные
+    компании не пересчитываются. Если константы «уплыли» дальше порога или
+    изменился состав сегментов — запускается полная перестройка.
+
+    :return: True, если снимок обновлён инкрементально
+    """
+    prefix = await RANKING_SNAPSHOTS.key(redis)
+    if not await redis.exists(ready_key(prefix)):
+        # Снимка нет — он и так будет построен целиком при первом чтении
+        return False
+
+    rows, matrix = await load_decision_matrix(db, account_ids)
+    if not rows:
+        return False
+
+    async with redis.lock(f"{prefix}:update_lock", timeout=30, blocking_timeout=10):
+        old_rows = await get_rows(redis, prefix, [row["id"] for row in rows])
+        segments = sorted({segment for row in rows for segment in row_segments(row)})
+        states = {
+            segment: json.loads(value)
+            for segment, value in zip(segments, await redis.hmget(segments_key(prefix), segments))
+            if value is not None
+        }
+
+        updated_scores: Dict[str, Dict[int, float]] = {}
+        for index, row in enumerate(rows):
+            old_row = old_rows.get(row["id"])
+            if old_row is None:
+                await rebuild_rankings(redis, f"новая компания {row['id']}")
+                return False
+            if row_segments(old_row) != row_segments(row) or any(s not in states for s in row_segments(row)):
+                await rebuild_rankings(redis, f"изменился состав сегментов компании {row['id']}")
+                return False
+
+            old_values = np.array([old_row[criterion] for criterion in CRITERIA], dtype=float)
+            for segment in row_segments(row):
+                state = states[segment]
+                state["running"] = welford_replace(state["running"], old_values, matrix[index])
+                if has_drifted(state["frozen"], state["running"]):
+                    await rebuild_rankings(redis, f"дрейф констант сегмента {segment}")
+                    return False
+                frozen = {key: np.array(value) for key, value in state["frozen"].items()}
+                for (method, profile), score in score_row(matrix[index], frozen).items():
+                    updated_scores.setdefault(ranking_key(prefix, method, profile, segment), {})[row["id"]] = score
+
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.hset(rows_key(prefix), mapping={row["id"]: json.dumps(row) for row in rows})
+            pipe.hset(segments_key(prefix), mapping={
+                segment: json.dumps(state) for segment, state in states.items()
+            })
+            for key, scores in updated_scores.items():
+                pipe.zadd(key, scores, xx=True)
+            await pipe.execute()
+
+    # Страницы рейтинга читаются из снимка, достаточно сбросить их кэш
+    await VIKOR_COMPANIES_CACHE.invalidate(redis)
+    logger.info(f"Инкрементально обновлено компаний в рейтинге: {len(rows)}")
+    return True
+
+
+async def ranking_updates_loop() -> None:
+    """Фоновая задача: забирает изменившихся продавцов и обновляет их рейтинг."""
+    redis = get_redis_client()
+    while True:
+        account_ids = []
+        try:
+            # SPOP атомарен: при нескольких репликах каждый продавец обрабатывается один раз
+            account_ids = [int(value) for value in await redis.spop(RANKING_DIRTY_KEY, UPDATE_BATCH) or []]
+            if account_ids:
+                async with AsyncSessionLocal() as db:
+                    await update_companies(db, redis, account_ids)
+        except asyncio.CancelledError:
+            raise
+        except LockError:
+            logger.warning("Снимок рейтинга занят другим обновлением, повторим позже")
+            if account_ids:
+                await redis.sadd(RANKING_DIRTY_KEY, *account_ids)
+        except Exception as e:
+            logger.error(f"Ошибка инкрементального обновления рейтинга: {str(e)}")
+            if account_ids:
+                try:
+                    await rebuild_rankings(redis, "ошибка инкрементального обновления")
+                except Exception:
+                    pass
+        await asyncio.sleep(UPDATE_INTERVAL)
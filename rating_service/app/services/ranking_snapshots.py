@@ -0,0 +1,215 @@
+# Снимки рейтингов в Redis: строки компаний + отсортированное множество на каждую комбинацию метод×профиль×сегмент
+import asyncio
+import json
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from rating_service.app.services.ranking import (
+    RANKING_METHODS, load_decision_matrix, compute_segment_rankings
+)
+from shared.cache.namespace import RANKING_SNAPSHOTS
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_TTL = 6 * 3600  # Снимок живёт до инвалидации, TTL — страховка от мусора
+BUILD_LOCK_TTL = 120  # Сколько держим блокировку построения, сек
+BUILD_WAIT_TIMEOUT = 10.0  # Сколько ждём чужое построение, прежде чем строить самим
+
+
+def rows_key(prefix: str) -> str:
+    return f"{prefix}:rows"
+
+
+def ranking_key(prefix: str, method: str, profile: str, segment: str = "all") -> str:
+    return f"{prefix}:{method}:{profile}:{segment}"
+
+
+def segments_key(prefix: str) -> str:
+    return f"{prefix}:segments"
+
+
+def ready_key(prefix: str) -> str:
+    return f"{prefix}:ready"
+
+
+def lock_key(prefix: str) -> str:
+    return f"{prefix}:lock"
+
+
+def segment_state(constants: dict) -> dict:
+    """
+    Состояние сегмента для Redis: замороженные при построении константы
+    (по ним считаются оценки) и текущая статистика Уэлфорда (по ней ловим дрейф).
+    """
+    frozen = {key: value.tolist() for key, value in constants.items() if key not in ("count", "m2")}
+    running = {key: constants[key].tolist() for key in ("count", "mean", "m2", "raw_min", "raw_max")}
+    return {"frozen": frozen, "running": running}
+
+
+async def build_snapshots(db: AsyncSession, redis: Redis, prefix: str) -> int:
+    """
+    Строит снимки всех комбинаций метод×профиль×сегмент за один проход по БД.
+
+    :return: количество компаний в рейтинге
+    """
+    rows, matrix = await load_decision_matrix(db)
+    scores, constants = compute_segment_rankings(rows, matrix)
+
+    async with redis.pipeline(transaction=True) as pipe:
+        if rows:
+            pipe.hset(rows_key(prefix), mapping={row["id"]: json.dumps(row) for row in rows})
+            pipe.expire(rows_key(prefix), SNAPSHOT_TTL)
+            for (method, profile, segment), (row_indices, values) in scores.items():
+                key = ranking_key(prefix, method, profile, segment)
+                pipe.zadd(key, {rows[index]["id"]: float(score) for index, score in zip(row_indices, values)})
+                pipe.expire(key, SNAPSHOT_TTL)
+            # Константы нормализации сегментов — для инкрементальных обновлений
+            pipe.hset(segments_key(prefix), mapping={
+                segment: json.dumps(segment_state(values)) for segment, values in constants.items()
+            })
+            pipe.expire(segments_key(prefix), SNAPSHOT_TTL)
+        pipe.setex(ready_key(prefix), SNAPSHOT_TTL, len(rows))
+        await pipe.execute()
+
+    logger.info(f"Построены снимки рейтингов {prefix}: {len(rows)} компаний, {len(scores)} комбинаций")
+    return len(rows)
+
+
+async def ensure_snapshots(db: AsyncSession, redis: Redis) -> str:
+    """
+    Возвращает префикс актуальных снимков, при необходимости строя их.
+
+    Строит только один процесс (блокировка в Redis), остальные ждут готовности.
+    """
+    prefix = await RANKING_SNAPSHOTS.key(redis)
+    if await redis.exists(ready_key(prefix)):
+        return prefix
+
+    if await redis.set(lock_key(prefix), "1", nx=True, ex=BUILD_LOCK_TTL):
+        try:
+            await build_snapshots(db, redis, prefix)
+        finally:
+            await redis.delete(lock_key(prefix))
+        return prefix
+
+    # Снимок строит другой процесс — ждём
+    waited = 0.0
+    while waited < BUILD_WAIT_TIMEOUT:
+        await asyncio.sleep(0.2)
+        waited += 0.2
+        if await redis.exists(ready_key(prefix)):
+            return prefix
+
+    logger.warning(f"Не дождались построения снимков {prefix}, строим сами")
+    await build_snapshots(db, redis, prefix)
+    return prefix
+
+
+async def get_rows(redis: Redis, prefix: str, company_ids: List[int]) -> Dict[int, dict]:
+    """Данные компаний из снимка по ID (отсутствующие пропускаются)."""
+    if not company_ids:
+        return {}
+    values = await redis.hmget(rows_key(prefix), company_ids)
+    return {
+        company_id: json.loads(value)
+        for company_id, value in zip(company_ids, values)
+        if value is not None
+    }
+
+
+async def ranking_positions(
+    redis: Redis, prefix: str, method: str, profile: str, company_ids: List[int], segment: str = "all"
+) -> List[Optional[int]]:
+    """Позиции компаний в рейтинге сегмента (None — компании в сегменте нет)."""
+    if not company_ids:
+        return []
+    key = ranking_key(prefix, method, profile, segment)
+    descending = not RANKING_METHODS[method]["ascending"]
+    async with redis.pipeline(transaction=False) as pipe:
+        for company_id in company_ids:
+            if descending:
+                pipe.zrevrank(key, company_id)
+            else:
+                pipe.zrank(key, company_id)
+        return await pipe.execute()
+
+
+async def read_ranking_page(
+    redis: Redis,
+    prefix: str,
+    method: str,
+    profile: str,
+    offset: int,
+    limit: int,
+    excluded_ids: List[int],
+    segment: str = "all"
+) -> Tuple[List[Tuple[int, float]], int]:
+    """
+    Страница рейтинга без исключённых компаний (топ-позиций) за O(страница + исключения).
+
+    :return: ([(company_id, score)], общее количество без исключённых)
+    """
+    key = ranking_key(prefix, method, profile, segment)
+    descending = not RANKING_METHODS[method]["ascending"]
+
+    positions = await ranking_positions(redis, prefix, method, profile, excluded_ids, segment)
+    excluded_positions = sorted(position for position in positions if position is not None)
+    total = await redis.zcard(key) - len(excluded_positions)
+    if limit <= 0 or offset >= total:
+        return [], max(total, 0)
+
+    # Сдвигаем начало окна на число исключённых компаний, стоящих до него
+    raw_start = offset
+    for position in excluded_positions:
+        if position <= raw_start:
+            raw_start += 1
+        else:
+            break
+
+    raw_stop = raw_start + limit + len(excluded_positions) - 1
+    members = await redis.zrange(key, raw_start, raw_stop, desc=descending, withscores=True)
+    excluded = set(excluded_ids)
+    page = [(int(member), float(score)) for member, score in members if int(member) not in excluded]
+    return page[:limit], total
+
+
+async def read_combined_page(
+    redis: Redis,
+    prefix: str,
+    method: str,
+    profile: str,
+    top_ids: List[int],
+    offset: int,
+    limit: int,
+    segment: str = "all"
+) -> Tuple[List[dict], int]:
+    """
+    Страница «сначала топ-позиции, затем рейтинг».
+
+    :param top_ids: ID компаний с активной топ-позицией в нужном порядке
+    :param segment: сегмент рейтинга (см. segment_name), по умолчанию весь рейтинг
+    :return: (строки компаний с полями score и is_top, общее количество)
+    """
+    # В выдачу попадают только топ-компании, которые есть в сегменте снимка
+    top_positions = await ranking_positions(redis, prefix, method, profile, top_ids, segment)
+    top_ids = [company_id for company_id, position in zip(top_ids, top_positions) if position is not None]
+
+    page_top_ids = top_ids[offset:offset + limit]
+    ranked_offset = max(0, offset - len(top_ids))
+    ranked_limit = limit - len(page_top_ids)
+    ranked, ranked_total = await read_ranking_page(
+        redis, prefix, method, profile, ranked_offset, ranked_limit, top_ids, segment
+    )
+
+    rows = await get_rows(redis, prefix, page_top_ids + [company_id for company_id, _ in ranked])
+    items = []
+    for company_id in page_top_ids:
+        if company_id in rows:
+            items.append(dict(rows[company_id], score=0.0, is_top=True))
+    for company_id, score in ranked:
+        if company_id in rows:
+            items.append(dict(rows[company_id], score=score, is_top=False))
+    return items, len(top_ids) + ranked_total
@@ -0,0 +1,119 @@
+# Расписание окончания топ-позиций и реестр компаний в топе
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import select, func
+
+from shared.cache.namespace import COMPANIES_CACHE, VIKOR_COMPANIES_CACHE
+from shared.db.models import BuyTop
+from shared.db.redis import get_redis_client
+from shared.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Отсортированное множество: company_id -> time_stop (unix-время).
+# Общее для всех реплик: по нему строится реестр и срабатывает окончание топа
+TOP_SCHEDULE_KEY = "top:schedule"
+
+POLL_INTERVAL = 1.0  # Точность срабатывания окончания топа, сек
+RESYNC_INTERVAL = 300  # Сверка расписания с таблицей buy_top, сек
+
+# Реестр текущего процесса: company_id -> time_stop
+_active_tops: Dict[int, float] = {}
+_synced_at = 0.0
+
+# Кэши страниц, на которых выводятся топ-компании (снимки рейтинга топ не хранят)
+TOP_AFFECTED_CACHES = (COMPANIES_CACHE, VIKOR_COMPANIES_CACHE)
+
+
+async def invalidate_top_pages(redis: Redis) -> None:
+    """Сбрасывает страницы списков и рейтинга — блок топ-компаний на них изменился."""
+    try:
+        for namespace in TOP_AFFECTED_CACHES:
+            await namespace.invalidate(redis)
+    except RedisError as e:
+        logger.warning(f"Не удалось сбросить кэш страниц с топ-позициями: {str(e)}")
+
+
+async def schedule_top(redis: Redis, company_id: int, time_stop: datetime) -> None:
+    """Регистрирует (или продлевает) топ-позицию компании и сбрасывает затронутые страницы."""
+    stop_at = time_stop.timestamp()
+    await redis.zadd(TOP_SCHEDULE_KEY, {company_id: stop_at})
+    _active_tops[company_id] = stop_at
+    await invalidate_top_pages(redis)
+
+
+async def sync_registry(redis: Redis) -> None:
+    """Обновляет реестр процесса из расписания в Redis."""
+    global _synced_at
+    members = await redis.zrangebyscore(TOP_SCHEDULE_KEY, time.time(), "+inf", withscores=True)
+    _active_tops.clear()
+    _active_tops.update({int(member): score for member, score in members})
+    _synced_at = time.monotonic()
+
+
+async def sync_from_db(redis: Redis) -> None:
+    """Переносит активные топ-позиции из таблицы buy_top в расписание (идемпотентно)."""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(BuyTop.id_company, BuyTop.time_stop).where(BuyTop.time_stop >= func.now())
+        )
+        tops = {company_id: time_stop.timestamp() for company_id, time_stop in result.all()}
+    if tops:
+        await redis.zadd(TOP_SCHEDULE_KEY, tops)
+    await sync_registry(redis)
+
+
+async def fire_expired(redis: Redis) -> List[int]:
+    """
+    Снимает истёкшие топ-позиции.
+
+    ZREM возвращает 1 только одной реплике, поэтому сброс кэша на каждое
+    окончание выполняется ровно один раз.
+
+    :return: ID компаний, чьё окончание обработал этот процесс
+    """
+    expired = await redis.zrangebyscore(TOP_SCHEDULE_KEY, "-inf", time.time())
+    fired = []
+    for member in expired:
+        if await redis.zrem(TOP_SCHEDULE_KEY, member):
+            fired.append(int(member))
+    for member in expired:
+        _active_tops.pop(int(member), None)
+    if fired:
+        logger.info(f"Закончились топ-позиции компаний: {fired}")
+        await invalidate_top_pages(redis)
+    return fired
+
+
+async def get_active_top_ids(redis: Redis) -> List[int]:
+    """ID компаний с активной топ-позицией, по убыванию time_stop (без запроса к buy_top)."""
+    if time.monotonic() - _synced_at > POLL_INTERVAL * 5:
+        # Фоновая задача не успевает или не запущена — читаем расписание напрямую
+        await sync_registry(redis)
+    now = time.time()
+    active = [(stop_at, company_id) for company_id, stop_at in _active_tops.items() if stop_at >= now]
+    return [company_id for _, company_id in sorted(active, reverse=True)]
+
+
+async def top_positions_loop() -> None:
+    """Фоновая задача: срабатывание окончаний топа и обновление реестра процесса."""
+    redis = get_redis_client()
+    last_resync = None
+    while True:
+        try:
+            if last_resync is None or time.monotonic() - last_resync > RESYNC_INTERVAL:
+                await sync_from_db(redis)
+                last_resync = time.monotonic()
+            await fire_expired(redis)
+            await sync_registry(redis)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка обработки расписания топ-позиций: {str(e)}")
+        await asyncio.sleep(POLL_INTERVAL)
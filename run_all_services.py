@@ -9,6 +9,7 @@ services = [
     {"name": "rating_service", "port": 8003},
     {"name": "account_service", "port": 8004},
     {"name": "admin_service", "port": 8005},
+    {"name": "media_service", "port": 8006},
     {"name": "api_gateway", "port": 8000}
 ]
 
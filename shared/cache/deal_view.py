@@ -0,0 +1,140 @@
+# shared/cache/deal_view.py
+import asyncio
+import json
+import logging
+from typing import Optional
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError, WatchError
+
+from shared.cache.lru import LRUCache
+from shared.db.redis import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+DEAL_VIEW_TTL = 300  # Карточка сделки в Redis, сек
+# Канал, по которому все процессы узнают о сбросе карточки (сообщение — deal_id)
+DEAL_VIEW_CHANNEL = "deal_view:invalidate"
+RECONNECT_DELAY = 5  # Пауза перед повторной подпиской после ошибки Redis, сек
+
+# Локальный кэш процесса. Сброс из другой реплики или admin_service приходит
+# через DEAL_VIEW_CHANNEL (deal_view_listener); TTL — страховка на время без подписки
+_local_deals = LRUCache(maxsize=2048, ttl=10)
+
+
+def deal_view_key(deal_id: int) -> str:
+    return f"deal_view:{deal_id}"
+
+
+def deal_generation_key(deal_id: int) -> str:
+    # Номер поколения карточки: растёт при каждом сбросе
+    return f"deal_view:gen:{deal_id}"
+
+
+async def get_cached_deal(redis: Optional[Redis], deal_id: int) -> Optional[dict]:
+    """Карточка сделки из кэша. Порядок поиска: локальный LRU -> Redis."""
+    payload = _local_deals.get(deal_id)
+    if payload is not None or redis is None:
+        return payload
+    try:
+        value = await redis.get(deal_view_key(deal_id))
+    except RedisError as e:
+        logger.warning(f"Не удалось прочитать карточку сделки {deal_id} из Redis: {str(e)}")
+        return None
+    if value is None:
+        return None
+    payload = json.loads(value)
+    _local_deals.set(deal_id, payload)
+    return payload
+
+
+async def deal_generation(redis: Optional[Redis], deal_id: int) -> Optional[str]:
+    """
+    Поколение карточки — читается до запроса в БД и передаётся в cache_deal.
+
+    :return: None, если Redis недоступен (тогда карточка в Redis не сохраняется)
+    """
+    if redis is None:
+        return None
+    try:
+        return await redis.get(deal_generation_key(deal_id)) or "0"
+    except RedisError as e:
+        logger.warning(f"Не удалось прочитать поколение карточки сделки {deal_id}: {str(e)}")
+        return None
+
+
+async def cache_deal(redis: Optional[Redis], deal_id: int, payload: dict, generation: Optional[str]) -> None:
+    """
+    Сохраняет сериализованную карточку сделки (JSON-совместимый dict).
+
+    Запись в Redis идёт под WATCH поколения: если invalidate_deal сработал после
+    чтения generation (карточка собрана из старых данных), она не сохраняется.
+    Локальный LRU заполняется до EXEC — сообщение о сбросе, пришедшее позже, его очистит.
+    """
+    _local_deals.set(deal_id, payload)
+    if redis is None or generation is None:
+        return
+    key = deal_generation_key(deal_id)
+    try:
+        async with redis.pipeline() as pipe:
+            await pipe.watch(key)
+            if (await pipe.get(key) or "0") != generation:
+                _local_deals.pop(deal_id)
+                return
+            pipe.multi()
+            pipe.setex(deal_view_key(deal_id), DEAL_VIEW_TTL, json.dumps(payload))
+            await pipe.execute()
+    except WatchError:
+        _local_deals.pop(deal_id)
+    except RedisError as e:
+        logger.warning(f"Не удалось сохранить карточку сделки {deal_id} в Redis: {str(e)}")
+
+
+async def invalidate_deal(redis: Optional[Redis], deal_id: int) -> None:
+    """
+    Единая точка сброса карточки сделки.
+
+    Вызывается после любой записи, меняющей карточку: изменение, покупка,
+    удаление сделки, новый или удалённый отзыв.
+    """
+    _local_deals.pop(deal_id)
+    if redis is None:
+        return
+    try:
+        # Поколение — до удаления: заполнение, начатое раньше, уже не запишет старую карточку
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.incr(deal_generation_key(deal_id))
+            pipe.expire(deal_generation_key(deal_id), DEAL_VIEW_TTL)
+            pipe.delete(deal_view_key(deal_id))
+            pipe.publish(DEAL_VIEW_CHANNEL, deal_id)
+            await pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Не удалось сбросить карточку сделки {deal_id} в Redis: {str(e)}")
+
+
+async def deal_view_listener() -> None:
+    """
+    Фоновая задача: удаляет из локального LRU карточки, о сбросе которых
+    сообщили в DEAL_VIEW_CHANNEL. После (пере)подписки локальный кэш
+    очищается целиком — сообщения, пришедшие без подписки, не теряются.
+    """
+    redis = get_redis_client(purpose="pubsub")
+    while True:
+        pubsub = redis.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(DEAL_VIEW_CHANNEL)
+            _local_deals.clear()
+            while True:
+                message = await pubsub.get_message(timeout=1.0)
+                if message is not None:
+                    _local_deals.pop(int(message["data"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка слушателя карточек сделок: {str(e)}")
+            await asyncio.sleep(RECONNECT_DELAY)
+        finally:
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
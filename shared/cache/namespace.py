@@ -0,0 +1,154 @@
+# shared/cache/namespace.py
+import logging
+from typing import Iterable, Optional
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+
+class CacheNamespace:
+    """
+    Пространство имён кэша с версионированием.
+
+    В каждый ключ встраивается текущее поколение пространства (`companies:v12:...`).
+    Инвалидация всего пространства — один INCR счётчика поколения: старые ключи
+    просто перестают читаться и сами истекают по TTL. Никаких KEYS/SCAN.
+
+    Дополнительно ключи можно помечать тегами (например, `company:15`), чтобы
+    точечно удалить только те записи, которые затрагивает изменение.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    @property
+    def generation_key(self) -> str:
+        return f"cache:gen:{self.name}"
+
+    def tag_key(self, tag: str) -> str:
+        return f"cache:tag:{self.name}:{tag}"
+
+    async def generation(self, redis: Redis) -> int:
+        value = await redis.get(self.generation_key)
+        return int(value or 0)
+
+    async def key(self, redis: Redis, *parts) -> str:
+        """Строит ключ с текущим поколением пространства."""
+        generation = await self.generation(redis)
+        return ":".join([self.name, f"v{generation}", *(str(part) for part in parts)])
+
+    async def get(self, redis: Redis, key: str) -> Optional[str]:
+        return await redis.get(key)
+
+    async def set(self, redis: Redis, key: str, value: str, ttl: int, tags: Iterable[str] = ()) -> None:
+        """Сохраняет значение и регистрирует ключ в наборах указанных тегов."""
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.setex(key, ttl, value)
+            for tag in tags:
+                tag_key = self.tag_key(tag)
+                pipe.sadd(tag_key, key)
+                # Набор тега живёт не дольше самых свежих помеченных записей
+                pipe.expire(tag_key, ttl)
+            await pipe.execute()
+
+    async def invalidate(self, redis: Redis) -> int:
+        """Инвалидирует всё пространство: увеличивает поколение."""
+        return await redis.incr(self.generation_key)
+
+    async def invalidate_tags(self, redis: Redis, *tags: str) -> None:
+        """Удаляет только записи, помеченные указанными тегами."""
+        for tag in tags:
+            tag_key = self.tag_key(tag)
+            keys = await redis.smembers(tag_key)
+            await redis.delete(tag_key, *keys)
+
+
+# Кэши страниц рейтинга и списка компаний
+COMPANIES_CACHE = CacheNamespace("companies")
+VIKOR_COMPANIES_CACHE = CacheNamespace("vikor_companies")
+
+# Снимки рассчитанных рейтингов (строки компаний + оценки всех методов и профилей)
+RANKING_SNAPSHOTS = CacheNamespace("ranking_snapshots")
+
+# Аккаунты продавцов, чьи показатели рейтинга изменились (обрабатывает rating_service)
+RANKING_DIRTY_KEY = "ranking:dirty_accounts"
+
+RANKING_CACHES = (COMPANIES_CACHE, VIKOR_COMPANIES_CACHE)
+
+# Счётчики фасетов каталога сделок (по сигнатуре фильтров)
+DEAL_FACETS_CACHE = CacheNamespace("deal_facets")
+
+
+def company_tag(company_id: int) -> str:
+    return f"company:{company_id}"
+
+
+def account_tag(account_id: int) -> str:
+    # Партнёры хранятся по ID аккаунтов, поэтому помечаем их отдельным тегом
+    return f"account:{account_id}"
+
+
+async def invalidate_rankings(redis: Optional[Redis]) -> None:
+    """
+    Сбрасывает все кэши, зависящие от рейтинга компаний.
+
+    Вызывается после любой записи, влияющей на рейтинг: отзывы, покупки,
+    создание/удаление сделок, изменения компаний и покупка топа.
+    Ошибки Redis не прерывают основную операцию — кэш истечёт по TTL.
+    """
+    if redis is None:
+        return
+    try:
+        for namespace in RANKING_CACHES:
+            await namespace.invalidate(redis)
+        await RANKING_SNAPSHOTS.invalidate(redis)
+    except RedisError as e:
+        logger.warning(f"Не удалось инвалидировать кэш рейтингов: {str(e)}")
+
+
+async def invalidate_company(redis: Optional[Redis], company_id: int, account_id: Optional[int] = None) -> None:
+    """
+    Точечно сбрасывает страницы, на которых выводится компания (без пересчёта рейтинга).
+
+    Если передан account_id, сбрасываются и страницы, где компания указана партнёром.
+    """
+    if redis is None:
+        return
+    tags = [company_tag(company_id)]
+    if account_id is not None:
+        tags.append(account_tag(account_id))
+    try:
+        for namespace in RANKING_CACHES:
+            await namespace.invalidate_tags(redis, *tags)
+        # В снимках рейтинга лежат название и логотип компании — пересобираем их
+        await RANKING_SNAPSHOTS.invalidate(redis)
+    except RedisError as e:
+        logger.warning(f"Не удалось инвалидировать кэш компании {company_id}: {str(e)}")
+
+
+async def mark_ranking_dirty(redis: Optional[Redis], account_id: int) -> None:
+    """
+    Помечает продавца для инкрементального пересчёта рейтинга.
+
+    Вместо полной перестройки снимков rating_service в фоне обновит только
+    строку этой компании. Список компаний (средняя оценка) сбрасываем сразу.
+    """
+    if redis is None:
+        return
+    try:
+        await redis.sadd(RANKING_DIRTY_KEY, account_id)
+        await COMPANIES_CACHE.invalidate(redis)
+    except RedisError as e:
+        logger.warning(f"Не удалось пометить рейтинг продавца {account_id} для обновления: {str(e)}")
+
+
+async def invalidate_deal_facets(redis: Optional[Redis]) -> None:
+    """Сбрасывает счётчики фасетов каталога после создания, изменения или удаления сделки."""
+    if redis is None:
+        return
+    try:
+        await DEAL_FACETS_CACHE.invalidate(redis)
+    except RedisError as e:
+        logger.warning(f"Не удалось инвалидировать кэш фасетов сделок: {str(e)}")
@@ -0,0 +1,126 @@
+# shared/cache/reference_data.py
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import select
+
+from shared.db.models import Region, DealBranch, DealTypes, DealDetail
+from shared.db.redis import get_redis_client
+from shared.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Канал, в который admin_service (и сидинг) сообщает об изменении справочников
+REFERENCE_CHANNEL = "reference_data:invalidate"
+REFERENCE_REFRESH_INTERVAL = 600  # Полная перезагрузка на случай пропущенного сообщения, сек
+RECONNECT_DELAY = 5  # Пауза перед повторной подпиской после ошибки Redis, сек
+
+
+class ReferenceData:
+    """
+    Неизменяемый снимок справочников: регионы, отрасли, типы и статусы сделок.
+
+    Обновление заменяет снимок целиком, поэтому обработчик, получивший
+    снимок, видит согласованные данные без блокировок.
+    """
+
+    def __init__(
+        self,
+        regions: Dict[int, str],
+        branches: Dict[int, str],
+        types: Dict[int, str],
+        statuses: Dict[int, str]
+    ):
+        self.regions = regions
+        self.branches = branches
+        self.types = types
+        self.statuses = statuses
+        self.status_ids = {detail: status_id for status_id, detail in statuses.items()}
+
+    def status_id(self, detail: str) -> Optional[int]:
+        return self.status_ids.get(detail)
+
+    @staticmethod
+    def as_list(items: Dict[int, str]) -> List[dict]:
+        """Формат ответов справочных эндпоинтов: [{"id": 1, "name": "Название"}, ...]."""
+        return [{"id": item_id, "name": name} for item_id, name in items.items()]
+
+
+_reference: Optional[ReferenceData] = None
+_load_lock = asyncio.Lock()
+
+
+async def load_reference_data() -> ReferenceData:
+    """Загружает все справочники одной сессией (четыре небольших запроса)."""
+    async with AsyncSessionLocal() as db:
+        regions = (await db.execute(select(Region.id, Region.name).order_by(Region.id))).all()
+        branches = (await db.execute(select(DealBranch.id, DealBranch.name).order_by(DealBranch.id))).all()
+        types = (await db.execute(select(DealTypes.id, DealTypes.name).order_by(DealTypes.id))).all()
+        statuses = (await db.execute(select(DealDetail.id, DealDetail.detail).order_by(DealDetail.id))).all()
+    return ReferenceData(dict(regions), dict(branches), dict(types), dict(statuses))
+
+
+async def refresh_reference_data() -> ReferenceData:
+    global _reference
+    async with _load_lock:
+        _reference = await load_reference_data()
+    logger.info("Справочники загружены в память процесса")
+    return _reference
+
+
+async def get_reference_data() -> ReferenceData:
+    """
+    Текущий снимок справочников. Запрос к БД — только при первом обращении
+    в процессе; дальше снимок обновляется слушателем reference_data_listener.
+    Может использоваться как зависимость FastAPI.
+    """
+    global _reference
+    if _reference is None:
+        async with _load_lock:
+            if _reference is None:
+                _reference = await load_reference_data()
+    return _reference
+
+
+async def publish_reference_invalidation(redis: Redis) -> None:
+    """Сообщает всем процессам, что справочники изменились."""
+    try:
+        await redis.publish(REFERENCE_CHANNEL, "1")
+    except RedisError as e:
+        logger.warning(f"Не удалось опубликовать сброс справочников: {str(e)}")
+
+
+async def reference_data_listener() -> None:
+    """
+    Фоновая задача: перезагружает справочники по сообщению из REFERENCE_CHANNEL.
+
+    После (пере)подписки снимок перечитывается сразу — сообщения, пришедшие,
+    пока подписки не было, не теряются. Раз в REFERENCE_REFRESH_INTERVAL
+    снимок перечитывается и без сообщений.
+    """
+    redis = get_redis_client(purpose="pubsub")
+    while True:
+        pubsub = redis.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(REFERENCE_CHANNEL)
+            await refresh_reference_data()
+            loop = asyncio.get_running_loop()
+            refreshed_at = loop.time()
+            while True:
+                message = await pubsub.get_message(timeout=1.0)
+                if message is not None or loop.time() - refreshed_at > REFERENCE_REFRESH_INTERVAL:
+                    await refresh_reference_data()
+                    refreshed_at = loop.time()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка слушателя справочников: {str(e)}")
+            await asyncio.sleep(RECONNECT_DELAY)
+        finally:
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
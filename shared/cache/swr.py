@@ -0,0 +1,138 @@
+# shared/cache/swr.py
+import asyncio
+import json
+import logging
+import math
+import random
+import time
+from typing import Any, Awaitable, Callable, Iterable, Set, Tuple
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared.cache.namespace import CacheNamespace
+from shared.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Функция пересчёта: получает сессию БД, возвращает (значение, теги кэша)
+ComputeFn = Callable[[AsyncSession], Awaitable[Tuple[Any, Iterable[str]]]]
+
+LOCK_TTL = 60  # Сколько живёт блокировка пересчёта, сек
+WAIT_TIMEOUT = 5.0  # Сколько ждём пересчёт другим процессом при пустом кэше
+WAIT_STEP = 0.1
+
+# Ссылки на фоновые пересчёты, чтобы задачи не собрал GC
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def _lock_key(key: str) -> str:
+    return f"{key}:lock"
+
+
+def _should_refresh(envelope: dict, beta: float) -> bool:
+    """
+    Вероятностное досрочное обновление (XFetch).
+
+    Чем ближе мягкий срок и чем дольше пересчёт, тем выше шанс обновить
+    раньше — истечения ключей разных реплик размазываются во времени.
+    """
+    delta = envelope.get("delta", 0.0)
+    jitter = -delta * beta * math.log(1.0 - random.random())
+    return time.time() + jitter >= envelope["soft_expires"]
+
+
+async def _compute_and_store(
+    namespace: CacheNamespace,
+    redis: Redis,
+    db: AsyncSession,
+    key: str,
+    compute: ComputeFn,
+    soft_ttl: int,
+    hard_ttl: int
+) -> Any:
+    started = time.time()
+    value, tags = await compute(db)
+    finished = time.time()
+    envelope = {
+        "value": value,
+        "soft_expires": finished + soft_ttl,
+        "delta": finished - started,
+    }
+    await namespace.set(redis, key, json.dumps(envelope), hard_ttl, tags=tags)
+    return value
+
+
+async def _refresh_in_background(
+    namespace: CacheNamespace,
+    redis: Redis,
+    key: str,
+    compute: ComputeFn,
+    soft_ttl: int,
+    hard_ttl: int
+) -> None:
+    # Сессия запроса к этому моменту уже закрыта — открываем свою
+    try:
+        async with AsyncSessionLocal() as db:
+            await _compute_and_store(namespace, redis, db, key, compute, soft_ttl, hard_ttl)
+    except Exception as e:
+        logger.error(f"Ошибка фонового обновления кэша {key}: {str(e)}")
+    finally:
+        try:
+            await redis.delete(_lock_key(key))
+        except RedisError:
+            pass
+
+
+async def get_or_compute(
+    namespace: CacheNamespace,
+    redis: Redis,
+    db: AsyncSession,
+    key: str,
+    compute: ComputeFn,
+    soft_ttl: int,
+    hard_ttl: int,
+    beta: float = 1.0
+) -> Any:
+    """
+    Кэш с защитой от «стампида» (stale-while-revalidate + распределённая блокировка).
+
+    - до мягкого срока (soft_ttl) значение отдаётся из кэша как есть;
+    - после него (или раньше — по XFetch) отдаётся устаревшее значение, а пересчёт
+      в фоне запускает только владелец блокировки в Redis;
+    - ключ живёт hard_ttl; если его нет совсем, считает один процесс,
+      остальные недолго ждут результат.
+
+    :param compute: async-функция (db) -> (значение, теги); значение должно сериализоваться в JSON
+    :return: значение (из кэша или только что посчитанное)
+    """
+    cached = await redis.get(key)
+    if cached:
+        envelope = json.loads(cached)
+        if _should_refresh(envelope, beta) and await redis.set(_lock_key(key), "1", nx=True, ex=LOCK_TTL):
+            task = asyncio.create_task(
+                _refresh_in_background(namespace, redis, key, compute, soft_ttl, hard_ttl)
+            )
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
+        return envelope["value"]
+
+    owns_lock = await redis.set(_lock_key(key), "1", nx=True, ex=LOCK_TTL)
+    if not owns_lock:
+        # Значение уже считает другой запрос — ждём его, а не нагружаем БД повторно
+        waited = 0.0
+        while waited < WAIT_TIMEOUT:
+            await asyncio.sleep(WAIT_STEP)
+            waited += WAIT_STEP
+            cached = await redis.get(key)
+            if cached:
+                return json.loads(cached)["value"]
+        logger.warning(f"Не дождались пересчёта кэша {key}, считаем сами")
+
+    try:
+        return await _compute_and_store(namespace, redis, db, key, compute, soft_ttl, hard_ttl)
+    finally:
+        if owns_lock:
+            await redis.delete(_lock_key(key))
+
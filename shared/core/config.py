@@ -1,4 +1,5 @@
 import os
+from typing import Optional
 
 from pydantic_settings import BaseSettings
 
@@ -16,6 +17,18 @@ class Settings(BaseSettings):
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
+    REDIS_URL: str = "redis://redis:6379/0"
+    REDIS_MAX_CONNECTIONS: int = 50  # Лимит соединений общего пула на процесс
+    REDIS_PUBSUB_MAX_CONNECTIONS: int = 200  # Лимит соединений для подписок (чаты)
+    REDIS_POOL_TIMEOUT: float = 5.0  # Сколько ждать свободное соединение из пула, сек
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30  # Проверка простаивающих соединений, сек
+    REDIS_SOCKET_TIMEOUT: float = 5.0
+    REDIS_SOCKET_CONNECT_TIMEOUT: float = 5.0
+    MEDIA_VARIANT_WORKERS: int = 2  # Процессов для генерации миниатюр и WebP
+    MEDIA_MAX_LARGE_TRANSFERS: int = 32  # Одновременных отдач крупных файлов на процесс media_service
+    # Префикс internal-location nginx: если задан, файлы отдаёт nginx (sendfile) по X-Accel-Redirect
+    MEDIA_ACCEL_REDIRECT_PREFIX: Optional[str] = None
+    DEAL_ARCHIVE_AFTER_MONTHS: int = 6  # Через сколько месяцев после закрытия сделка уходит в архив
 
     class Config:
         env_file = os.path.join(os.path.dirname(__file__), "..", "..", ".env")
@@ -0,0 +1,33 @@
+# shared/db/archive.py
+# Чтение «горячих» таблиц вместе с архивом закрытых сделок (shared/db/models/archive.py).
+# Нужны там, где важна вся история: покупки аккаунта, метрики продавцов в рейтинге.
+# Каталог, карточки и чат работают только с горячими таблицами
+from sqlalchemy import select, union_all
+
+from shared.db.models import Deal_Model, Feedback_Model, DealArchive_Model, FeedbackArchive_Model
+from shared.db.models.archive import DealConsumersArchive
+from shared.db.models.deal_consumers import DealConsumers
+
+
+def deals_with_archive(*columns: str, name: str = "deals_all"):
+    """Подзапрос UNION ALL сделок и архивных сделок со столбцами columns."""
+    return union_all(
+        select(*(getattr(Deal_Model, column) for column in columns)),
+        select(*(getattr(DealArchive_Model, column) for column in columns))
+    ).subquery(name)
+
+
+def feedback_with_archive(*columns: str, name: str = "feedback_all"):
+    """Подзапрос UNION ALL отзывов и архивных отзывов со столбцами columns."""
+    return union_all(
+        select(*(getattr(Feedback_Model, column) for column in columns)),
+        select(*(getattr(FeedbackArchive_Model, column) for column in columns))
+    ).subquery(name)
+
+
+def purchases_with_archive(*columns: str, name: str = "purchases_all"):
+    """Подзапрос UNION ALL покупок (deal_consumers) и архивных покупок со столбцами columns."""
+    return union_all(
+        select(*(DealConsumers.c[column] for column in columns)),
+        select(*(DealConsumersArchive.c[column] for column in columns))
+    ).subquery(name)
@@ -10,4 +10,7 @@ from .feedback import Feedback_Model
 from .refresh_tokens import RefreshToken
 from .buying_top import BuyTop
 from .accounts import Account_Model
-from .deal_types import DealTypes
\ No newline at end of file
+from .deal_types import DealTypes
+from .media import MediaBlob
+from .archive import DealArchive_Model, DealConsumersArchive as deal_consumers_archive, FeedbackArchive_Model, MessageArchive_Model
+from .saved_searches import SavedSearch_Model
\ No newline at end of file
@@ -0,0 +1,105 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Numeric, Boolean, Table, DDL, event
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from sqlalchemy.sql import func
+from shared.db.base import Base
+from .accounts import Account_Model
+
+# Холодный архив закрытых сделок (deal_service/app/services/archive.py).
+# Те же столбцы, что в горячих таблицах, без внешних ключей и search_vector:
+# архив только читается (история покупок, метрики рейтинга).
+# ON DELETE SET NULL горячих таблиц для ссылок на аккаунты повторяет триггер
+# ARCHIVE_ACCOUNT_DELETE_DDL — иначе горячие и архивные строки в UNION ALL
+# (shared/db/archive.py) расходились бы после удаления аккаунта
+
+
+class DealArchive_Model(Base):
+    __tablename__ = "deals_archive"
+
+    id = Column(Integer, primary_key=True)
+    name_deal = Column(String(255), nullable=False)
+    seller_id = Column(Integer, nullable=True, index=True)  # Индекс для GROUP BY в рейтинге
+    seller_price = Column(Numeric(12,2), nullable=False)
+    YAMS_percent = Column(Numeric(12,2), nullable=True)
+    total_cost = Column(Numeric(12,2), nullable=True)
+    region_id = Column(Integer, nullable=True)
+    address_deal = Column(String(255), nullable=False)
+    date_close = Column(DateTime(timezone=True), nullable=True)
+    photos_url = Column(ARRAY(String), nullable=True)
+    photos_variants = Column(JSONB, nullable=True)
+    deal_details_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+    deal_branch_id = Column(Integer, nullable=True)
+    deal_type_id = Column(Integer, nullable=True)
+    order_count = Column(Integer, nullable=False, default=0, server_default="0")
+    feedback_count = Column(Integer, nullable=False, default=0, server_default="0")
+    archived_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+DealConsumersArchive = Table(
+    "deal_consumers_archive",
+    Base.metadata,
+    Column("id", Integer, primary_key=True),
+    Column("deal_id", Integer, nullable=False, index=True),
+    Column("consumer_id", Integer, nullable=True, index=True),  # Индекс для истории покупок
+    Column("created_at", DateTime(timezone=True), nullable=False),
+    Column("archived_at", DateTime(timezone=True), server_default=func.now(), nullable=False)
+)
+
+
+class FeedbackArchive_Model(Base):
+    __tablename__ = "feedback_archive"
+
+    id = Column(Integer, primary_key=True)
+    deal_id = Column(Integer, nullable=True, index=True)
+    stars = Column(Integer, nullable=False)
+    details = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    author_id = Column(Integer, nullable=True)
+    is_purchaser = Column(Boolean, nullable=False, default=False)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class MessageArchive_Model(Base):
+    __tablename__ = "messages_archive"
+
+    id = Column(Integer, primary_key=True)
+    deal_id = Column(Integer, nullable=False, index=True)
+    consumer_id = Column(Integer, nullable=True)
+    sender_id = Column(Integer, nullable=True)
+    recipient_id = Column(Integer, nullable=True)
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+# Удаление аккаунта обнуляет ссылки на него в архиве, как ON DELETE SET NULL в горячих таблицах.
+# Удаление аккаунтов редкое: по одному проходу на таблицу, без индексов на каждый столбец
+ARCHIVE_ACCOUNT_DELETE_DDL = (
+    """
+    CREATE OR REPLACE FUNCTION archive_account_deleted() RETURNS trigger AS $$
+    BEGIN
+        UPDATE deals_archive SET seller_id = NULL WHERE seller_id = OLD.id;
+        UPDATE deal_consumers_archive SET consumer_id = NULL WHERE consumer_id = OLD.id;
+        UPDATE feedback_archive SET author_id = NULL WHERE author_id = OLD.id;
+        UPDATE messages_archive SET
+            consumer_id = NULLIF(consumer_id, OLD.id),
+            sender_id = NULLIF(sender_id, OLD.id),
+            recipient_id = NULLIF(recipient_id, OLD.id)
+        WHERE OLD.id IN (consumer_id, sender_id, recipient_id);
+        RETURN OLD;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS accounts_archive_delete_trigger ON accounts",
+    """
+    CREATE TRIGGER accounts_archive_delete_trigger
+        AFTER DELETE ON accounts
+        FOR EACH ROW EXECUTE FUNCTION archive_account_deleted()
+    """,
+)
+
+# Для create_all: вместе с таблицей accounts (тело функции проверяется только при вызове,
+# архивные таблицы к этому моменту могут быть ещё не созданы)
+for statement in ARCHIVE_ACCOUNT_DELETE_DDL:
+    event.listen(Account_Model.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
@@ -1,10 +1,12 @@
-from sqlalchemy import Column, Integer, DateTime, ForeignKey, Numeric
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Numeric, UniqueConstraint
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from shared.db.base import Base
 
 class BuyTop(Base):
     __tablename__ = "buy_top"
+    # Одна запись на компанию — по ней работает INSERT ... ON CONFLICT при покупке топа
+    __table_args__ = (UniqueConstraint("id_company", name="uq_buy_top_id_company"),)
 
     id = Column(Integer, primary_key=True, index=True)
     id_company = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=False)
@@ -1,5 +1,5 @@
 from sqlalchemy import Column, Integer, String, Text, Date, ForeignKey, ARRAY, Index
-from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from sqlalchemy.orm import relationship
 from shared.db.base import Base
 
@@ -13,6 +13,7 @@ class Company_Model(Base):
     legal_address = Column(String(255), nullable=True)
     actual_address = Column(String(255), nullable=True)
     logo_url = Column(Text, nullable=True)
+    logo_variants = Column(JSONB, nullable=True)  # URL миниатюр логотипа (thumb/medium, WebP)
     employees = Column(Integer, nullable=True)
     year_founded = Column(Date, nullable=True, index=True)
     website = Column(String(255), nullable=True)
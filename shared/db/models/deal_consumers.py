@@ -1,6 +1,8 @@
-from sqlalchemy import Column, Integer, ForeignKey, Table, DateTime, func
+from sqlalchemy import Column, Integer, ForeignKey, Table, DateTime, func, DDL, event
 from shared.db.base import Base
 
+# Секционирована по месяцам created_at (см. shared/db/partitions.py), поэтому
+# created_at входит в первичный ключ
 DealConsumers = Table(
     "deal_consumers",
     Base.metadata,
@@ -23,6 +25,16 @@ DealConsumers = Table(
         "created_at",
         DateTime(timezone=True),
         server_default=func.timezone('Europe/Moscow', func.now()),
+        primary_key=True,
         nullable=False
-    )
-)
\ No newline at end of file
+    ),
+    postgresql_partition_by="RANGE (created_at)"
+)
+
+# Для create_all: секция по умолчанию, чтобы вставки работали до создания месячных секций
+event.listen(
+    DealConsumers,
+    "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS deal_consumers_default PARTITION OF deal_consumers DEFAULT")
+    .execute_if(dialect="postgresql")
+)
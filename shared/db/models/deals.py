@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, Numeric, ForeignKey
-from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy import Column, Integer, String, DateTime, Numeric, ForeignKey, Index, DDL, FetchedValue, event
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, TSVECTOR
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from shared.db.base import Base
@@ -26,12 +26,23 @@ class Deal_Model(Base):
         nullable=True
     )
     photos_url = Column(ARRAY(String), nullable=True)
+    # URL миниатюр для каждого фото из photos_url (в том же порядке), см. shared/services/media.py
+    photos_variants = Column(JSONB, nullable=True)
     deal_details_id = Column(Integer, ForeignKey("deal_details.id", ondelete="SET NULL"), nullable=True)
     created_at = Column(
         DateTime(timezone=True),
         server_default=func.timezone('Europe/Moscow', func.now()),
         nullable=False
     )
+    # Время последнего изменения (в т.ч. счётчиков и названий справочников) — водяной знак
+    # инкрементальной выгрузки. Ставится триггером (DEALS_UPDATED_AT_DDL), а не ORM:
+    # UPDATE в обход ORM и переименования справочников тоже должны его сдвигать
+    updated_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        server_onupdate=FetchedValue(),
+        nullable=False
+    )
     deal_branch_id = Column(
         Integer,
         ForeignKey("deal_branch.id", ondelete="SET NULL"),
@@ -39,6 +50,28 @@ class Deal_Model(Base):
         index=True  # Индекс для JOIN и array_agg
     )
     deal_type_id = Column(Integer, ForeignKey("deal_type.id", ondelete="SET NULL"), nullable=True)
+    # Денормализованные счётчики: обновляются атомарно при покупке/отзыве, сверяются фоновой задачей
+    order_count = Column(Integer, nullable=False, default=0, server_default="0")
+    feedback_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Полнотекстовый поиск (russian): название, отрасль, адрес. Заполняется триггером —
+    # генерируемый столбец не может ссылаться на таблицу deal_branch
+    search_vector = Column(TSVECTOR, nullable=True)
+
+    __table_args__ = (
+        Index('idx_deals_search_vector', 'search_vector', postgresql_using='gin'),
+        # Триграммы по названию — поиск с опечатками
+        Index(
+            'idx_deals_name_deal_trgm', 'name_deal',
+            postgresql_using='gin', postgresql_ops={'name_deal': 'gin_trgm_ops'}
+        ),
+        # Курсорная пагинация: сделки региона по (created_at, id) и общая лента
+        Index('idx_deals_region_created_id', 'region_id', 'created_at', 'id'),
+        Index('idx_deals_created_id', 'created_at', 'id'),
+        # Сортировка по популярности
+        Index('idx_deals_popularity', 'order_count', 'id'),
+        # Инкрементальная выгрузка по updated_at
+        Index('idx_deals_updated_id', 'updated_at', 'id'),
+    )
 
     # Связи
     region = relationship("Region", back_populates="deals")
@@ -53,4 +86,109 @@ class Deal_Model(Base):
         order_by=deal_consumers.c.created_at
     )
     seller = relationship("Account_Model", foreign_keys=[seller_id], lazy="joined")
-    deal_type = relationship("DealTypes", back_populates="deals")
\ No newline at end of file
+    deal_type = relationship("DealTypes", back_populates="deals")
+
+
+# Расширение pg_trgm нужно до создания триграммного индекса
+PG_TRGM_DDL = "CREATE EXTENSION IF NOT EXISTS pg_trgm"
+
+# Триггеры, поддерживающие search_vector в актуальном состоянии.
+# По одной команде на строку: asyncpg не выполняет несколько команд в одном запросе
+DEALS_SEARCH_DDL = (
+    """
+    CREATE OR REPLACE FUNCTION deals_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('russian', coalesce(NEW.name_deal, '')), 'A') ||
+            setweight(to_tsvector('russian', coalesce(
+                (SELECT name FROM deal_branch WHERE id = NEW.deal_branch_id), ''
+            )), 'B') ||
+            setweight(to_tsvector('russian', coalesce(NEW.address_deal, '')), 'C');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS deals_search_vector_trigger ON deals",
+    """
+    CREATE TRIGGER deals_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF name_deal, address_deal, deal_branch_id ON deals
+        FOR EACH ROW EXECUTE FUNCTION deals_search_vector_update()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION deal_branch_search_vector_refresh() RETURNS trigger AS $$
+    BEGIN
+        -- Переименование отрасли пересчитывает вектор её сделок
+        UPDATE deals SET name_deal = name_deal WHERE deal_branch_id = NEW.id;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS deal_branch_search_vector_trigger ON deal_branch",
+    """
+    CREATE TRIGGER deal_branch_search_vector_trigger
+        AFTER UPDATE OF name ON deal_branch
+        FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+        EXECUTE FUNCTION deal_branch_search_vector_refresh()
+    """,
+)
+
+# updated_at: любое изменение строки сделки и переименование справочника, название
+# которого попадает в выгрузку. Переименование отрасли уже обновляет её сделки
+# (deal_branch_search_vector_refresh), отдельный триггер — для региона, типа и статуса
+DEALS_UPDATED_AT_DDL = (
+    """
+    CREATE OR REPLACE FUNCTION deals_updated_at_touch() RETURNS trigger AS $$
+    BEGIN
+        NEW.updated_at := now();
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS deals_updated_at_trigger ON deals",
+    """
+    CREATE TRIGGER deals_updated_at_trigger
+        BEFORE UPDATE ON deals
+        FOR EACH ROW EXECUTE FUNCTION deals_updated_at_touch()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION deals_reference_renamed() RETURNS trigger AS $$
+    BEGIN
+        IF TG_TABLE_NAME = 'regions' THEN
+            UPDATE deals SET updated_at = now() WHERE region_id = NEW.id;
+        ELSIF TG_TABLE_NAME = 'deal_type' THEN
+            UPDATE deals SET updated_at = now() WHERE deal_type_id = NEW.id;
+        ELSE
+            UPDATE deals SET updated_at = now() WHERE deal_details_id = NEW.id;
+        END IF;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS regions_deals_updated_at_trigger ON regions",
+    """
+    CREATE TRIGGER regions_deals_updated_at_trigger
+        AFTER UPDATE OF name ON regions
+        FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+        EXECUTE FUNCTION deals_reference_renamed()
+    """,
+    "DROP TRIGGER IF EXISTS deal_type_deals_updated_at_trigger ON deal_type",
+    """
+    CREATE TRIGGER deal_type_deals_updated_at_trigger
+        AFTER UPDATE OF name ON deal_type
+        FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+        EXECUTE FUNCTION deals_reference_renamed()
+    """,
+    "DROP TRIGGER IF EXISTS deal_details_deals_updated_at_trigger ON deal_details",
+    """
+    CREATE TRIGGER deal_details_deals_updated_at_trigger
+        AFTER UPDATE OF detail ON deal_details
+        FOR EACH ROW WHEN (OLD.detail IS DISTINCT FROM NEW.detail)
+        EXECUTE FUNCTION deals_reference_renamed()
+    """,
+)
+
+# Для create_all: расширение до создания таблицы, триггеры после
+# (справочники создаются раньше deals — на них ссылаются внешние ключи)
+event.listen(Deal_Model.__table__, "before_create", DDL(PG_TRGM_DDL).execute_if(dialect="postgresql"))
+for statement in (*DEALS_SEARCH_DDL, *DEALS_UPDATED_AT_DDL):
+    event.listen(Deal_Model.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Index
+from sqlalchemy.sql import func
+from shared.db.base import Base
+
+class MediaBlob(Base):
+    """Файл медиахранилища: имя — SHA-256 содержимого, одинаковые загрузки хранятся один раз."""
+    __tablename__ = "media_blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    extension = Column(String(8), nullable=False)  # Расширение по сигнатуре файла (.jpg, .png)
+    size = Column(Integer, nullable=False)
+    # Сколько записей (сделки, логотипы, фото профиля) ссылаются на файл
+    ref_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Когда счётчик упал до нуля; сборщик удаляет файл после периода ожидания
+    unreferenced_at = Column(DateTime(timezone=True), nullable=True, server_default=func.now())
+    # Миниатюры и WebP-версии сгенерированы (иначе их догенерирует фоновая задача)
+    variants_ready = Column(Boolean, nullable=False, default=False, server_default="false")
+    # Неудачные попытки генерации вариантов; после VARIANTS_MAX_ATTEMPTS файл больше не обрабатывается
+    variant_attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        # Кандидаты на удаление для сборщика мусора
+        Index('idx_media_blobs_unreferenced', 'unreferenced_at', postgresql_where=(ref_count == 0)),
+        # Файлы без вариантов для generate_missing_variants
+        Index(
+            'idx_media_blobs_variants_pending', 'variant_attempts', 'created_at',
+            postgresql_where=(variants_ready.is_(False))
+        ),
+    )
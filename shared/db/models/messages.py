@@ -1,12 +1,14 @@
-from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey, DDL, event
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from shared.db.base import Base
 
 class Message_Model(Base):
     __tablename__ = "messages"
+    # Секционирована по месяцам created_at (см. shared/db/partitions.py)
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     deal_id = Column(
         Integer,
         ForeignKey("deals.id", ondelete="CASCADE"),
@@ -35,6 +37,7 @@ class Message_Model(Base):
     created_at = Column(
         DateTime(timezone=True),
         server_default=func.timezone('Europe/Moscow', func.now()),
+        primary_key=True,  # Ключ секционирования обязан входить в первичный ключ
         nullable=False,
         index=True
     )
@@ -52,4 +55,12 @@ class Message_Model(Base):
             "recipient_id": self.recipient_id,
             "content": self.content,
             "created_at": self.created_at.isoformat()
-        }
\ No newline at end of file
+        }
+
+
+# Для create_all: секция по умолчанию, чтобы вставки работали до создания месячных секций
+event.listen(
+    Message_Model.__table__,
+    "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS messages_default PARTITION OF messages DEFAULT").execute_if(dialect="postgresql")
+)
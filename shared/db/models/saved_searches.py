@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.sql import func
+from shared.db.base import Base
+
+class SavedSearch_Model(Base):
+    """Сохранённый поиск покупателя: уведомление о новых сделках, подходящих под фильтры."""
+    __tablename__ = "saved_searches"
+
+    id = Column(Integer, primary_key=True, index=True)  # Уже индексирован (PK)
+    account_id = Column(
+        Integer,
+        ForeignKey("accounts.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True  # Индекс для списка поисков аккаунта
+    )
+    # Пустой фильтр — любое значение
+    region_id = Column(Integer, ForeignKey("regions.id", ondelete="CASCADE"), nullable=True)
+    deal_branch_id = Column(Integer, ForeignKey("deal_branch.id", ondelete="CASCADE"), nullable=True)
+    deal_type_id = Column(Integer, ForeignKey("deal_type.id", ondelete="CASCADE"), nullable=True)
+    search = Column(String(255), nullable=True)
+    # Лексемы search (to_tsvector('russian')) — ключи инвертированного индекса в Redis
+    terms = Column(ARRAY(String), nullable=False, default=list, server_default="{}")
+    created_at = Column(
+        DateTime(timezone=True),
+        server_default=func.timezone('Europe/Moscow', func.now()),
+        nullable=False
+    )
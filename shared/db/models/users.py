@@ -1,4 +1,5 @@
 from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from shared.db.base import Base
 
@@ -8,6 +9,7 @@ class User_Model(Base):
     id = Column(Integer, primary_key=True, index=True)
     fullname = Column(String(255), nullable=False)       # ФИО
     photo_url = Column(String(255), nullable=True)         # Путь до фото
+    photo_variants = Column(JSONB, nullable=True)          # URL миниатюр фото (thumb/medium, WebP)
     # ondelete CASCADE – при удалении аккаунта удаляется пользователь
     account_id = Column(Integer, ForeignKey("accounts.id", ondelete="CASCADE"), nullable=False)
 
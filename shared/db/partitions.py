@@ -0,0 +1,87 @@
+# shared/db/partitions.py
+# Помесячные секции таблиц, секционированных по created_at (messages, deal_consumers)
+import logging
+from datetime import date
+from typing import List
+
+from sqlalchemy import select, func, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLES = ("messages", "deal_consumers")
+PARTITION_MONTHS_AHEAD = 3  # На сколько месяцев вперёд заводить секции
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def add_months(month: date, months: int) -> date:
+    """Первое число месяца, отстоящего от month на months."""
+    years, index = divmod(month.month - 1 + months, 12)
+    return date(month.year + years, index + 1, 1)
+
+
+async def _table_exists(db: AsyncSession, name: str) -> bool:
+    return (await db.execute(select(func.to_regclass(name)))).scalar() is not None
+
+
+async def _create_partition(db: AsyncSession, table: str, start: date, end: date) -> None:
+    """
+    Создаёт секцию [start, end). Если подходящие строки уже попали в секцию
+    по умолчанию, она отсоединяется на время переноса строк — иначе PostgreSQL
+    не даст создать секцию.
+    """
+    name = partition_name(table, start)
+    default = f"{table}_default"
+    bounds = {"start": start, "end": end}
+    stray = (await db.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE created_at >= :start AND created_at < :end)"),
+        bounds
+    )).scalar()
+    if stray:
+        await db.execute(text(f"ALTER TABLE {table} DETACH PARTITION {default}"))
+    await db.execute(text(
+        f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM ('{start}') TO ('{end}')"
+    ))
+    if stray:
+        await db.execute(
+            text(
+                f"WITH moved AS (DELETE FROM {default} WHERE created_at >= :start AND created_at < :end RETURNING *) "
+                f"INSERT INTO {table} SELECT * FROM moved"
+            ),
+            bounds
+        )
+        await db.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT"))
+
+
+async def ensure_partitions(
+    db: AsyncSession,
+    table: str,
+    months_ahead: int = PARTITION_MONTHS_AHEAD
+) -> List[str]:
+    """
+    Заводит секции текущего месяца и months_ahead следующих.
+
+    Старые секции не удаляются: строки закрытых сделок переносит в архив
+    deal_service/app/services/archive.py, пустые секции ничего не стоят.
+
+    :return: имена созданных секций
+    """
+    if table not in PARTITIONED_TABLES:
+        raise ValueError(f"Таблица {table} не секционирована")
+    current = (await db.execute(select(func.current_date()))).scalar_one().replace(day=1)
+    if not await _table_exists(db, f"{table}_default"):
+        await db.execute(text(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT"))
+    created = []
+    for offset in range(months_ahead + 1):
+        start = add_months(current, offset)
+        if await _table_exists(db, partition_name(table, start)):
+            continue
+        await _create_partition(db, table, start, add_months(start, 1))
+        created.append(partition_name(table, start))
+    await db.commit()
+    if created:
+        logger.info(f"Созданы секции {table}: {', '.join(created)}")
+    return created
@@ -0,0 +1,93 @@
+# shared/db/redis.py
+import logging
+from typing import Dict, Optional, Tuple
+
+from redis.asyncio import Redis, BlockingConnectionPool
+
+from shared.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Один пул на процесс для каждой пары (URL, db, назначение)
+_pools: Dict[Tuple[str, Optional[int], str], BlockingConnectionPool] = {}
+
+
+def get_redis_pool(url: Optional[str] = None, db: Optional[int] = None, purpose: str = "default") -> BlockingConnectionPool:
+    """
+    Возвращает общий для процесса пул соединений Redis.
+
+    Пул блокирующий: при исчерпании лимита запрос ждёт освободившееся соединение
+    (не дольше REDIS_POOL_TIMEOUT), а не открывает новое — число соединений
+    с Redis остаётся ограниченным при любом RPS.
+
+    :param url: URL Redis (по умолчанию settings.REDIS_URL)
+    :param db: номер базы Redis (по умолчанию — из URL)
+    :param purpose: назначение пула; "pubsub" держит долгоживущие подписки
+                    (чаты) отдельно, чтобы они не вытесняли обычные команды
+    """
+    url = url or settings.REDIS_URL
+    key = (url, db, purpose)
+    pool = _pools.get(key)
+    if pool is None:
+        max_connections = (
+            settings.REDIS_PUBSUB_MAX_CONNECTIONS if purpose == "pubsub" else settings.REDIS_MAX_CONNECTIONS
+        )
+        options = {}
+        if db is not None:
+            options["db"] = db
+        pool = BlockingConnectionPool.from_url(
+            url,
+            max_connections=max_connections,
+            timeout=settings.REDIS_POOL_TIMEOUT,
+            health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+            socket_keepalive=True,
+            decode_responses=True,
+            **options
+        )
+        _pools[key] = pool
+        logger.info(f"Создан пул Redis {purpose} (max_connections={max_connections})")
+    return pool
+
+
+def get_redis_client(url: Optional[str] = None, db: Optional[int] = None, purpose: str = "default") -> Redis:
+    """Клиент поверх общего пула. Создание клиента дешёвое, соединения берутся из пула."""
+    return Redis(connection_pool=get_redis_pool(url, db, purpose))
+
+
+async def get_redis() -> Redis:
+    """Зависимость FastAPI для Redis (аналог get_db)."""
+    return get_redis_client()
+
+
+async def get_pubsub_redis() -> Redis:
+    """Зависимость для долгоживущих подписок (websocket-чаты)."""
+    return get_redis_client(purpose="pubsub")
+
+
+async def close_redis_pools() -> None:
+    """Закрывает все пулы процесса. Вызывается на shutdown сервиса."""
+    for key, pool in list(_pools.items()):
+        try:
+            await pool.disconnect()
+        except Exception as e:
+            logger.error(f"Ошибка закрытия пула Redis {key[2]}: {str(e)}")
+    _pools.clear()
+
+
+def redis_pool_stats() -> list[dict]:
+    """Метрики использования пулов Redis текущего процесса."""
+    stats = []
+    for (url, db, purpose), pool in _pools.items():
+        in_use = len(getattr(pool, "_in_use_connections", ()))
+        available = len(getattr(pool, "_available_connections", ()))
+        stats.append({
+            "purpose": purpose,
+            "db": db if db is not None else pool.connection_kwargs.get("db", 0),
+            "max_connections": pool.max_connections,
+            "in_use": in_use,
+            "available": available,
+            "created": in_use + available,
+        })
+    return stats
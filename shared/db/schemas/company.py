@@ -1,6 +1,6 @@
 # shared/db/schemas/company.py
 import re
-from typing import Optional, List
+from typing import Optional, List, Dict
 from pydantic import BaseModel, Field, EmailStr, validator, computed_field
 from datetime import date
 from .account import Account, AccountCreate
@@ -122,6 +122,7 @@ class Company(CompanyBase):
     id: int
     account_id: int
     account: Account  # Прямая ссылка на связанный аккаунт
+    logo_variants: Optional[Dict[str, str]] = Field(None, description="Миниатюры логотипа (thumb, medium, *_webp)")
 
     @computed_field
     @property
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field, validator, computed_field
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Dict
 import re
 from .account import AccountCreate, Account
 
@@ -14,6 +14,8 @@ class UserCreate(UserBase):
 class User(BaseModel):
     id: int
     fullname: str
+    photo_url: Optional[str] = None
+    photo_variants: Optional[Dict[str, str]] = Field(None, description="Миниатюры фото (thumb, medium, *_webp)")
     account_id: int
     account: Account
 
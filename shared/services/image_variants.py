@@ -0,0 +1,62 @@
+# shared/services/image_variants.py
+# Выполняется в дочерних процессах пула: только синхронный код без обращения к БД и Redis
+import os
+from typing import Dict, List, Tuple
+
+from PIL import Image, ImageOps
+
+# Варианты изображения: имя -> максимальная сторона, px
+VARIANT_SIZES: Dict[str, int] = {
+    "thumb": 200,
+    "medium": 800,
+}
+WEBP_QUALITY = 80
+JPEG_QUALITY = 85
+
+
+def variant_file_name(sha256: str, variant: str, extension: str) -> str:
+    return f"{sha256}_{variant}{extension}"
+
+
+def variant_extensions(extension: str) -> Tuple[str, str]:
+    """Форматы вариантов: исходный (PNG остаётся PNG, остальное — JPEG) и WebP."""
+    return (".png" if extension == ".png" else ".jpg"), ".webp"
+
+
+def render_variants(source_path: str, sha256: str, extension: str) -> List[str]:
+    """
+    Строит уменьшенные копии изображения в исходном формате и в WebP.
+
+    Файлы пишутся рядом с оригиналом через временный файл и os.replace.
+    Функция идемпотентна: повторный запуск перезаписывает те же файлы.
+
+    :return: пути созданных файлов
+    """
+    folder = os.path.dirname(source_path)
+    created = []
+    with Image.open(source_path) as original:
+        # Учитываем поворот из EXIF (фото с телефонов)
+        image = ImageOps.exif_transpose(original)
+        for variant, max_side in VARIANT_SIZES.items():
+            resized = image.copy()
+            resized.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+            for target_extension, save_options in _formats(extension):
+                path = os.path.join(folder, variant_file_name(sha256, variant, target_extension))
+                temp_path = f"{path}.part"
+                frame = resized if target_extension != ".jpg" or resized.mode == "RGB" else resized.convert("RGB")
+                frame.save(temp_path, **save_options)
+                os.replace(temp_path, path)
+                created.append(path)
+    return created
+
+
+def _formats(extension: str) -> List[Tuple[str, dict]]:
+    original_extension, webp_extension = variant_extensions(extension)
+    if original_extension == ".png":
+        original_options = {"format": "PNG", "optimize": True}
+    else:
+        original_options = {"format": "JPEG", "quality": JPEG_QUALITY, "optimize": True, "progressive": True}
+    return [
+        (original_extension, original_options),
+        (webp_extension, {"format": "WEBP", "quality": WEBP_QUALITY, "method": 4}),
+    ]
@@ -0,0 +1,344 @@
+# shared/services/media.py
+import asyncio
+import logging
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+import aiofiles.os as aio_os
+import aiofiles.ospath as aio_ospath
+from fastapi import UploadFile
+from sqlalchemy import select, update, delete, case, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.exceptions import HTTPException
+from starlette.staticfiles import StaticFiles
+
+from shared.core.config import settings
+from shared.db.models import MediaBlob
+from shared.db.session import AsyncSessionLocal
+from shared.services.image_variants import VARIANT_SIZES, render_variants, variant_extensions, variant_file_name
+from shared.services.uploads import stream_upload, remove_quietly, IMAGE_SIGNATURES
+
+logger = logging.getLogger(__name__)
+
+# Контентно-адресуемое хранилище: static/media/ab/abcdef...{ext}
+MEDIA_ROOT = Path("static/media")
+MEDIA_URL_PREFIX = f"/{MEDIA_ROOT.as_posix()}/"
+# Временные файлы пишутся внутри хранилища, чтобы os.replace оставался атомарным
+MEDIA_TEMP_DIR = MEDIA_ROOT / "tmp"
+
+GC_GRACE_PERIOD = timedelta(hours=1)  # Сколько хранить файл без ссылок (загружен, но ещё не привязан)
+GC_BATCH = 200  # Файлов за одну транзакцию сборщика
+GC_INTERVAL = 600  # Период запуска сборщика, сек
+VARIANTS_RETRY_AFTER = timedelta(minutes=5)  # Через сколько догенерировать варианты, если процесс упал
+VARIANTS_BATCH = 20
+VARIANTS_MAX_ATTEMPTS = 3  # После стольких ошибок файл отдаётся без вариантов (оригиналом)
+
+# Пул процессов для Pillow: ресайз занимает CPU и не должен блокировать цикл событий
+_variant_pool: Optional[ProcessPoolExecutor] = None
+# Ссылки на фоновые задачи генерации, чтобы их не собрал сборщик мусора Python
+_variant_tasks: Set[asyncio.Task] = set()
+
+
+def blob_path(sha256: str, extension: str) -> Path:
+    return MEDIA_ROOT / sha256[:2] / f"{sha256}{extension}"
+
+
+def blob_url(sha256: str, extension: str) -> str:
+    return f"/{blob_path(sha256, extension).as_posix()}"
+
+
+def variant_path(sha256: str, variant: str, extension: str) -> Path:
+    return MEDIA_ROOT / sha256[:2] / variant_file_name(sha256, variant, extension)
+
+
+def variant_paths(sha256: str, extension: str) -> List[Path]:
+    return [
+        variant_path(sha256, variant, variant_extension)
+        for variant in VARIANT_SIZES
+        for variant_extension in variant_extensions(extension)
+    ]
+
+
+def blob_hash(url: Optional[str]) -> Optional[str]:
+    """SHA-256 файла по его URL; None для файлов вне хранилища (старые пути static/deals и т.п.)."""
+    if not url or not url.startswith(MEDIA_URL_PREFIX):
+        return None
+    return Path(url).stem
+
+
+def variant_urls(url: Optional[str]) -> Optional[Dict[str, str]]:
+    """
+    URL уменьшенных копий файла хранилища: {"thumb", "thumb_webp", "medium", "medium_webp"}.
+
+    Имена вариантов выводятся из хэша, поэтому их можно сохранить сразу при загрузке:
+    пока копии генерируются, по этим URL отдаётся оригинал (см. variant_source).
+    """
+    sha256 = blob_hash(url)
+    if sha256 is None:
+        return None
+    original_extension, webp_extension = variant_extensions(Path(url).suffix)
+    urls = {}
+    for variant in VARIANT_SIZES:
+        urls[variant] = f"/{variant_path(sha256, variant, original_extension).as_posix()}"
+        urls[f"{variant}_webp"] = f"/{variant_path(sha256, variant, webp_extension).as_posix()}"
+    return urls
+
+
+def thumbnail_url(url: Optional[str]) -> Optional[str]:
+    """Миниатюра для списков; для файлов вне хранилища — сам оригинал."""
+    variants = variant_urls(url)
+    return variants["thumb_webp"] if variants else url
+
+
+def _get_variant_pool() -> ProcessPoolExecutor:
+    global _variant_pool
+    if _variant_pool is None:
+        _variant_pool = ProcessPoolExecutor(max_workers=settings.MEDIA_VARIANT_WORKERS)
+    return _variant_pool
+
+
+def shutdown_variant_pool() -> None:
+    if _variant_pool is not None:
+        _variant_pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def _render_variants(sha256: str, extension: str) -> None:
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(
+        _get_variant_pool(), render_variants, str(blob_path(sha256, extension)), sha256, extension
+    )
+
+
+async def generate_variants(sha256: str, extension: str) -> None:
+    """Генерирует варианты в пуле процессов и отмечает файл как обработанный."""
+    await _render_variants(sha256, extension)
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(MediaBlob).where(MediaBlob.sha256 == sha256).values(variants_ready=True))
+        await db.commit()
+
+
+async def _count_variant_failure(db: AsyncSession, sha256: str) -> None:
+    await db.execute(
+        update(MediaBlob)
+        .where(MediaBlob.sha256 == sha256)
+        .values(variant_attempts=MediaBlob.variant_attempts + 1)
+    )
+
+
+async def _generate_variants_logged(sha256: str, extension: str) -> None:
+    try:
+        await generate_variants(sha256, extension)
+    except Exception as e:
+        # Не страшно: generate_missing_variants повторит попытку позже
+        logger.warning(f"Не удалось сгенерировать варианты изображения {sha256}: {str(e)}")
+        try:
+            async with AsyncSessionLocal() as db:
+                await _count_variant_failure(db, sha256)
+                await db.commit()
+        except Exception as e:
+            logger.warning(f"Не удалось учесть ошибку генерации вариантов {sha256}: {str(e)}")
+
+
+def schedule_variants(sha256: str, extension: str) -> None:
+    """Запускает генерацию вариантов в фоне, не задерживая ответ на загрузку."""
+    task = asyncio.create_task(_generate_variants_logged(sha256, extension))
+    _variant_tasks.add(task)
+    task.add_done_callback(_variant_tasks.discard)
+
+
+async def generate_missing_variants(batch: int = VARIANTS_BATCH) -> int:
+    """
+    Догенерирует варианты файлов, для которых фоновая задача не завершилась (перезапуск, ошибка).
+
+    Строки блокируются FOR UPDATE SKIP LOCKED на время генерации, поэтому реплики
+    не обрабатывают один файл дважды. Ошибки считаются в variant_attempts: первыми
+    идут файлы с меньшим числом попыток, после VARIANTS_MAX_ATTEMPTS файл больше
+    не выбирается и отдаётся оригиналом.
+
+    :return: количество обработанных файлов
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(MediaBlob.sha256, MediaBlob.extension)
+            .where(
+                MediaBlob.variants_ready.is_(False),
+                MediaBlob.variant_attempts < VARIANTS_MAX_ATTEMPTS,
+                MediaBlob.created_at < func.now() - VARIANTS_RETRY_AFTER
+            )
+            .order_by(MediaBlob.variant_attempts, MediaBlob.created_at)
+            .limit(batch)
+            .with_for_update(skip_locked=True)
+        )
+        blobs = result.all()
+        for sha256, extension in blobs:
+            try:
+                await _render_variants(sha256, extension)
+            except Exception as e:
+                logger.warning(f"Не удалось сгенерировать варианты изображения {sha256}: {str(e)}")
+                await _count_variant_failure(db, sha256)
+            else:
+                await db.execute(update(MediaBlob).where(MediaBlob.sha256 == sha256).values(variants_ready=True))
+        await db.commit()
+    return len(blobs)
+
+
+async def store_upload(file: UploadFile) -> str:
+    """
+    Сохраняет загруженное изображение в хранилище и возвращает неизменяемый URL.
+
+    Одинаковое содержимое хранится один раз. Запись о файле фиксируется сразу
+    (в отдельной транзакции) с нулевым счётчиком ссылок: если вызывающий так и
+    не привяжет файл через acquire_media, сборщик удалит его после GC_GRACE_PERIOD.
+    Миниатюры и WebP-версии генерируются в фоне (см. variant_urls).
+    """
+    temp_path, extension, sha256, size = await stream_upload(file, MEDIA_TEMP_DIR)
+    path = blob_path(sha256, extension)
+    try:
+        async with AsyncSessionLocal() as db:
+            # Блокировка строки держится до коммита: сборщик (SKIP LOCKED) не удалит
+            # файл, пока он кладётся на место, а если удаление уже идёт — дождёмся его
+            result = await db.execute(
+                pg_insert(MediaBlob)
+                .values(sha256=sha256, extension=extension, size=size, ref_count=0)
+                .on_conflict_do_update(
+                    index_elements=[MediaBlob.sha256],
+                    set_={"unreferenced_at": case((MediaBlob.ref_count == 0, func.now()), else_=None)}
+                )
+                .returning(MediaBlob.variants_ready)
+            )
+            variants_ready = result.scalar_one()
+            if not await aio_ospath.exists(path):
+                await aio_os.makedirs(path.parent, exist_ok=True)
+                await aio_os.replace(temp_path, path)
+            await db.commit()
+    finally:
+        # Если файл уже был в хранилище (или запись не удалась), временная копия не нужна
+        await remove_quietly(temp_path)
+    if not variants_ready:
+        schedule_variants(sha256, extension)
+    return blob_url(sha256, extension)
+
+
+async def store_uploads(files: List[UploadFile]) -> List[str]:
+    return [await store_upload(file) for file in files]
+
+
+def _hash_counts(urls: Iterable[Optional[str]]) -> Counter:
+    return Counter(sha256 for sha256 in map(blob_hash, urls) if sha256)
+
+
+async def acquire_media(db: AsyncSession, urls: Iterable[Optional[str]]) -> None:
+    """Увеличивает счётчики ссылок (в транзакции вызывающего)."""
+    for sha256, count in _hash_counts(urls).items():
+        await db.execute(
+            update(MediaBlob)
+            .where(MediaBlob.sha256 == sha256)
+            .values(ref_count=MediaBlob.ref_count + count, unreferenced_at=None)
+        )
+
+
+async def release_media(db: AsyncSession, urls: Iterable[Optional[str]]) -> None:
+    """
+    Уменьшает счётчики ссылок (в транзакции вызывающего).
+
+    Файлы не удаляются: это делает сборщик мусора, поэтому обработчики
+    запросов не трогают файловую систему.
+    """
+    for sha256, count in _hash_counts(urls).items():
+        await db.execute(
+            update(MediaBlob)
+            .where(MediaBlob.sha256 == sha256)
+            .values(
+                ref_count=func.greatest(MediaBlob.ref_count - count, 0),
+                unreferenced_at=case((MediaBlob.ref_count - count <= 0, func.now()), else_=None)
+            )
+        )
+
+
+async def replace_media(db: AsyncSession, old_urls: Iterable[Optional[str]], new_urls: Iterable[Optional[str]]) -> None:
+    """Переносит ссылки со старых файлов на новые (например, при замене фото или логотипа)."""
+    await acquire_media(db, new_urls)
+    await release_media(db, old_urls)
+
+
+async def collect_garbage(batch: int = GC_BATCH) -> int:
+    """
+    Удаляет одну пачку файлов без ссылок старше GC_GRACE_PERIOD.
+
+    FOR UPDATE SKIP LOCKED позволяет запускать сборщик в нескольких репликах
+    одновременно: каждая берёт свои строки и не ждёт чужие.
+
+    :return: количество удалённых файлов
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(MediaBlob.sha256, MediaBlob.extension)
+            .where(MediaBlob.ref_count == 0, MediaBlob.unreferenced_at < func.now() - GC_GRACE_PERIOD)
+            .order_by(MediaBlob.unreferenced_at)
+            .limit(batch)
+            .with_for_update(skip_locked=True)
+        )
+        blobs = result.all()
+        if not blobs:
+            return 0
+        for sha256, extension in blobs:
+            for path in [blob_path(sha256, extension), *variant_paths(sha256, extension)]:
+                await remove_quietly(path)
+        await db.execute(delete(MediaBlob).where(MediaBlob.sha256.in_([sha256 for sha256, _ in blobs])))
+        await db.commit()
+    logger.info(f"Сборщик медиа удалил файлов: {len(blobs)}")
+    return len(blobs)
+
+
+async def media_gc_loop() -> None:
+    """Фоновая задача: пачками удаляет файлы без ссылок и догенерирует пропущенные варианты."""
+    while True:
+        try:
+            while await collect_garbage() == GC_BATCH:
+                await asyncio.sleep(0)
+            await generate_missing_variants()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка сборки мусора медиахранилища: {str(e)}")
+        await asyncio.sleep(GC_INTERVAL)
+
+
+def variant_source(path: Path) -> Optional[Path]:
+    """
+    Оригинал по пути ещё не сгенерированного варианта (ab/<sha256>_thumb.webp -> ab/<sha256>.jpg).
+
+    Пока варианты генерируются, по их URL отдаётся оригинал без долгого кэширования.
+    """
+    sha256, separator, variant = path.stem.partition("_")
+    if not separator or variant not in VARIANT_SIZES:
+        return None
+    for extension in set(IMAGE_SIGNATURES.values()):
+        candidate = path.with_name(f"{sha256}{extension}")
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+class LegacyStaticFiles(StaticFiles):
+    """
+    /static в deal, account и rating service — для клиентов со старыми URL
+    (порты 8002–8004), пока они не перейдут на media_service через шлюз.
+
+    Для ещё не сгенерированного варианта отдаётся оригинал, как в media_service.
+    """
+
+    async def get_response(self, path: str, scope):
+        try:
+            return await super().get_response(path, scope)
+        except HTTPException as e:
+            original = variant_source(Path(self.directory) / path) if e.status_code == 404 else None
+            if original is None:
+                raise
+        response = await super().get_response(original.relative_to(self.directory).as_posix(), scope)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
@@ -0,0 +1,142 @@
+# shared/services/partners.py
+import asyncio
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared.cache.lru import LRUCache
+from shared.db.models import Company_Model
+from shared.db.redis import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Redis-хэш account_id -> название компании (общий для всех сервисов)
+PARTNER_NAMES_KEY = "partner_names"
+# Канал, по которому все процессы узнают о переименовании компании (сообщение — account_id)
+PARTNER_NAMES_CHANNEL = "partner_names:invalidate"
+RECONNECT_DELAY = 5  # Пауза перед повторной подпиской после ошибки Redis, сек
+# Маркер «компании нет» (аккаунт удалён), чтобы не ходить за ней в БД каждый раз
+_MISSING_NAME = ""
+
+# Локальный кэш процесса. Переименование сбрасывает его во всех процессах через
+# PARTNER_NAMES_CHANNEL (partner_names_listener); TTL — страховка на время без подписки
+_local_names = LRUCache(maxsize=4096, ttl=60)
+
+
+async def resolve_partner_names(
+    db: AsyncSession,
+    account_ids: Iterable[int],
+    redis: Optional[Redis] = None
+) -> Dict[int, str]:
+    """
+    Возвращает словарь account_id -> название компании для всех переданных ID.
+
+    Порядок поиска: локальный LRU -> Redis -> один запрос в БД на все недостающие ID.
+    """
+    ids = {int(account_id) for account_id in account_ids if account_id is not None}
+    if not ids:
+        return {}
+
+    names = _local_names.get_many(ids)
+    missing = [account_id for account_id in ids if account_id not in names]
+
+    if missing and redis is not None:
+        try:
+            values = await redis.hmget(PARTNER_NAMES_KEY, missing)
+        except RedisError as e:
+            logger.warning(f"Не удалось прочитать названия партнёров из Redis: {str(e)}")
+            values = [None] * len(missing)
+        from_redis = {
+            account_id: value
+            for account_id, value in zip(missing, values)
+            if value is not None
+        }
+        _local_names.set_many(from_redis)
+        names.update(from_redis)
+        missing = [account_id for account_id in missing if account_id not in from_redis]
+
+    if missing:
+        result = await db.execute(
+            select(Company_Model.account_id, Company_Model.name)
+            .where(Company_Model.account_id.in_(missing))
+        )
+        from_db = {row[0]: row[1] for row in result.all()}
+        from_db.update({account_id: _MISSING_NAME for account_id in missing if account_id not in from_db})
+
+        _local_names.set_many(from_db)
+        names.update(from_db)
+        if redis is not None:
+            try:
+                await redis.hset(PARTNER_NAMES_KEY, mapping=from_db)
+            except RedisError as e:
+                logger.warning(f"Не удалось сохранить названия партнёров в Redis: {str(e)}")
+
+    return {account_id: name for account_id, name in names.items() if name != _MISSING_NAME}
+
+
+def build_partners(partner_ids: Optional[List[int]], names: Dict[int, str]) -> List[dict]:
+    """Собирает список партнёров [{"id", "name"}] по уже разрешённым названиям, сортируя по имени."""
+    partners = [
+        {"id": account_id, "name": names[account_id]}
+        for account_id in dict.fromkeys(partner_ids or [])
+        if account_id in names
+    ]
+    return sorted(partners, key=lambda partner: partner["name"])
+
+
+async def get_partners(
+    db: AsyncSession,
+    partner_ids: Optional[List[int]],
+    redis: Optional[Redis] = None
+) -> List[dict]:
+    """Партнёры одной компании (для детальных страниц и ЛК)."""
+    if not partner_ids:
+        return []
+    names = await resolve_partner_names(db, partner_ids, redis)
+    return build_partners(partner_ids, names)
+
+
+async def invalidate_partner_name(account_id: int, redis: Optional[Redis] = None) -> None:
+    """
+    Сбрасывает закэшированное название компании (переименование или удаление):
+    локальный LRU, Redis-хэш и локальные LRU остальных процессов через pub/sub.
+    """
+    _local_names.pop(account_id)
+    if redis is not None:
+        try:
+            await redis.hdel(PARTNER_NAMES_KEY, account_id)
+            await redis.publish(PARTNER_NAMES_CHANNEL, account_id)
+        except RedisError as e:
+            logger.warning(f"Не удалось сбросить название партнёра {account_id} в Redis: {str(e)}")
+
+
+async def partner_names_listener() -> None:
+    """
+    Фоновая задача: удаляет из локального LRU названия, о сбросе которых
+    сообщили в PARTNER_NAMES_CHANNEL. После (пере)подписки локальный кэш
+    очищается целиком — сообщения, пришедшие без подписки, не теряются.
+    """
+    redis = get_redis_client(purpose="pubsub")
+    while True:
+        pubsub = redis.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(PARTNER_NAMES_CHANNEL)
+            _local_names.clear()
+            while True:
+                message = await pubsub.get_message(timeout=1.0)
+                if message is not None:
+                    _local_names.pop(int(message["data"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка слушателя названий партнёров: {str(e)}")
+            await asyncio.sleep(RECONNECT_DELAY)
+        finally:
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
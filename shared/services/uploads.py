@@ -0,0 +1,139 @@
+# shared/services/uploads.py
+import hashlib
+import logging
+import uuid
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+import aiofiles
+import aiofiles.os as aio_os
+from fastapi import HTTPException, UploadFile, status
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024  # Размер буфера при потоковой записи
+MAX_IMAGE_SIZE = 5 * 1024 * 1024  # 5 МБ на файл
+
+# Сигнатуры (magic bytes) допустимых изображений -> расширение сохраняемого файла
+IMAGE_SIGNATURES = {
+    b"\xff\xd8\xff": ".jpg",
+    b"\x89PNG\r\n\x1a\n": ".png",
+}
+ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+SIGNATURE_SIZE = max(len(signature) for signature in IMAGE_SIGNATURES)
+
+
+def detect_image_extension(header: bytes) -> Optional[str]:
+    """Определяет тип изображения по первым байтам файла (а не по имени от клиента)."""
+    for signature, extension in IMAGE_SIGNATURES.items():
+        if header.startswith(signature):
+            return extension
+    return None
+
+
+def check_upload(file: UploadFile, max_size: int = MAX_IMAGE_SIZE) -> None:
+    """Быстрая проверка до чтения: расширение и размер, если клиент его передал."""
+    extension = Path(file.filename or "").suffix.lower()
+    if extension not in ALLOWED_EXTENSIONS:
+        raise HTTPException(
+            status.HTTP_400_BAD_REQUEST,
+            f"Файл {file.filename} имеет недопустимый формат. Разрешённые форматы: {sorted(ALLOWED_EXTENSIONS)}"
+        )
+    if file.size is not None and file.size > max_size:
+        raise HTTPException(
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            f"Файл {file.filename} превышает {max_size // (1024 * 1024)} МБ"
+        )
+
+
+def _require_image(file: UploadFile, header: bytes) -> str:
+    extension = detect_image_extension(header)
+    if extension is None:
+        raise HTTPException(
+            status.HTTP_400_BAD_REQUEST,
+            f"Файл {file.filename} не является изображением JPEG или PNG"
+        )
+    return extension
+
+
+def check_uploads(files: List[UploadFile], max_files: int = 5, max_size: int = MAX_IMAGE_SIZE) -> List[UploadFile]:
+    """Проверяет набор файлов до чтения; пустые поля формы отбрасываются."""
+    files = [file for file in files if file.filename]
+    if len(files) > max_files:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, f"Нельзя загрузить больше {max_files} фотографий")
+    for file in files:
+        check_upload(file, max_size)
+    return files
+
+
+async def stream_upload(
+    file: UploadFile,
+    folder: Union[str, Path],
+    max_size: int = MAX_IMAGE_SIZE
+) -> Tuple[Path, str, str, int]:
+    """
+    Потоково записывает загруженное изображение во временный файл.
+
+    Файл читается кусками по CHUNK_SIZE: тип проверяется по сигнатуре в первом
+    куске, размер — по мере записи, поэтому неподходящий файл отклоняется,
+    не дочитываясь до конца. Попутно считается SHA-256 содержимого.
+    Временный файл создаётся в folder, чтобы его можно было атомарно
+    переименовать на место (os.replace) в пределах одной файловой системы.
+
+    :return: (путь временного файла, расширение, sha256, размер в байтах)
+    """
+    check_upload(file, max_size)
+
+    folder = Path(folder)
+    await aio_os.makedirs(folder, exist_ok=True)
+    temp_path = folder / f".{uuid.uuid4().hex}.part"
+
+    digest = hashlib.sha256()
+    extension = None
+    written = 0
+    try:
+        async with aiofiles.open(temp_path, "wb") as out_file:
+            header = b""
+            while True:
+                chunk = await file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_size:
+                    raise HTTPException(
+                        status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        f"Файл {file.filename} превышает {max_size // (1024 * 1024)} МБ"
+                    )
+                if extension is None and len(header) < SIGNATURE_SIZE:
+                    header = (header + chunk)[:SIGNATURE_SIZE]
+                    if len(header) == SIGNATURE_SIZE:
+                        extension = _require_image(file, header)
+                digest.update(chunk)
+                await out_file.write(chunk)
+
+        if extension is None:
+            # Файл короче самой длинной сигнатуры
+            if not header:
+                raise HTTPException(status.HTTP_400_BAD_REQUEST, f"Файл {file.filename} пустой")
+            extension = _require_image(file, header)
+    except HTTPException:
+        await remove_quietly(temp_path)
+        raise
+    except OSError as e:
+        await remove_quietly(temp_path)
+        raise HTTPException(
+            status.HTTP_500_INTERNAL_SERVER_ERROR,
+            f"Ошибка при сохранении файла {file.filename}: {str(e)}"
+        )
+
+    return temp_path, extension, digest.hexdigest(), written
+
+
+async def remove_quietly(path: Union[str, Path]) -> None:
+    """Удаляет файл, пропуская отсутствующий."""
+    try:
+        await aio_os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Не удалось удалить файл {path}: {str(e)}")